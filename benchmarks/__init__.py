@@ -0,0 +1 @@
+"""Microbenchmarks del sistema de consultas"""
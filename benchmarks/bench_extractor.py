@@ -0,0 +1,168 @@
+"""
+Benchmark del extractor de PDFs de la registraduría
+
+Compara la búsqueda de campos patrón por patrón (re.search con cada
+expresión sobre todo el texto) con el escáner precompilado de un solo
+recorrido, en textos/s para la etapa de campos y en PDFs/s de punta a punta,
+y mide cómo escala iter_extract con la cantidad de procesos.
+
+Uso:
+    python benchmarks/bench_extractor.py --textos 5000
+    python benchmarks/bench_extractor.py --pdfs 200 --paginas-extra 3
+    python benchmarks/bench_extractor.py --carpeta descargas/
+    python benchmarks/bench_extractor.py --pdfs 2000 --workers 1 --workers 2 --workers 4
+"""
+import argparse
+import json
+import logging
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.certificados_sinteticos import a_pdf, generar_corpus
+from extractors.data_extractor import RegistraduriaPDFExtractor
+
+
+class ExtractorSecuencial(RegistraduriaPDFExtractor):
+    """
+    El extractor anterior: todas las páginas con pdfplumber (PyPDF2 si no hay texto),
+    reemplazos encadenados, re.search patrón por patrón y strptime formato por formato
+    """
+
+    def _extract_text(self, pdf_path: str) -> str:
+        text = self._extract_with_pdfplumber(pdf_path)
+        if not text or len(text.strip()) < 50:
+            text = self._extract_with_pypdf2(pdf_path)
+        return text
+
+    def _clean_text(self, text: str) -> str:
+        text = re.sub(r'\r\n', '\n', text)
+        text = re.sub(r'\s+', ' ', text)
+        for orig, repl in {'Á': 'A', 'É': 'E', 'Í': 'I', 'Ó': 'O', 'Ú': 'U', 'Ñ': 'N', 'Ü': 'U',
+                           'á': 'A', 'é': 'E', 'í': 'I', 'ó': 'O', 'ú': 'U', 'ñ': 'N', 'ü': 'U'}.items():
+            text = text.replace(orig, repl)
+        return text.upper()
+
+    def _parse_fecha(self, fecha_str: str) -> str:
+        for formato in ('%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y', '%d-%m-%y', '%Y/%m/%d', '%Y-%m-%d'):
+            try:
+                return datetime.strptime(fecha_str, formato).strftime('%Y-%m-%d')
+            except ValueError:
+                continue
+        return fecha_str
+
+    def _extract_all_fields(self, text: str) -> Dict[str, Any]:
+        if not text:
+            return {}
+        cleaned_text = self._clean_text(text)
+        resultados = {}
+        for campo, patrones in self.patterns.items():
+            valor = self._extract_with_patterns(cleaned_text, patrones)
+            if valor:
+                if campo == 'documento':
+                    valor = self._clean_documento(valor)
+                elif campo in ['fecha_expedicion', 'fecha_nacimiento']:
+                    valor = self._parse_fecha(valor)
+                elif campo == 'nombre_completo':
+                    valor = self._clean_nombre(valor)
+                resultados[campo] = valor
+        return resultados
+
+
+def _extractores() -> Dict[str, RegistraduriaPDFExtractor]:
+    return {'secuencial': ExtractorSecuencial(), 'escaner': RegistraduriaPDFExtractor()}
+
+
+def medir_textos(textos: List[str], repeticiones: int = 3) -> List[Dict[str, Any]]:
+    """Textos/s de _extract_all_fields (limpieza + campos + post-proceso)"""
+    filas = []
+    for nombre, extractor in _extractores().items():
+        mejor = float('inf')
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            for texto in textos:
+                extractor._extract_all_fields(texto)
+            mejor = min(mejor, time.perf_counter() - inicio)
+        filas.append({'modo': nombre, 'etapa': 'campos', 'cantidad': len(textos),
+                      'por_segundo': len(textos) / mejor, 'us_por_item': mejor / len(textos) * 1e6})
+    return filas
+
+
+def medir_pdfs(rutas: List[str]) -> List[Dict[str, Any]]:
+    """PDFs/s de extract_from_pdf completo"""
+    filas = []
+    for nombre, extractor in _extractores().items():
+        inicio = time.perf_counter()
+        for ruta in rutas:
+            extractor.extract_from_pdf(ruta)
+        total = time.perf_counter() - inicio
+        filas.append({'modo': nombre, 'etapa': 'pdf', 'cantidad': len(rutas),
+                      'por_segundo': len(rutas) / total, 'us_por_item': total / len(rutas) * 1e6})
+    return filas
+
+
+def medir_procesos(rutas: List[str], workers: List[int]) -> List[Dict[str, Any]]:
+    """PDFs/s de iter_extract con distinta cantidad de procesos"""
+    filas = []
+    extractor = RegistraduriaPDFExtractor()
+    for cantidad in workers:
+        inicio = time.perf_counter()
+        for _ in extractor.iter_extract(rutas, workers=cantidad):
+            pass
+        total = time.perf_counter() - inicio
+        filas.append({'modo': f'{cantidad} proc.', 'etapa': 'lote', 'cantidad': len(rutas),
+                      'por_segundo': len(rutas) / total, 'us_por_item': total / len(rutas) * 1e6})
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del extractor de PDFs')
+    parser.add_argument('--textos', type=int, default=2000, help='Textos sintéticos para la etapa de campos')
+    parser.add_argument('--pdfs', type=int, default=0, help='Certificados sintéticos en PDF (requiere reportlab)')
+    parser.add_argument('--paginas-extra', type=int, default=0, help='Páginas de anexo en cada PDF sintético')
+    parser.add_argument('--carpeta', type=str, help='Carpeta con PDFs reales')
+    parser.add_argument('--workers', type=int, action='append',
+                        help='Medir iter_extract con esta cantidad de procesos (repetible)')
+    parser.add_argument('--json', type=str, help='Guardar resultados en este archivo')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    filas = medir_textos(generar_corpus(args.textos))
+
+    if args.carpeta:
+        carpeta = Path(args.carpeta)
+        rutas = [str(p) for p in sorted(carpeta.glob("*.pdf")) + sorted(carpeta.glob("*.PDF"))]
+        filas += medir_pdfs(rutas)
+        if args.workers:
+            filas += medir_procesos(rutas, args.workers)
+    elif args.pdfs:
+        with tempfile.TemporaryDirectory() as temporal:
+            rutas = []
+            for i, texto in enumerate(generar_corpus(args.pdfs, semilla=1)):
+                ruta = Path(temporal) / f"cedula_{i}.pdf"
+                ruta.write_bytes(a_pdf(texto, args.paginas_extra))
+                rutas.append(str(ruta))
+            filas += medir_pdfs(rutas)
+            if args.workers:
+                filas += medir_procesos(rutas, args.workers)
+
+    print(f"\n{'modo':<12}{'etapa':<8}{'cantidad':>10}{'por segundo':>14}{'µs/item':>12}")
+    print("-" * 56)
+    for fila in filas:
+        print(f"{fila['modo']:<12}{fila['etapa']:<8}{fila['cantidad']:>10}"
+              f"{fila['por_segundo']:>14.0f}{fila['us_por_item']:>12.0f}")
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(filas, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark del paso de imágenes al pool OCR: pickle vs memoria compartida
+
+Lanza N hilos que envían imágenes binarizadas al OCRPool a la vez (como N
+consultas concurrentes) con un motor nulo, de modo que lo medido es el costo
+de mover la imagen al worker y no el OCR.
+
+Uso:
+    python benchmarks/bench_memoria_compartida.py
+    python benchmarks/bench_memoria_compartida.py --concurrencia 15 --concurrencia 200 --alto 120 --ancho 480
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.ocr_pool import OCRPool
+
+
+class MotorNulo:
+    """Toca todos los píxeles (como lo haría Tesseract) y no reconoce nada"""
+
+    def __init__(self, lang):
+        self.lang = lang
+
+    def reconocer(self, binaria, psm=6, whitelist="0123456789"):
+        tinta = int((binaria == 0).sum())
+        return str(tinta % 10), 0.0, []
+
+
+def _percentil(ordenados: List[float], p: float) -> float:
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def medir(memoria_compartida: bool, concurrencia: int, por_hilo: int, imagen: np.ndarray,
+          workers: int) -> Dict[str, Any]:
+    """Imágenes por segundo y latencia de envío→resultado con `concurrencia` hilos enviando"""
+    latencias: List[float] = []
+    lock = threading.Lock()
+
+    with OCRPool(workers=workers, max_cola=concurrencia, fabrica_motor=MotorNulo,
+                 memoria_compartida=memoria_compartida,
+                 alto_max=imagen.shape[0], ancho_max=imagen.shape[1]) as pool:
+        # Calentar: que todos los workers hayan arrancado antes de medir
+        for futuro in [pool.enviar(imagen) for _ in range(workers)]:
+            futuro.result()
+
+        def cliente():
+            propias = []
+            for _ in range(por_hilo):
+                t = time.perf_counter()
+                pool.reconocer(imagen)
+                propias.append((time.perf_counter() - t) * 1000)
+            with lock:
+                latencias.extend(propias)
+
+        hilos = [threading.Thread(target=cliente) for _ in range(concurrencia)]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        total = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        'modo': 'memoria compartida' if memoria_compartida else 'pickle',
+        'concurrencia': concurrencia,
+        'imagenes': len(latencias),
+        'imagenes_por_segundo': len(latencias) / total if total else 0.0,
+        'p50_ms': _percentil(latencias, 50),
+        'p99_ms': _percentil(latencias, 99),
+    }
+
+
+def ejecutar(concurrencias: List[int], por_hilo: int = 20, alto: int = 60, ancho: int = 200,
+             workers: int = 4) -> List[Dict[str, Any]]:
+    imagen = np.where(np.random.default_rng(0).random((alto, ancho)) < 0.3, 0, 255).astype(np.uint8)
+    return [medir(memoria_compartida, concurrencia, por_hilo, imagen, workers)
+            for concurrencia in concurrencias
+            for memoria_compartida in (False, True)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pickle vs memoria compartida en el pool OCR')
+    parser.add_argument('--concurrencia', type=int, action='append',
+                        help='Consultas concurrentes (repetible, default: 15, 50 y 200)')
+    parser.add_argument('--por-hilo', type=int, default=20, help='Imágenes que envía cada hilo')
+    parser.add_argument('--alto', type=int, default=60)
+    parser.add_argument('--ancho', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--json', type=str, help='Guardar resultados en este archivo')
+    args = parser.parse_args()
+
+    filas = ejecutar(args.concurrencia or [15, 50, 200], args.por_hilo, args.alto, args.ancho, args.workers)
+
+    print(f"\nImagen {args.alto}x{args.ancho}, {args.workers} workers, {args.por_hilo} imágenes por hilo")
+    print(f"{'modo':<20}{'concurrencia':>13}{'img/s':>10}{'p50 (ms)':>11}{'p99 (ms)':>11}")
+    print("-" * 65)
+    for fila in filas:
+        print(f"{fila['modo']:<20}{fila['concurrencia']:>13}{fila['imagenes_por_segundo']:>10.0f}"
+              f"{fila['p50_ms']:>11.2f}{fila['p99_ms']:>11.2f}")
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(filas, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Microbenchmark de los pipelines de preprocesamiento de CAPTCHA
+
+Mide el costo por imagen de cada pipeline (y del binarizado anterior con
+Image.point) y, si Tesseract está instalado, la precisión de OCR que logra.
+
+Uso:
+    python benchmarks/bench_preprocesamiento.py --imagenes 200
+    python benchmarks/bench_preprocesamiento.py --sin-ocr --json resultados/bench.json
+"""
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.captchas_sinteticos import generar_corpus
+from utils.preprocesamiento import PIPELINES, preprocesar
+
+
+def _legacy_point(imagen: np.ndarray) -> Image.Image:
+    """Binarizado previo: una lambda de Python por nivel de gris"""
+    return Image.fromarray(imagen).convert("L").point(lambda x: 0 if x < 140 else 255, '1')
+
+
+def medir(funcion: Callable[[np.ndarray], Any], imagenes: List[np.ndarray], repeticiones: int = 3) -> Dict[str, float]:
+    """Mediana y p95 del costo por imagen en microsegundos"""
+    tiempos = []
+    for _ in range(repeticiones):
+        for imagen in imagenes:
+            inicio = time.perf_counter()
+            funcion(imagen)
+            tiempos.append((time.perf_counter() - inicio) * 1e6)
+    tiempos.sort()
+    return {
+        'us_mediana': statistics.median(tiempos),
+        'us_p95': tiempos[int(len(tiempos) * 0.95) - 1],
+    }
+
+
+def precision_ocr(pipeline: str, corpus) -> float:
+    from utils.captcha_solver import solve_captcha_image
+
+    aciertos = sum(solve_captcha_image(imagen, pipeline)[0] == etiqueta for imagen, etiqueta in corpus)
+    return aciertos / len(corpus) * 100
+
+
+def ejecutar(imagenes: int = 100, con_ocr: bool = True) -> List[Dict[str, Any]]:
+    corpus = generar_corpus(imagenes)
+    arreglos = [imagen for imagen, _ in corpus]
+    con_ocr = con_ocr and shutil.which("tesseract") is not None
+
+    filas = [{'pipeline': 'legacy_point', **medir(_legacy_point, arreglos), 'precision_ocr': None}]
+    for nombre in PIPELINES:
+        fila = {'pipeline': nombre, **medir(lambda img, n=nombre: preprocesar(img, n), arreglos)}
+        fila['precision_ocr'] = precision_ocr(nombre, corpus) if con_ocr else None
+        filas.append(fila)
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de pipelines de preprocesamiento de CAPTCHA')
+    parser.add_argument('--imagenes', type=int, default=100, help='CAPTCHAs sintéticos a usar (default: 100)')
+    parser.add_argument('--sin-ocr', action='store_true', help='Medir solo el preprocesamiento')
+    parser.add_argument('--json', type=str, help='Guardar resultados en este archivo')
+    args = parser.parse_args()
+
+    filas = ejecutar(args.imagenes, con_ocr=not args.sin_ocr)
+
+    print(f"\n{'pipeline':<14}{'mediana (µs)':>14}{'p95 (µs)':>12}{'OCR (%)':>10}")
+    print("-" * 50)
+    for fila in filas:
+        ocr = f"{fila['precision_ocr']:.1f}" if fila['precision_ocr'] is not None else "N/D"
+        print(f"{fila['pipeline']:<14}{fila['us_mediana']:>14.0f}{fila['us_p95']:>12.0f}{ocr:>10}")
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(filas, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Benchmark offline de solvers de CAPTCHA sobre el corpus grabado
+
+Reproduce las imágenes etiquetadas de storage.captcha_corpus (o CAPTCHAs
+sintéticos si no hay corpus) a través de uno o varios solvers y reporta
+precisión, latencia p50/p99 e imágenes por segundo.
+
+Uso:
+    python benchmarks/bench_solver.py --corpus corpus_captchas.db
+    python benchmarks/bench_solver.py --sinteticos 200 --solver glifos --solver tesseract
+    python benchmarks/bench_solver.py --corpus corpus_captchas.db --solver mi_modulo:mi_solver
+"""
+import argparse
+import importlib
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Un solver recibe los bytes PNG y retorna el texto leído
+Solver = Callable[[bytes], str]
+
+
+def _solve_captcha(png: bytes) -> str:
+    from utils.captcha_solver import solve_captcha
+    return solve_captcha(png)
+
+
+def _tesseract(png: bytes) -> str:
+    """Una sola lectura de Tesseract con el perfil ajustado, sin glifos ni votación"""
+    from utils.captcha_solver import cargar_imagen, perfil_ocr, solve_captcha_votado
+    perfil = perfil_ocr()
+    return solve_captcha_votado(cargar_imagen(png), [(perfil['pipeline'], perfil['psm'])])['texto']
+
+
+def _votacion(png: bytes) -> str:
+    from utils.captcha_solver import VARIANTES_DEFAULT, cargar_imagen, solve_captcha_votado
+    return solve_captcha_votado(cargar_imagen(png), VARIANTES_DEFAULT[:3])['texto']
+
+
+def _glifos(png: bytes) -> str:
+    from utils.captcha_solver import cargar_imagen
+    from utils.glyph_classifier import get_glyph_classifier
+    clasificador = get_glyph_classifier()
+    if clasificador is None:
+        raise RuntimeError("No hay modelo de glifos entrenado")
+    return clasificador.reconocer(cargar_imagen(png).convert("RGB"))[0]
+
+
+SOLVERS: Dict[str, Solver] = {
+    'solve_captcha': _solve_captcha,
+    'tesseract': _tesseract,
+    'votacion': _votacion,
+    'glifos': _glifos,
+}
+
+
+def resolver_solver(nombre: str) -> Solver:
+    """Nombre registrado en SOLVERS o 'modulo:funcion' importable"""
+    if nombre in SOLVERS:
+        return SOLVERS[nombre]
+    if ':' not in nombre:
+        raise ValueError(f"Solver desconocido: {nombre} (use uno de {list(SOLVERS)} o modulo:funcion)")
+    modulo, funcion = nombre.split(':', 1)
+    return getattr(importlib.import_module(modulo), funcion)
+
+
+def cargar_muestras(corpus: str = None, sinteticos: int = 100, limite: int = None) -> List[Tuple[bytes, str]]:
+    """(PNG, etiqueta) del corpus grabado o sintéticos"""
+    if corpus:
+        from storage.captcha_corpus import CaptchaCorpus
+        archivo = CaptchaCorpus(corpus)
+        try:
+            return [(png, etiqueta) for _, png, etiqueta in archivo.muestras(limite=limite)]
+        finally:
+            archivo.cerrar()
+
+    from benchmarks.captchas_sinteticos import a_png, generar_corpus
+    return [(a_png(imagen), etiqueta) for imagen, etiqueta in generar_corpus(limite or sinteticos, semilla=1)]
+
+
+def _percentil(ordenados: List[float], p: float) -> float:
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def medir_solver(solver: Solver, muestras: List[Tuple[bytes, str]]) -> Dict[str, Any]:
+    """Precisión, latencias y throughput de un solver sobre las muestras"""
+    latencias, aciertos, errores = [], 0, 0
+    inicio = time.perf_counter()
+    for png, etiqueta in muestras:
+        t = time.perf_counter()
+        try:
+            texto = solver(png)
+        except Exception:
+            texto = None
+            errores += 1
+        latencias.append((time.perf_counter() - t) * 1000)
+        aciertos += texto == etiqueta
+    total = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        'muestras': len(muestras),
+        'precision': aciertos / len(muestras) * 100 if muestras else 0.0,
+        'errores': errores,
+        'p50_ms': _percentil(latencias, 50),
+        'p99_ms': _percentil(latencias, 99),
+        'imagenes_por_segundo': len(muestras) / total if total else 0.0,
+    }
+
+
+def ejecutar(solvers: List[str], muestras: List[Tuple[bytes, str]]) -> List[Dict[str, Any]]:
+    return [{'solver': nombre, **medir_solver(resolver_solver(nombre), muestras)} for nombre in solvers]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark offline de solvers de CAPTCHA')
+    parser.add_argument('--corpus', type=str, help='Corpus SQLite grabado (storage.captcha_corpus)')
+    parser.add_argument('--sinteticos', type=int, default=100, help='CAPTCHAs sintéticos si no hay corpus')
+    parser.add_argument('--limite', type=int, help='Máximo de muestras')
+    parser.add_argument('--solver', action='append',
+                        help=f'Solver a medir (repetible): {", ".join(SOLVERS)} o modulo:funcion')
+    parser.add_argument('--json', type=str, help='Guardar resultados en este archivo')
+    args = parser.parse_args()
+
+    muestras = cargar_muestras(args.corpus, args.sinteticos, args.limite)
+    if not muestras:
+        raise SystemExit("❌ El corpus no tiene muestras etiquetadas")
+    filas = ejecutar(args.solver or ['solve_captcha'], muestras)
+
+    origen = args.corpus or f"{len(muestras)} sintéticos"
+    print(f"\nCorpus: {origen} ({len(muestras)} muestras)")
+    print(f"{'solver':<16}{'precisión (%)':>15}{'p50 (ms)':>11}{'p99 (ms)':>11}{'img/s':>9}{'errores':>9}")
+    print("-" * 71)
+    for fila in filas:
+        print(f"{fila['solver']:<16}{fila['precision']:>15.1f}{fila['p50_ms']:>11.1f}"
+              f"{fila['p99_ms']:>11.1f}{fila['imagenes_por_segundo']:>9.1f}{fila['errores']:>9}")
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(filas, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
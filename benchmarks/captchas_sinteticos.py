@@ -0,0 +1,65 @@
+"""
+Generador de CAPTCHAs sintéticos con etiqueta conocida para benchmarks:
+dígitos con ruido, líneas de interferencia y una leve rotación
+"""
+import io
+import random
+from typing import List, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+
+def _fuente(tamano: int):
+    try:
+        return ImageFont.load_default(size=tamano)
+    except TypeError:
+        # Pillow < 10.1 no escala la fuente por defecto
+        return ImageFont.load_default()
+
+
+def generar_captcha(texto: str, semilla: int = 0, ancho: int = 160, alto: int = 50,
+                    ruido: float = 0.03, lineas: int = 2, rotacion: float = 4.0) -> np.ndarray:
+    """Retorna el CAPTCHA como arreglo RGB uint8"""
+    rnd = random.Random(semilla)
+    fondo = rnd.randint(200, 245)
+    img = Image.new("RGB", (ancho, alto), (fondo, fondo, fondo))
+    dibujo = ImageDraw.Draw(img)
+    fuente = _fuente(int(alto * 0.6))
+
+    x = 12
+    for caracter in texto:
+        tinta = rnd.randint(20, 90)
+        dibujo.text((x, rnd.randint(4, 10)), caracter, fill=(tinta, tinta, tinta), font=fuente,
+                    stroke_width=1, stroke_fill=(tinta, tinta, tinta))
+        x += int(alto * 0.45) + rnd.randint(-2, 3)
+
+    for _ in range(lineas):
+        y = rnd.randint(alto // 4, 3 * alto // 4)
+        gris = rnd.randint(60, 120)
+        dibujo.line((0, y, ancho, y + rnd.randint(-6, 6)), fill=(gris, gris, gris), width=1)
+
+    img = img.rotate(rnd.uniform(-rotacion, rotacion), resample=Image.BILINEAR,
+                     fillcolor=(fondo, fondo, fondo))
+
+    arreglo = np.asarray(img).copy()
+    generador = np.random.default_rng(semilla)
+    mascara = generador.random(arreglo.shape[:2]) < ruido
+    arreglo[mascara] = generador.integers(0, 256, size=(int(mascara.sum()), 1), dtype=np.uint8)
+    return arreglo
+
+
+def generar_corpus(cantidad: int, largo: int = 4, semilla: int = 0) -> List[Tuple[np.ndarray, str]]:
+    """Lista de (imagen, etiqueta) reproducible"""
+    rnd = random.Random(semilla)
+    corpus = []
+    for i in range(cantidad):
+        etiqueta = "".join(rnd.choice("0123456789") for _ in range(largo))
+        corpus.append((generar_captcha(etiqueta, semilla=semilla * 100003 + i), etiqueta))
+    return corpus
+
+
+def a_png(arreglo: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(arreglo).save(buffer, format="PNG")
+    return buffer.getvalue()
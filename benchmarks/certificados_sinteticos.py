@@ -0,0 +1,99 @@
+"""
+Generador de certificados de la registraduría sintéticos para benchmarks y
+pruebas del extractor: distintas etiquetas por campo, campos ausentes, valores
+"N/A", acentos y ruido entre líneas
+"""
+import io
+import random
+from typing import List
+
+NOMBRES = ["JUAN", "CARLOS", "MARÍA", "JOSÉ", "LUISA", "ANDRÉS", "PEÑA", "NÚÑEZ", "GÓMEZ", "PÉREZ",
+           "RODRÍGUEZ", "ÁLVAREZ", "SOFÍA", "ÍÑIGO", "MARTÍNEZ", "LÓPEZ"]
+CIUDADES = ["BOGOTÁ D.C.", "MEDELLÍN", "CALI", "BARRANQUILLA", "CÚCUTA", "IBAGUÉ", "POPAYÁN"]
+ESTADOS = ["VIGENTE", "VÁLIDO", "CANCELADA POR MUERTE", "N/A"]
+
+ETIQUETAS = {
+    'nombre': ["Nombre", "NOMBRE", "Nombre del Ciudadano", "Ciudadano"],
+    'documento': ["Documento", "Cédula", "CEDULA", "Número de Documento", "Identificación", "No."],
+    'expedicion': ["Fecha Expedición", "Fecha de Expedición", "Expedido", "Expedición Documento"],
+    'nacimiento': ["Fecha Nacimiento", "Fecha Nac.", "Nació el"],
+    'lugar': ["Lugar Expedición", "Ciudad", "Municipio", "Expedido en"],
+    'estado': ["Estado", "Vigencia", "Estado de Vigencia"],
+    'direccion': ["Dirección", "Reside en", "Domicilio"],
+    'genero': ["Género", "GENERO", "Sexo"],
+    'rh': ["Grupo Sanguíneo", "RH", "Tipo de Sangre"],
+}
+
+ENCABEZADOS = [
+    "REGISTRADURÍA NACIONAL DEL ESTADO CIVIL",
+    "Certificado de Vigencia de Cédula de Ciudadanía",
+    "CERTIFICADO DE IDENTIFICACIÓN - RNEC",
+]
+
+
+def _fecha(rnd: random.Random) -> str:
+    separador = rnd.choice("/-")
+    anio = rnd.randint(1940, 2024)
+    return f"{rnd.randint(1, 28):02d}{separador}{rnd.randint(1, 12):02d}{separador}{anio if rnd.random() < 0.9 else anio % 100:02d}"
+
+
+def generar_texto(semilla: int = 0) -> str:
+    """Texto de un certificado como lo devolvería pdfplumber"""
+    rnd = random.Random(semilla)
+    valores = {
+        'nombre': " ".join(rnd.sample(NOMBRES, rnd.randint(2, 4))),
+        'documento': f"{rnd.randint(1_000_000, 1_999_999_999):,}".replace(",", ".") if rnd.random() < 0.5
+        else str(rnd.randint(1_000_000, 1_999_999_999)),
+        'expedicion': _fecha(rnd),
+        'nacimiento': _fecha(rnd),
+        'lugar': rnd.choice(CIUDADES),
+        'estado': rnd.choice(ESTADOS),
+        'direccion': f"CALLE {rnd.randint(1, 200)} #{rnd.randint(1, 99)}-{rnd.randint(1, 99)}",
+        'genero': rnd.choice(["MASCULINO", "FEMENINO", "M", "F"]),
+        'rh': rnd.choice(["O+", "O-", "A+", "AB-", "B+"]),
+    }
+
+    lineas = rnd.sample(ENCABEZADOS, rnd.randint(1, 3))
+    campos = list(valores)
+    rnd.shuffle(campos)
+    for campo in campos:
+        if rnd.random() < 0.15:
+            continue  # campo ausente
+        separador = rnd.choice([": ", ":", " ", ":   "])
+        lineas.append(f"{rnd.choice(ETIQUETAS[campo])}{separador}{valores[campo]}")
+        if rnd.random() < 0.2:
+            lineas.append("")
+    lineas.append("Este documento es válido para todos los trámites.")
+    if rnd.random() < 0.3:
+        lineas.append(f"Consulta No. {rnd.randint(100, 99999)} generada el {_fecha(rnd)}")
+    return "\n".join(lineas) + "\n"
+
+
+def generar_corpus(cantidad: int, semilla: int = 0) -> List[str]:
+    """Textos de certificados reproducibles"""
+    return [generar_texto(semilla * 100003 + i) for i in range(cantidad)]
+
+
+def a_pdf(texto: str, paginas_extra: int = 0) -> bytes:
+    """
+    Certificado con el texto dado en la primera página (requiere reportlab)
+
+    Args:
+        paginas_extra: Páginas de anexo (texto legal de relleno) después de la primera
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    hoja = canvas.Canvas(buffer, pagesize=letter)
+    y = 740
+    for linea in texto.splitlines():
+        hoja.drawString(72, y, linea)
+        y -= 16
+    for pagina in range(paginas_extra):
+        hoja.showPage()
+        for renglon in range(40):
+            hoja.drawString(72, 740 - renglon * 16,
+                            f"Anexo {pagina + 1}, numeral {renglon + 1}: condiciones de uso del certificado.")
+    hoja.save()
+    return buffer.getvalue()
@@ -5,6 +5,7 @@ CONSULTA REAL A REGISTRADURÍA NACIONAL
 Conecta REALMENTE a: https://certvigenciacedula.registraduria.gov.co/Datos.aspx
 Descarga PDFs reales y extrae información
 """
+        import io
         import os
         import sys
         import time
@@ -12,9 +13,15 @@ Descarga PDFs reales y extrae información
         import argparse
         import logging
         from datetime import datetime
-        from typing import List, Dict, Optional
+        from typing import List, Dict, Optional, Tuple
         from pathlib import Path
         import re
+        import atexit
+        import functools
+        import threading
+
+        from utils.downloader import guardar_pdf_async
+        from utils.rate_limiter import get_rate_limiter
 
 # Configurar logging
 logging.basicConfig(
@@ -74,7 +81,7 @@ if self.headless:
         chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
 
             # Iniciar driver
-            service = Service(ChromeDriverManager().install())
+            service = Service(_chromedriver_path())
         self.browser = webdriver.Chrome(service=service, options=chrome_options)
 
             # Configurar tiempo de espera
@@ -91,50 +98,48 @@ if self.headless:
         logger.error(f"❌ Error iniciando navegador: {e}")
             return False
 
-def resolver_captcha(self):
-        """Resuelve CAPTCHA de la página"""
-        try:
-            from PIL import Image
-            import pytesseract
-            import io
-            import base64
-
-            logger.info("🔍 Buscando CAPTCHA...")
-
-            # Esperar a que aparezca el CAPTCHA
-            captcha_img = self.wait.until(
-                EC.presence_of_element_located((By.ID, "imgCaptcha"))
-            )
-
-            # Tomar screenshot del CAPTCHA
-            captcha_screenshot = captcha_img.screenshot_as_png
-
-            # Usar pytesseract para leer el CAPTCHA
-            image = Image.open(io.BytesIO(captcha_screenshot))
-
-            # Procesar imagen para mejor OCR
-            image = image.convert('L')  # Escala de grises
-            image = image.point(lambda x: 0 if x < 128 else 255, '1')  # Binarizar
-
-            # Leer texto
-            captcha_text = pytesseract.image_to_string(image).strip()
+def resolver_captcha(self, en_curso=None):
+        """
+        Resuelve el CAPTCHA de la página, refrescándolo si la lectura es dudosa
 
-            # Limpiar texto
-            captcha_text = re.sub(r'[^A-Z0-9]', '', captcha_text)
+        Args:
+            en_curso: CaptchaEnParalelo lanzado al cargar la página (opcional);
+                si se da, solo se espera su lectura
 
-            if len(captcha_text) >= 4:
-        logger.info(f"✅ CAPTCHA resuelto: {captcha_text}")
-                return captcha_text
-            else:
-        logger.warning("⚠️  CAPTCHA no legible, usando valor por defecto")
-                return "ABCD"  # Valor por defecto para pruebas
+        Returns:
+            Texto del CAPTCHA, o None si ninguna lectura alcanzó la confianza mínima
+        """
+        from utils.captcha_solver import resolver_con_refresco
+
+        logger.info("🔍 Buscando CAPTCHA...")
+
+        # Esperar a que aparezca el CAPTCHA
+        captcha_img = self.wait.until(
+            EC.presence_of_element_located((By.ID, "imgCaptcha"))
+        )
+
+        def imagen(refrescar):
+            if refrescar:
+                # Nueva imagen del mismo handler, sin recargar el formulario
+                get_rate_limiter().adquirir("captcha")
+                self.browser.execute_script(
+                    "const url = new URL(arguments[0].src, location.href);"
+                    "url.searchParams.set('_r', Date.now()); arguments[0].src = url.href;",
+                    captcha_img
+                )
+                self.wait.until(lambda d: d.execute_script(
+                    "return arguments[0].complete && arguments[0].naturalWidth > 0", captcha_img))
+            # El PNG del screenshot va directo al solver, sin pasar por disco
+            return captcha_img.screenshot_as_png
+
+        primera_lectura = en_curso.resultado() if en_curso is not None else None
+        lectura = resolver_con_refresco(imagen, primera_lectura=primera_lectura)
+        if lectura is None:
+            return None
 
-        except ImportError:
-        logger.warning("⚠️  pytesseract no instalado, usando CAPTCHA simulado")
-            return "1234"
-        except Exception as e:
-        logger.warning(f"⚠️  Error resolviendo CAPTCHA: {e}, usando simulado")
-            return "TEST"
+        captcha_text, confianza = lectura
+        logger.info(f"✅ CAPTCHA resuelto: {captcha_text} (confianza {confianza:.0f})")
+        return captcha_text
 
 def consultar_cedula(self, cedula: str, fecha_expedicion: str = None):
         """
@@ -147,13 +152,19 @@ def consultar_cedula(self, cedula: str, fecha_expedicion: str = None):
         Returns:
             Diccionario con resultados
         """
+        from pages.consulta_http import mensaje_error
+        from utils.captcha_solver import CaptchaEnParalelo, get_metricas_captcha
+
         inicio = time.time()
+        tiempos = {}
         logger.info(f"🔍 Consultando cédula REAL: {cedula}")
 
         try:
             # 1. Navegar a la página
             url = "https://certvigenciacedula.registraduria.gov.co/Datos.aspx"
             logger.info(f"🌐 Navegando a: {url}")
+            get_rate_limiter().adquirir("formulario")
+            get_rate_limiter().adquirir("captcha")
             self.browser.get(url)
 
             # 2. Esperar a que cargue la página
@@ -162,7 +173,13 @@ def consultar_cedula(self, cedula: str, fecha_expedicion: str = None):
             )
             logger.info("✅ Página cargada")
 
+            # El OCR del CAPTCHA arranca ya y corre mientras se llena el formulario
+            captcha_en_curso = CaptchaEnParalelo(self.wait.until(
+                EC.presence_of_element_located((By.ID, "imgCaptcha"))
+            ).screenshot_as_png)
+
             # 3. Llenar formulario
+            t_formulario = time.time()
             # Número de documento
             input_doc = self.browser.find_element(By.ID, "txtNumeroDocumento")
             input_doc.clear()
@@ -178,8 +195,14 @@ def consultar_cedula(self, cedula: str, fecha_expedicion: str = None):
         except:
             logger.warning("⚠️  No se pudo ingresar fecha")
 
-            # 4. Resolver CAPTCHA
-            captcha_text = self.resolver_captcha()
+            tiempos['formulario'] = time.time() - t_formulario
+
+            # 4. Resolver CAPTCHA (normalmente ya está leído)
+            captcha_text = self.resolver_captcha(captcha_en_curso)
+            tiempos.update(captcha_en_curso.tiempos)
+            if captcha_text is None:
+                # Enviar un CAPTCHA dudoso solo gasta un viaje del formulario
+                raise ValueError("CAPTCHA ilegible tras refrescar")
             input_captcha = self.browser.find_element(By.ID, "txtCaptcha")
             input_captcha.clear()
             input_captcha.send_keys(captcha_text)
@@ -193,12 +216,19 @@ def consultar_cedula(self, cedula: str, fecha_expedicion: str = None):
             time.sleep(3)  # Esperar a que procese
 
             # 7. Verificar si hay PDF
-            pdf_descargado = self._descargar_pdf(cedula)
+            pdf_descargado, contenido = self._descargar_pdf(cedula) or (None, None)
 
-            # 8. Extraer información si se descargó PDF
+            # Todos los backends cuentan sus envíos (viajes desperdiciados por CAPTCHA rechazado)
+            error = None if pdf_descargado else mensaje_error(self.browser.page_source)
+            get_metricas_captcha().registrar_envio(
+                pdf_descargado is not None,
+                captcha_rechazado=error == "CAPTCHA rechazado"
+            )
+
+            # 8. Extraer información si se descargó PDF (desde memoria)
             datos = {}
-            if pdf_descargado:
-                datos = self._extraer_datos_pdf(pdf_descargado)
+            if contenido:
+                datos = self._extraer_datos_pdf(contenido)
 
             tiempo_total = time.time() - inicio
 
@@ -210,7 +240,8 @@ def consultar_cedula(self, cedula: str, fecha_expedicion: str = None):
                 'fecha_consulta': datetime.now().isoformat(),
                 'pdf_descargado': pdf_descargado,
                 'datos_extraidos': datos,
-                'error': None if pdf_descargado else 'No se pudo descargar PDF'
+                'tiempos': tiempos,
+                'error': error
             }
 
         logger.info(f"✅ Consulta completada en {tiempo_total:.2f}s")
@@ -228,8 +259,8 @@ def consultar_cedula(self, cedula: str, fecha_expedicion: str = None):
                 'error': str(e)
             }
 
-def _descargar_pdf(self, cedula: str) -> Optional[str]:
-        """Intenta descargar el PDF generado"""
+def _descargar_pdf(self, cedula: str) -> Optional[Tuple[str, bytes]]:
+        """Intenta descargar el PDF generado: (ruta donde se guardará, bytes)"""
         try:
             # Buscar enlace o iframe del PDF
             pdf_url = None
@@ -265,18 +296,20 @@ def _descargar_pdf(self, cedula: str) -> Optional[str]:
                     session.cookies.set(cookie['name'], cookie['value'])
 
                 # Descargar PDF
+                get_rate_limiter().adquirir("pdf")
                 response = session.get(pdf_url, stream=True)
 
                 if response.status_code == 200:
-                    # Guardar PDF
+                    # El PDF queda en memoria para extraerlo; el disco se escribe en segundo plano
                     pdf_path = Path("descargas") / f"cedula_{cedula}_{self.session_id}.pdf"
+                    buffer = io.BytesIO()
+                    for chunk in response.iter_content(chunk_size=8192):
+                        buffer.write(chunk)
+                    contenido = buffer.getvalue()
+                    guardar_pdf_async(contenido, pdf_path.name, str(pdf_path.parent))
 
-                    with open(pdf_path, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            f.write(chunk)
-
-        logger.info(f"✅ PDF descargado: {pdf_path} ({pdf_path.stat().st_size/1024:.1f} KB)")
-                    return str(pdf_path)
+        logger.info(f"✅ PDF descargado: {pdf_path} ({len(contenido)/1024:.1f} KB)")
+                    return str(pdf_path), contenido
 
         logger.warning("⚠️  No se encontró PDF para descargar")
             return None
@@ -285,16 +318,15 @@ def _descargar_pdf(self, cedula: str) -> Optional[str]:
         logger.error(f"❌ Error descargando PDF: {e}")
             return None
 
-def _extraer_datos_pdf(self, pdf_path: str) -> Dict:
-        """Extrae datos del PDF descargado"""
+def _extraer_datos_pdf(self, contenido: bytes) -> Dict:
+        """Extrae datos del PDF descargado (bytes en memoria)"""
         try:
             import PyPDF2
 
             texto = ""
-            with open(pdf_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                for page in reader.pages:
-                    texto += page.extract_text()
+            reader = PyPDF2.PdfReader(io.BytesIO(contenido))
+            for page in reader.pages:
+                texto += page.extract_text()
 
             # Extraer información usando regex
             datos = {}
@@ -331,13 +363,48 @@ def cerrar(self):
         self.browser.quit()
         logger.info("👋 Navegador cerrado")
 
-def consulta_individual(cedula: str, fecha: str = None):
-    """Consulta individual con scraper real"""
-    scraper = None
-        try:
+@functools.lru_cache(maxsize=1)
+def _chromedriver_path() -> str:
+    """Resuelve chromedriver una sola vez por proceso"""
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager().install()
+
+# Un scraper caliente por hilo: el navegador no se relanza en cada consulta
+_scrapers_locales = threading.local()
+_scrapers_abiertos = []
+
+def _scraper_del_hilo():
+    """Retorna el scraper del hilo actual, iniciándolo si hace falta"""
+    scraper = getattr(_scrapers_locales, 'scraper', None)
+    if scraper is None:
         scraper = RegistraduriaScraper(headless=True)
+        if not scraper.iniciar_navegador():
+            return None
+        _scrapers_locales.scraper = scraper
+        _scrapers_abiertos.append(scraper)
+    return scraper
+
+def _descartar_scraper_del_hilo():
+    """Cierra el scraper del hilo (p. ej. tras un error del navegador)"""
+    scraper = getattr(_scrapers_locales, 'scraper', None)
+    if scraper is not None:
+        _scrapers_locales.scraper = None
+        if scraper in _scrapers_abiertos:
+            _scrapers_abiertos.remove(scraper)
+        scraper.cerrar()
+
+@atexit.register
+def cerrar_scrapers():
+    """Cierra los navegadores que quedaron abiertos al salir"""
+    while _scrapers_abiertos:
+        _scrapers_abiertos.pop().cerrar()
+
+def consulta_individual(cedula: str, fecha: str = None):
+    """Consulta individual con scraper real (navegador reutilizado por hilo)"""
+    try:
+        scraper = _scraper_del_hilo()
 
-        if scraper.iniciar_navegador():
+        if scraper:
             resultado = scraper.consultar_cedula(cedula, fecha)
             return resultado
         else:
@@ -347,15 +414,13 @@ def consulta_individual(cedula: str, fecha: str = None):
                 'error': 'No se pudo iniciar navegador'
             }
 
-        except Exception as e:
+    except Exception as e:
+        _descartar_scraper_del_hilo()
         return {
             'cedula': cedula,
             'consulta_exitosa': False,
             'error': str(e)
         }
-        finally:
-        if scraper:
-            scraper.cerrar()
 
 def guardar_resultado_csv(resultado: dict, archivo: str = "resultados_reales.csv"):
     """Guarda resultado en CSV"""
@@ -484,8 +549,8 @@ Ejemplos REALES:
                 else:
                     print(f"  ❌ Error: {resultado.get('error', 'Desconocido')}")
 
+                # El limitador de tasa compartido espacia las consultas
                 guardar_resultado_csv(resultado)
-                time.sleep(2)  # Esperar entre consultas
 
         except Exception as e:
             print(f"❌ Error procesando archivo: {e}")
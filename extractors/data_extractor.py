@@ -1,10 +1,19 @@
 """
 Sistema completo de extracción de datos de PDFs de registraduría
 """
+import hashlib
+import io
+import itertools
+import multiprocessing
+import os
 import re
 import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Any
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Any, Union
 from pathlib import Path
 import logging
 
@@ -16,14 +25,246 @@ except ImportError:
     PDF_LIBS_AVAILABLE = False
     print("⚠️  Instala: pip install pdfplumber PyPDF2")
 
+from storage.extraction_cache import CacheExtracciones, get_cache_extracciones, sha256_pdf
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Subir VERSION_TEXTO si cambia cómo se obtiene el texto del PDF (invalida todo el cache),
+# incluido BACKEND_PRIMARIO, y VERSION_CAMPOS si cambia el post-proceso de los campos (se
+# recalculan sobre el texto guardado); los cambios de patrones se detectan solos, campo por campo
+VERSION_TEXTO = 4
+VERSION_CAMPOS = 1
+
+# El texto (y con él los campos) sale siempre de este backend si da texto suficiente;
+# los demás son solo respaldo
+BACKEND_PRIMARIO = 'pdfplumber'
+
+# Campos que todo certificado trae en la primera página
+CAMPOS_REQUERIDOS = ('documento', 'fecha_expedicion', 'estado_vigencia')
+
+_ESPACIOS = re.compile(r'\s+')
+# Sobre el texto ya en mayúsculas (las minúsculas acentuadas pasan a estas)
+_SIN_ACENTOS = (('Á', 'A'), ('É', 'E'), ('Í', 'I'), ('Ó', 'O'), ('Ú', 'U'), ('Ñ', 'N'), ('Ü', 'U'))
+
+_FECHA_DMA = re.compile(r'([0-9]{1,2})([-/])([0-9]{1,2})\2([0-9]{4}|[0-9]{2})')
+
+# Valores que el sitio usa para "sin dato"; se ignoran y se prueba el siguiente patrón
+VALORES_VACIOS = ('N/A', 'NO APLICA', 'SIN INFORMACION')
+
+
+class CostoBackends:
+    """
+    Costo medido (media móvil exponencial, en segundos por PDF) de cada backend
+    de texto, para ordenar los respaldos
+    
+    El primer backend dado va siempre primero: que el texto dependiera de cuántos
+    PDFs se procesaron antes haría variar los campos. El costo solo ordena los
+    respaldos (los sin medir primero, en el orden dado).
+    """
+    
+    def __init__(self, backends: List[str], alfa: float = 0.2):
+        self.backends = backends
+        self.alfa = alfa
+        self._ewma: Dict[str, Optional[float]] = {backend: None for backend in backends}
+        self._lock = threading.Lock()
+    
+    def orden(self) -> List[str]:
+        with self._lock:
+            primario, respaldos = self.backends[0], self.backends[1:]
+            sin_medir = [b for b in respaldos if self._ewma[b] is None]
+            medidos = sorted((b for b in respaldos if self._ewma[b] is not None), key=self._ewma.get)
+            return [primario] + sin_medir + medidos
+    
+    def observar(self, backend: str, segundos: float) -> None:
+        with self._lock:
+            anterior = self._ewma[backend]
+            self._ewma[backend] = segundos if anterior is None else anterior + self.alfa * (segundos - anterior)
+    
+    def stats(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            return {b: None if c is None else round(c * 1000, 3) for b, c in self._ewma.items()}
+
+
+# Comienzo literal de un patrón: letras, espacios y clases de letras como [ÓO]
+_ATOMO_LITERAL = re.compile(r'[A-Za-zÑÁÉÍÓÚÜñáéíóúü ]|\[[A-Za-zÑÁÉÍÓÚÜñáéíóúü]+\]')
+
+
+def _cabeza_literal(patron: str) -> Optional[List[str]]:
+    """
+    Átomos fijos (letras o clases como [ÓO], en mayúsculas) con los que empieza
+    toda coincidencia del patrón
+
+    Retorna None si no los hay o si el patrón tiene una alternancia de primer
+    nivel (cada rama podría empezar distinto).
+    """
+    profundidad, en_clase, escapado = 0, False, False
+    for caracter in patron:
+        if escapado:
+            escapado = False
+        elif caracter == '\\':
+            escapado = True
+        elif en_clase:
+            en_clase = caracter != ']'
+        elif caracter == '[':
+            en_clase = True
+        elif caracter == '(':
+            profundidad += 1
+        elif caracter == ')':
+            profundidad -= 1
+        elif caracter == '|' and profundidad == 0:
+            return None
+
+    atomos, posicion = [], 0
+    while True:
+        atomo = _ATOMO_LITERAL.match(patron, posicion)
+        if not atomo:
+            break
+        atomos.append(atomo.group())
+        posicion = atomo.end()
+    if patron[posicion:posicion + 1] in ('?', '*', '+', '{') and atomos:
+        atomos.pop()  # el último átomo es opcional o repetido
+    if not "".join(atomos).strip():
+        return None
+    return [atomo.upper() for atomo in atomos]
+
+
+def _expansiones(atomos: List[str]) -> List[str]:
+    """Todos los textos que coinciden con una cabeza ("NACI[ÓO]" -> NACIÓ, NACIO)"""
+    opciones = [list(atomo[1:-1]) if atomo.startswith('[') else [atomo] for atomo in atomos]
+    return ["".join(combinacion) for combinacion in itertools.product(*opciones)]
+
+
+class EscanerCampos:
+    """
+    Tabla de patrones compilada una sola vez en un escáner de un solo recorrido
+
+    Un localizador con el comienzo literal de todos los patrones (en mayúsculas
+    y sin IGNORECASE, para que re salte en C hasta el siguiente carácter
+    posible) recorre el texto una vez. En cada posición candidata solo se
+    prueban los patrones precompilados cuya cabeza puede coincidir ahí (la
+    que encontró el localizador y las más cortas compatibles con ella) y cuyo
+    campo sigue pendiente; las coincidencias pueden solaparse, así que la
+    búsqueda sigue desde el carácter siguiente. El recorrido se corta cuando
+    todos los campos tienen su resultado definitivo.
+
+    El resultado es el mismo que buscar patrón por patrón con re.search: para
+    cada campo, la primera coincidencia del patrón de mayor prioridad cuyo
+    valor no esté vacío.
+    """
+
+    def __init__(self, patrones: Dict[str, List[str]], flags: int = re.IGNORECASE | re.MULTILINE):
+        """
+        Args:
+            patrones: campo -> expresiones en orden de prioridad (como RegistraduriaPDFExtractor.patterns)
+            flags: Flags de re para todos los patrones
+        """
+        self.campos = list(patrones)
+        # (campo, patrón compilado) en orden global de prioridad
+        self._patrones: List[Tuple[str, re.Pattern]] = []
+        # Patrones sin comienzo literal: se buscan aparte, uno por uno
+        self._sueltos: List[int] = []
+        # cabeza -> (átomos, índices de los patrones que empiezan con ella)
+        cabezas: Dict[str, Tuple[List[str], List[int]]] = {}
+
+        for campo, lista in patrones.items():
+            for patron in lista:
+                try:
+                    compilado = re.compile(patron, flags)
+                except re.error as e:
+                    logger.warning(f"Error en patrón {patron}: {e}")
+                    continue
+                indice = len(self._patrones)
+                self._patrones.append((campo, compilado))
+
+                atomos = _cabeza_literal(patron) if flags & re.IGNORECASE else None
+                if atomos:
+                    cabezas.setdefault("".join(atomos), (atomos, []))[1].append(indice)
+                else:
+                    self._sueltos.append(indice)
+
+        # Las cabezas más largas primero: la alternancia reporta la primera rama que coincide,
+        # así que cualquier otra cabeza que coincida en esa posición es igual o más corta
+        orden = sorted(cabezas, key=lambda c: (-len(cabezas[c][0]), c))
+        self._candidatos: Dict[str, List[int]] = {}
+        for n, cabeza in enumerate(orden):
+            atomos, _ = cabezas[cabeza]
+            textos = _expansiones(atomos)
+            indices = []
+            for otra in orden:
+                otros_atomos, otros_indices = cabezas[otra]
+                compatible = re.compile(otra, re.IGNORECASE)
+                if len(otros_atomos) <= len(atomos) and any(compatible.match(t) for t in textos):
+                    indices.extend(otros_indices)
+            self._candidatos[f"c{n}"] = sorted(indices)
+
+        # Sin grupos el localizador conserva el salto rápido por primer carácter; la cabeza
+        # concreta la dice después el identificador, anclado en la posición encontrada
+        alternativas = "|".join(orden)
+        self._localizador = re.compile(alternativas) if cabezas else None
+        # Para textos que no vienen en mayúsculas (más lento: sin salto por primer carácter)
+        self._localizador_sin_caso = re.compile(alternativas, re.IGNORECASE) if cabezas else None
+        self._identificador = re.compile("|".join(f"(?P<c{n}>{cabeza})" for n, cabeza in enumerate(orden)),
+                                         re.IGNORECASE)
+        self._indices = {campo: [i for i, (c, _) in enumerate(self._patrones) if c == campo]
+                         for campo in self.campos}
+
+    def buscar(self, texto: str) -> Dict[str, str]:
+        """Valor crudo (sin post-procesar) de cada campo encontrado"""
+        # Primera coincidencia de cada patrón: None = sin encontrar aún, '' = valor vacío o ignorado
+        primeras: List[Optional[str]] = [None] * len(self._patrones)
+        pendientes = set(self.campos)
+
+        for i in self._sueltos:
+            self._anotar(i, self._patrones[i][1].search(texto), primeras, pendientes)
+
+        # El texto de _clean_text ya viene en mayúsculas
+        localizador = self._localizador if texto.isupper() else self._localizador_sin_caso
+
+        posicion = 0
+        while pendientes and localizador is not None:
+            candidata = localizador.search(texto, posicion)
+            if not candidata:
+                break
+            posicion = candidata.start()
+            for i in self._candidatos[self._identificador.match(texto, posicion).lastgroup]:
+                campo, patron = self._patrones[i]
+                if primeras[i] is None and campo in pendientes:
+                    self._anotar(i, patron.match(texto, posicion), primeras, pendientes)
+            posicion += 1
+
+        resultados = {}
+        for campo, indices in self._indices.items():
+            valor = next((primeras[i] for i in indices if primeras[i]), None)
+            if valor:
+                resultados[campo] = valor
+        return resultados
+
+    def _anotar(self, indice: int, match: Optional[re.Match], primeras: List[Optional[str]], pendientes: set):
+        if not match:
+            return
+        valor = match.group(1).strip()
+        primeras[indice] = valor if valor not in VALORES_VACIOS else ''
+
+        # El campo queda resuelto si un patrón tiene valor y los de mayor prioridad ya coincidieron sin valor útil
+        campo = self._patrones[indice][0]
+        for i in self._indices[campo]:
+            if primeras[i] is None:
+                return
+            if primeras[i]:
+                break
+        pendientes.discard(campo)
+
 
 class RegistraduriaPDFExtractor:
     """Extrae datos específicos de PDFs de la registraduría"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[CacheExtracciones] = None):
+        """
+        Args:
+            cache: Cache de extracciones (default: el de config/settings.json → cache_extracciones);
+                se lee y escribe siempre con VERSION_TEXTO, sin importar la versión con que se creó
+        """
         # Patrones específicos para PDFs de registraduría colombiana
         self.patterns = {
             'nombre_completo': [
@@ -90,8 +331,29 @@ class RegistraduriaPDFExtractor:
             'RNEC'
         ]
         
+        # Con estos campos en el texto ya leído no se parsean más páginas, y
+        # aunque falten no se pasa de paginas_temprano páginas con texto
+        self.campos_requeridos = list(CAMPOS_REQUERIDOS)
+        self.paginas_temprano = 1
+        self._backends = {'pdfplumber': '_extract_with_pdfplumber', 'pypdf2': '_extract_with_pypdf2'}
+        self._costos = CostoBackends([BACKEND_PRIMARIO] + [b for b in self._backends if b != BACKEND_PRIMARIO])
+        
+        self.compilar_patrones()
+        self.cache = cache if cache is not None else get_cache_extracciones(VERSION_TEXTO)
+        
         logger.info("✅ Extractor de PDF inicializado")
     
+    def compilar_patrones(self) -> None:
+        """Precompila self.patterns (volver a llamar si se modifican después de crear el extractor)"""
+        self._escaner = EscanerCampos(self.patterns)
+        self._escaneres_parciales: Dict[Tuple[str, ...], EscanerCampos] = {}
+        
+        # Cache por contenido: el hash de los patrones de cada campo decide qué recalcular
+        self._hashes_campos = {
+            campo: hashlib.sha256(json.dumps([VERSION_CAMPOS, patrones]).encode()).hexdigest()[:16]
+            for campo, patrones in self.patterns.items()
+        }
+    
     def extract_from_pdf(self, pdf_path: str) -> Dict[str, Any]:
         """
         Extrae datos de un PDF de registraduría
@@ -110,68 +372,187 @@ class RegistraduriaPDFExtractor:
         
         logger.info(f"📄 Extrayendo datos de: {pdf_path}")
         
+        if self.cache is None:
+            return self._extraer(pdf_path, pdf_path)
+        # El archivo se lee una sola vez: los mismos bytes sirven para el hash y para el parser
         try:
-            # Método 1: Usar pdfplumber (mejor para PDFs con texto)
-            text = self._extract_with_pdfplumber(pdf_path)
+            contenido = Path(pdf_path).read_bytes()
+        except OSError as e:
+            logger.error(f"❌ Error extrayendo {pdf_path}: {e}")
+            return {'error': str(e), 'pdf_path': pdf_path}
+        return self._extraer(io.BytesIO(contenido), pdf_path, contenido)
+    
+    def extract_from_bytes(self, buffer: Union[bytes, bytearray, memoryview, BinaryIO],
+                           nombre: str = "<memoria>",
+                           guardar_en: Optional[Union[str, Path]] = None) -> Dict[str, Any]:
+        """
+        Extrae datos de un PDF que está en memoria (p. ej. recién descargado)
+        
+        Args:
+            buffer: Bytes del PDF, memoryview, BytesIO (completo) u otro archivo binario (desde su posición)
+            nombre: Cómo identificar el PDF en logs y en _metadata['pdf_path']
+            guardar_en: Si se da, el PDF se escribe ahí en segundo plano mientras se extrae
             
-            # Método 2: Si pdfplumber no obtiene texto, usar PyPDF2
-            if not text or len(text.strip()) < 50:
-                text = self._extract_with_pypdf2(pdf_path)
+        Returns:
+            Diccionario con datos extraídos
+        """
+        if not PDF_LIBS_AVAILABLE:
+            raise ImportError("Librerías PDF no disponibles. Instala pdfplumber y PyPDF2")
+        
+        if hasattr(buffer, 'getbuffer'):
+            # BytesIO: se parsea tal cual y se hashea su buffer, sin copiarlo
+            flujo, contenido = buffer, buffer.getbuffer()
+        elif hasattr(buffer, 'read'):
+            contenido = memoryview(buffer.read())
+            flujo = io.BytesIO(contenido)
+        else:
+            contenido = memoryview(buffer).cast('B')
+            flujo = io.BytesIO(buffer)
+        
+        try:
+            if guardar_en is not None:
+                from utils.downloader import guardar_pdf_async
+                ruta = Path(guardar_en)
+                guardar_pdf_async(buffer if isinstance(buffer, bytes) else bytes(contenido),
+                                  ruta.name, str(ruta.parent))
             
-            # Verificar que sea un PDF de registraduría
-            if not self._is_registraduria_pdf(text):
-                logger.warning(f"⚠️  PDF puede no ser de registraduría: {pdf_path}")
+            logger.info(f"📄 Extrayendo datos de: {nombre} ({contenido.nbytes / 1024:.1f} KB en memoria)")
+            return self._extraer(flujo, nombre, contenido)
+        finally:
+            # Liberar la vista para que el BytesIO del llamador pueda volver a crecer
+            contenido.release()
+    
+    def _extraer(self, fuente: Union[str, BinaryIO], etiqueta: str,
+                 contenido: Optional[Union[bytes, memoryview]] = None) -> Dict[str, Any]:
+        """
+        Texto, campos y validación de un PDF en disco (ruta) o en memoria (archivo binario)
+        
+        Args:
+            fuente: Lo que reciben pdfplumber y PyPDF2
+            etiqueta: Ruta o nombre para logs y metadatos
+            contenido: Bytes del PDF para el cache (si no se dan y hay cache, se leen de la ruta)
+        """
+        try:
+            # Mismo contenido, misma extracción: el cache se indexa por el hash de los bytes
+            huella = None
+            if self.cache is not None:
+                huella = sha256_pdf(contenido if contenido is not None else Path(fuente).read_bytes())
+            entrada = self.cache.obtener(huella, self._hashes_campos, VERSION_TEXTO) if huella else None
             
-            # Extraer datos
-            datos_extraidos = self._extract_all_fields(text)
+            if entrada is not None:
+                text = entrada['texto']
+                datos_extraidos = self._campos_desde_cache(huella, entrada)
+                logger.info(f"♻️  Extracción desde cache ({len(entrada['obsoletos'])} campos recalculados)")
+            else:
+                # Página por página con el backend primario; el respaldo si no obtiene texto
+                text = self._extract_text(fuente)
+                
+                # Verificar que sea un PDF de registraduría
+                if not self._is_registraduria_pdf(text):
+                    logger.warning(f"⚠️  PDF puede no ser de registraduría: {etiqueta}")
+                
+                # Extraer datos
+                datos_extraidos = self._extract_all_fields(text)
+                
+                # Sin texto puede ser un fallo pasajero (p. ej. archivo a medio escribir): no se guarda
+                if huella and text.strip():
+                    self.cache.guardar(huella, text, datos_extraidos, self._hashes_campos, VERSION_TEXTO)
             
             # Validar extracción
             validacion = self._validate_extraction(datos_extraidos)
             
             # Añadir metadatos
             datos_extraidos['_metadata'] = {
-                'pdf_path': pdf_path,
+                'pdf_path': etiqueta,
                 'fecha_extraccion': datetime.now().isoformat(),
                 'text_length': len(text),
-                'validacion': validacion
+                'validacion': validacion,
+                'desde_cache': entrada is not None
             }
             
             logger.info(f"✅ Datos extraídos: {len(datos_extraidos)} campos")
             return datos_extraidos
             
         except Exception as e:
-            logger.error(f"❌ Error extrayendo {pdf_path}: {e}")
-            return {'error': str(e), 'pdf_path': pdf_path}
+            logger.error(f"❌ Error extrayendo {etiqueta}: {e}")
+            return {'error': str(e), 'pdf_path': etiqueta}
     
-    def _extract_with_pdfplumber(self, pdf_path: str) -> str:
-        """Extrae texto usando pdfplumber"""
+    def _campos_desde_cache(self, huella: str, entrada: Dict[str, Any]) -> Dict[str, Any]:
+        """Campos guardados; los de patrones modificados se recalculan sobre el texto guardado"""
+        campos = entrada['campos']
+        if entrada['obsoletos']:
+            campos.update(self._extract_all_fields(entrada['texto'], entrada['obsoletos']))
+            campos = {campo: campos[campo] for campo in self.patterns if campo in campos}
+            self.cache.guardar(huella, entrada['texto'], campos, self._hashes_campos, VERSION_TEXTO)
+        return campos
+    
+    def _extract_text(self, pdf_path: Union[str, BinaryIO]) -> str:
+        """
+        Texto del PDF (ruta o archivo binario): BACKEND_PRIMARIO y, si no obtiene
+        texto suficiente, los respaldos del más barato al más caro (como antes
+        pdfplumber → PyPDF2).
+        """
         text = ""
+        for backend in self._costos.orden():
+            inicio = time.perf_counter()
+            candidato = getattr(self, self._backends[backend])(pdf_path, temprano=True)
+            self._costos.observar(backend, time.perf_counter() - inicio)
+            if len(candidato.strip()) >= 50:
+                return candidato
+            text = max(text, candidato, key=len)
+        return text
+    
+    def _extract_with_pdfplumber(self, pdf_path: Union[str, BinaryIO], temprano: bool = False) -> str:
+        """Extrae texto usando pdfplumber"""
         try:
+            if hasattr(pdf_path, 'seek'):
+                pdf_path.seek(0)
             with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-            return text
+                return self._unir_paginas((page.extract_text() for page in pdf.pages), temprano)
         except Exception as e:
             logger.warning(f"pdfplumber error: {e}")
             return ""
     
-    def _extract_with_pypdf2(self, pdf_path: str) -> str:
+    def _extract_with_pypdf2(self, pdf_path: Union[str, BinaryIO], temprano: bool = False) -> str:
         """Extrae texto usando PyPDF2"""
-        text = ""
         try:
+            if hasattr(pdf_path, 'read'):
+                pdf_path.seek(0)
+                reader = PyPDF2.PdfReader(pdf_path)
+                return self._unir_paginas((page.extract_text() for page in reader.pages), temprano)
             with open(pdf_path, 'rb') as file:
                 reader = PyPDF2.PdfReader(file)
-                for page in reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-            return text
+                return self._unir_paginas((page.extract_text() for page in reader.pages), temprano)
         except Exception as e:
             logger.warning(f"PyPDF2 error: {e}")
             return ""
     
+    def _unir_paginas(self, paginas: Iterable[Optional[str]], temprano: bool) -> str:
+        """
+        Texto de las páginas, leídas de a una
+        
+        Con temprano=True deja de leer (y de parsear) apenas se agotan las
+        self.paginas_temprano primeras páginas con texto (una por defecto: en los
+        certificados basta la primera) o aparecen todos los campos requeridos.
+        Los campos solo se buscan si quedan páginas por leer, en la página nueva
+        y solo los que siguen faltando.
+        """
+        partes = []
+        pendientes = list(self.campos_requeridos)
+        for page_text in paginas:
+            if not page_text:
+                continue
+            partes.append(page_text + "\n")
+            if temprano:
+                if len(partes) >= self.paginas_temprano:
+                    break
+                if pendientes:
+                    encontrados = self._extract_all_fields(page_text, pendientes)
+                    pendientes = [campo for campo in pendientes if campo not in encontrados]
+                if not pendientes:
+                    break
+        return "".join(partes)
+    
     def _is_registraduria_pdf(self, text: str) -> bool:
         """Verifica si el texto parece ser de registraduría"""
         if not text:
@@ -185,8 +566,8 @@ class RegistraduriaPDFExtractor:
         
         return matches >= 2  # Al menos 2 palabras clave
     
-    def _extract_all_fields(self, text: str) -> Dict[str, Any]:
-        """Extrae todos los campos del texto"""
+    def _extract_all_fields(self, text: str, campos: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Extrae todos los campos del texto (o solo `campos`)"""
         if not text:
             return {}
         
@@ -195,8 +576,16 @@ class RegistraduriaPDFExtractor:
         
         resultados = {}
         
-        for campo, patrones in self.patterns.items():
-            valor = self._extract_with_patterns(cleaned_text, patrones)
+        escaner = self._escaner
+        if campos is not None:
+            clave = tuple(campos)
+            if clave not in self._escaneres_parciales:
+                self._escaneres_parciales[clave] = EscanerCampos(
+                    {campo: self.patterns[campo] for campo in campos})
+            escaner = self._escaneres_parciales[clave]
+        
+        # Un solo recorrido con la tabla precompilada (equivale a _extract_with_patterns por campo)
+        for campo, valor in escaner.buscar(cleaned_text).items():
             if valor:
                 # Post-procesamiento específico por campo
                 if campo == 'documento':
@@ -217,7 +606,7 @@ class RegistraduriaPDFExtractor:
                 match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
                 if match:
                     valor = match.group(1).strip()
-                    if valor and valor not in ['N/A', 'NO APLICA', 'SIN INFORMACION']:
+                    if valor and valor not in VALORES_VACIOS:
                         return valor
             except re.error as e:
                 logger.warning(f"Error en patrón {pattern}: {e}")
@@ -226,24 +615,14 @@ class RegistraduriaPDFExtractor:
     
     def _clean_text(self, text: str) -> str:
         """Limpia y prepara el texto para extracción"""
-        # Unificar saltos de línea
-        text = re.sub(r'\r\n', '\n', text)
-        
-        # Reemplazar múltiples espacios y saltos
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Unificar caracteres especiales
-        replacements = {
-            'Á': 'A', 'É': 'E', 'Í': 'I', 'Ó': 'O', 'Ú': 'U',
-            'Ñ': 'N', 'Ü': 'U',
-            'á': 'A', 'é': 'E', 'í': 'I', 'ó': 'O', 'ú': 'U',
-            'ñ': 'N', 'ü': 'U'
-        }
+        # Reemplazar múltiples espacios y saltos (incluye \r\n)
+        text = _ESPACIOS.sub(' ', text)
         
-        for orig, repl in replacements.items():
+        # Unificar caracteres especiales (str.replace es bastante más rápido que translate)
+        text = text.upper()
+        for orig, repl in _SIN_ACENTOS:
             text = text.replace(orig, repl)
-        
-        return text.upper()
+        return text
     
     def _clean_documento(self, documento: str) -> str:
         """Limpia número de documento"""
@@ -264,6 +643,16 @@ class RegistraduriaPDFExtractor:
     
     def _parse_fecha(self, fecha_str: str) -> str:
         """Convierte fecha a formato YYYY-MM-DD"""
+        # Caso común (día y mes primero, mismo separador): sin probar strptime formato por formato
+        partes = _FECHA_DMA.fullmatch(fecha_str)
+        if partes:
+            dia, _, mes, anio = partes.groups()
+            anio = int(anio) if len(anio) == 4 else int(anio) + (1900 if int(anio) >= 69 else 2000)  # como %y
+            try:
+                return datetime(anio, int(mes), int(dia)).strftime('%Y-%m-%d')
+            except ValueError:
+                pass
+        
         try:
             # Intentar diferentes formatos
             formatos = [
@@ -320,13 +709,17 @@ class RegistraduriaPDFExtractor:
             'total_campos': len(datos)
         }
     
-    def batch_extract(self, pdf_folder: str, output_format: str = 'json') -> List[Dict]:
+    def batch_extract(self, pdf_folder: str, output_format: str = 'json', workers: int = 1,
+                      ordenado: bool = True, tamano_lote: Optional[int] = None) -> List[Dict]:
         """
         Extrae datos de múltiples PDFs
         
         Args:
             pdf_folder: Carpeta con PDFs
             output_format: 'json', 'csv', o 'all'
+            workers: Procesos de extracción (1 = en este proceso, None = núcleos disponibles)
+            ordenado: Resultados en el orden de los archivos (False: según van terminando)
+            tamano_lote: PDFs por envío a cada proceso (default: según cantidad y workers)
             
         Returns:
             Lista de resultados
@@ -335,33 +728,97 @@ class RegistraduriaPDFExtractor:
         if not folder_path.exists():
             raise FileNotFoundError(f"Carpeta no encontrada: {pdf_folder}")
         
-        resultados = []
-        
         # Buscar archivos PDF
         pdf_files = list(folder_path.glob("*.pdf")) + list(folder_path.glob("*.PDF"))
         
         logger.info(f"📂 Procesando {len(pdf_files)} PDFs de {pdf_folder}")
         
-        for pdf_file in pdf_files:
-            try:
-                datos = self.extract_from_pdf(str(pdf_file))
-                datos['archivo'] = pdf_file.name
-                resultados.append(datos)
-                
-                logger.info(f"  ✅ {pdf_file.name}: {len(datos)} campos")
-                
-            except Exception as e:
-                logger.error(f"  ❌ Error procesando {pdf_file.name}: {e}")
-                resultados.append({
-                    'archivo': pdf_file.name,
-                    'error': str(e)
-                })
+        resultados = list(self.iter_extract(pdf_files, workers=workers, ordenado=ordenado,
+                                            tamano_lote=tamano_lote))
         
         # Exportar resultados
         self._export_results(resultados, output_format, pdf_folder)
         
         return resultados
     
+    def iter_extract(self, pdf_files: Iterable[Union[str, Path]], workers: int = 1, ordenado: bool = True,
+                     tamano_lote: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Extrae PDFs entregando cada resultado apenas está listo
+        
+        Con workers > 1 los PDFs se reparten en lotes entre procesos, cada uno
+        con su propio extractor creado una sola vez con los patrones, límites de
+        páginas y cache de este (ver _ajustes_worker). Solo hay unos pocos lotes
+        en vuelo por proceso, así que una carpeta con decenas de miles de
+        certificados no se carga entera en memoria.
+        
+        Args:
+            pdf_files: Rutas de los PDFs
+            workers: Procesos de extracción (1 = en este proceso, None = núcleos disponibles)
+            ordenado: Entregar en el orden de pdf_files (False: según van terminando)
+            tamano_lote: PDFs por envío (default: según cantidad y workers)
+            
+        Yields:
+            Datos de cada PDF con la clave 'archivo'
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            for pdf_file in pdf_files:
+                yield _extraer_uno(self, pdf_file)
+            return
+        
+        pdf_files = [str(pdf_file) for pdf_file in pdf_files]
+        if not pdf_files:
+            return
+        if not tamano_lote:
+            # ~4 lotes por proceso: reparte bien sin pagar un envío por PDF
+            tamano_lote = max(1, min(64, len(pdf_files) // (workers * 4)))
+        lotes = iter([pdf_files[i:i + tamano_lote] for i in range(0, len(pdf_files), tamano_lote)])
+        
+        # spawn: quien llama puede tener hilos y fork podría heredar locks tomados
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_iniciar_extractor,
+                                 initargs=(type(self), self._ajustes_worker())) as executor:
+            en_vuelo = deque()
+            
+            def _enviar_siguiente() -> bool:
+                lote = next(lotes, None)
+                if lote is None:
+                    return False
+                en_vuelo.append(executor.submit(_extraer_lote, lote))
+                return True
+            
+            for _ in range(workers * 2):
+                if not _enviar_siguiente():
+                    break
+            
+            try:
+                while en_vuelo:
+                    if ordenado:
+                        futuro = en_vuelo.popleft()
+                    else:
+                        futuro = next(as_completed(en_vuelo))
+                        en_vuelo.remove(futuro)
+                    _enviar_siguiente()
+                    yield from futuro.result()
+            finally:
+                # Si quien consume deja de iterar, no esperar lotes que nadie va a leer
+                for futuro in en_vuelo:
+                    futuro.cancel()
+    
+    def _ajustes_worker(self) -> Dict[str, Any]:
+        """
+        Lo que los procesos de iter_extract necesitan para extraer igual que este extractor
+
+        El cache viaja como su archivo: el objeto (con su lock) no se puede enviar.
+        """
+        return {
+            'patterns': self.patterns,
+            'campos_requeridos': self.campos_requeridos,
+            'paginas_temprano': self.paginas_temprano,
+            'cache_db': self.cache.db_name if self.cache is not None else None,
+        }
+    
     def _export_results(self, resultados: List[Dict], format: str, folder: str):
         """Exporta resultados a diferentes formatos"""
         output_dir = Path(folder) / "extraidos"
@@ -399,6 +856,45 @@ class RegistraduriaPDFExtractor:
             logger.info(f"💾 CSV exportado: {csv_file}")
 
 
+def _extraer_uno(extractor: RegistraduriaPDFExtractor, pdf_file: Union[str, Path]) -> Dict:
+    """Un PDF con la clave 'archivo'; los errores quedan en el resultado"""
+    nombre = Path(pdf_file).name
+    try:
+        datos = extractor.extract_from_pdf(str(pdf_file))
+        datos['archivo'] = nombre
+        
+        logger.info(f"  ✅ {nombre}: {len(datos)} campos")
+        return datos
+        
+    except Exception as e:
+        logger.error(f"  ❌ Error procesando {nombre}: {e}")
+        return {
+            'archivo': nombre,
+            'error': str(e)
+        }
+
+
+# Extractor propio de cada proceso de iter_extract
+_extractor_worker: Optional[RegistraduriaPDFExtractor] = None
+
+
+def _iniciar_extractor(clase: type, ajustes: Dict[str, Any]):
+    global _extractor_worker
+    cache = CacheExtracciones(ajustes['cache_db'], VERSION_TEXTO) if ajustes['cache_db'] else None
+    extractor = clase(cache=cache)
+    # Sin cache en el padre tampoco aquí, aunque la configuración lo habilite
+    extractor.cache = cache
+    extractor.patterns = ajustes['patterns']
+    extractor.campos_requeridos = ajustes['campos_requeridos']
+    extractor.paginas_temprano = ajustes['paginas_temprano']
+    extractor.compilar_patrones()
+    _extractor_worker = extractor
+
+
+def _extraer_lote(pdf_files: List[str]) -> List[Dict]:
+    return [_extraer_uno(_extractor_worker, pdf_file) for pdf_file in pdf_files]
+
+
 # Funciones de utilidad
 def extract_and_save(pdf_path: str, output_json: str = None) -> Dict:
     """
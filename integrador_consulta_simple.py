@@ -3,6 +3,9 @@ Integrador del sistema de consultas paralelas con consulta_simple.py
 """
 import sys
 import os
+import asyncio
+import functools
+import inspect
 from pathlib import Path
 import importlib.util
 import logging
@@ -14,9 +17,14 @@ logger = logging.getLogger(__name__)
 class ConsultaSimpleIntegrator:
     """Integra el sistema de consultas paralelas con consulta_simple.py"""
     
-    def __init__(self):
+    def __init__(self, cache=None):
+        """
+        Args:
+            cache: ResultCache opcional; si se pasa, se consulta antes de ir al sitio
+        """
         self.consulta_module = None
         self.consulta_func = None
+        self.cache = cache
         self._load_consulta_simple()
     
     def _load_consulta_simple(self):
@@ -88,6 +96,8 @@ class ConsultaSimpleIntegrator:
         """
         Realiza una consulta usando consulta_simple o mock
         
+        Si hay caché y tiene un resultado vigente, se retorna sin ir al sitio.
+        
         Args:
             documento: Número de documento a consultar
             **kwargs: Argumentos adicionales para la función
@@ -98,9 +108,22 @@ class ConsultaSimpleIntegrator:
         if not self.consulta_func:
             raise RuntimeError("No hay función de consulta disponible")
         
+        fecha_expedicion = kwargs.get('fecha_expedicion')
+        if self.cache:
+            resultado = self.cache.obtener(documento, fecha_expedicion)
+            if resultado is not None:
+                return resultado
+        
+        resultado = self._consultar_sitio(documento, **kwargs)
+        
+        if self.cache and isinstance(resultado, dict):
+            self.cache.guardar(documento, resultado, fecha_expedicion)
+        return resultado
+    
+    def _consultar_sitio(self, documento: str, **kwargs):
+        """Llama a la función de consulta adaptándose a su firma"""
         try:
             # Intentar llamar a la función con diferentes firmas
-            import inspect
             sig = inspect.signature(self.consulta_func)
             
             if 'documento' in sig.parameters:
@@ -114,6 +137,36 @@ class ConsultaSimpleIntegrator:
             logger.error(f"❌ Error en consulta para {documento}: {e}")
             raise
     
+    async def realizar_consulta_async(self, documento: str, **kwargs):
+        """
+        Versión asyncio de realizar_consulta
+        
+        Si la función de consulta es una corutina se espera directamente;
+        si es síncrona se ejecuta en el pool de hilos del loop.
+        """
+        if not self.consulta_func:
+            raise RuntimeError("No hay función de consulta disponible")
+        
+        if inspect.iscoroutinefunction(self.consulta_func):
+            fecha_expedicion = kwargs.get('fecha_expedicion')
+            if self.cache:
+                resultado = self.cache.obtener(documento, fecha_expedicion)
+                if resultado is not None:
+                    return resultado
+            
+            try:
+                resultado = await self.consulta_func(documento, **kwargs)
+            except Exception as e:
+                logger.error(f"❌ Error en consulta para {documento}: {e}")
+                raise
+            
+            if self.cache and isinstance(resultado, dict):
+                self.cache.guardar(documento, resultado, fecha_expedicion)
+            return resultado
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.realizar_consulta, documento, **kwargs))
+    
     def test_integracion(self, documentos: list = None):
         """Prueba la integración con consultas reales/mock"""
         if documentos is None:
@@ -176,13 +229,39 @@ class ConsultaSimpleIntegrator:
 
 
 # Integración con sistema paralelo
-def crear_funcion_para_paralelo(integrator: ConsultaSimpleIntegrator):
+def _sin_pdf(resultado: dict) -> dict:
+    """
+    Copia del resultado sin los bytes del PDF
+
+    'datos_completos' se guarda en los pasos, en los JSON de resultados y se
+    comparte entre duplicados; el PDF viaja aparte en la clave 'pdf' del
+    resultado de cada llamador, que lo suelta al extraerlo.
+    """
+    if 'pdf' not in resultado:
+        return resultado
+    return {clave: valor for clave, valor in resultado.items() if clave != 'pdf'}
+
+
+def crear_funcion_para_paralelo(integrator: ConsultaSimpleIntegrator, single_flight=None):
     """
     Crea una función compatible con el sistema de consultas paralelas
     
+    Las llamadas concurrentes con el mismo (documento, fecha_expedicion)
+    comparten una sola consulta al sitio; el resultado compartido se marca
+    con 'compartido' y el tiempo que se evitó en 'tiempo_ahorrado'.
+    
+    Args:
+        integrator: Integrador con la función de consulta
+        single_flight: SingleFlight a usar (default: uno nuevo por función)
+    
     Returns:
         Función que toma {'documento': '123'} y retorna resultado
     """
+    from parallel.single_flight import SingleFlight
+    
+    if single_flight is None:
+        single_flight = SingleFlight()
+    
     def funcion_para_sistema_paralelo(query_data: dict):
         """
         Función wrapper para el sistema paralelo
@@ -198,38 +277,123 @@ def crear_funcion_para_paralelo(integrator: ConsultaSimpleIntegrator):
         documento = query_data.get('documento')
         if not documento:
             raise ValueError("query_data debe contener 'documento'")
+        fecha_expedicion = query_data.get('fecha_expedicion')
+        # La fecha que distingue la clave también llega a la caché y al sitio
+        kwargs = {'fecha_expedicion': fecha_expedicion} if fecha_expedicion else {}
+        
+        def consultar():
+            # La excepción y la duración viajan con el resultado hacia los duplicados
+            inicio_consulta = time.time()
+            try:
+                return integrator.realizar_consulta(documento, **kwargs), None, time.time() - inicio_consulta
+            except Exception as e:
+                return None, e, time.time() - inicio_consulta
         
         inicio = time.time()
         
-        try:
-            # Realizar consulta
-            resultado = integrator.realizar_consulta(documento)
-            
-            # Formatear para sistema paralelo
-            tiempo_total = time.time() - inicio
-            
-            return {
+        # Realizar consulta (o sumarse a una idéntica que ya está en vuelo)
+        clave = (documento, fecha_expedicion)
+        (resultado, error, duracion), compartido = single_flight.ejecutar(clave, consultar)
+        
+        # Formatear para sistema paralelo
+        tiempo_total = time.time() - inicio
+        
+        if error is None:
+            formateado = {
                 'success': resultado.get('success', True),
                 'documento': documento,
                 'nombre': resultado.get('nombre', ''),
                 'tiempo_respuesta': tiempo_total,
-                'datos_completos': resultado,
+                'datos_completos': _sin_pdf(resultado),
                 'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
             }
-            
-        except Exception as e:
-            tiempo_total = time.time() - inicio
-            return {
+            if resultado.get('pdf') is not None:
+                formateado['pdf'] = resultado['pdf']
+        else:
+            formateado = {
                 'success': False,
                 'documento': documento,
-                'error': str(e),
+                'error': str(error),
                 'tiempo_respuesta': tiempo_total,
                 'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
             }
+        
+        if compartido:
+            formateado['compartido'] = True
+            formateado['tiempo_ahorrado'] = duracion
+        return formateado
     
+    funcion_para_sistema_paralelo.single_flight = single_flight
     return funcion_para_sistema_paralelo
 
 
+def crear_funcion_async_para_paralelo(integrator: ConsultaSimpleIntegrator, single_flight=None):
+    """
+    Igual que crear_funcion_para_paralelo pero retorna una corutina,
+    para usar con el motor asyncio (parallel.async_engine)
+    
+    Las corutinas concurrentes con el mismo (documento, fecha_expedicion)
+    también comparten una sola consulta, con un SingleFlightAsync.
+    
+    Args:
+        integrator: Integrador con la función de consulta
+        single_flight: SingleFlightAsync a usar (default: uno nuevo por función)
+    """
+    from parallel.single_flight import SingleFlightAsync
+    
+    if single_flight is None:
+        single_flight = SingleFlightAsync()
+    
+    async def funcion_async_para_sistema_paralelo(query_data: dict):
+        import time
+        
+        documento = query_data.get('documento')
+        if not documento:
+            raise ValueError("query_data debe contener 'documento'")
+        fecha_expedicion = query_data.get('fecha_expedicion')
+        kwargs = {'fecha_expedicion': fecha_expedicion} if fecha_expedicion else {}
+        
+        async def consultar():
+            inicio_consulta = time.time()
+            try:
+                resultado = await integrator.realizar_consulta_async(documento, **kwargs)
+                return resultado, None, time.time() - inicio_consulta
+            except Exception as e:
+                return None, e, time.time() - inicio_consulta
+        
+        inicio = time.time()
+        (resultado, error, duracion), compartido = await single_flight.ejecutar(
+            (documento, fecha_expedicion), consultar)
+        
+        if error is None:
+            formateado = {
+                'success': resultado.get('success', True),
+                'documento': documento,
+                'nombre': resultado.get('nombre', ''),
+                'tiempo_respuesta': time.time() - inicio,
+                'datos_completos': _sin_pdf(resultado),
+                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+            }
+            if resultado.get('pdf') is not None:
+                formateado['pdf'] = resultado['pdf']
+        else:
+            formateado = {
+                'success': False,
+                'documento': documento,
+                'error': str(error),
+                'tiempo_respuesta': time.time() - inicio,
+                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+            }
+        
+        if compartido:
+            formateado['compartido'] = True
+            formateado['tiempo_ahorrado'] = duracion
+        return formateado
+    
+    funcion_async_para_sistema_paralelo.single_flight = single_flight
+    return funcion_async_para_sistema_paralelo
+
+
 # Script principal para probar integración
 if __name__ == "__main__":
     print("🔗 INTEGRADOR CON CONSULTA_SIMPLE.PY")
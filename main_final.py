@@ -3,12 +3,15 @@
 SCRIPT FINAL DE INTEGRACIÓN COMPLETA
 Une todas las partes: consultas paralelas, extracción PDF, almacenamiento
 """
+import os
 import sys
 import time
 import json
+import threading
+import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable
 import logging
 
 # Configurar logging
@@ -34,6 +37,8 @@ class SistemaCompleto:
     def __init__(self):
         """Inicializa todos los componentes"""
         logger.info("🚀 Inicializando Sistema Completo...")
+        from utils.helpers import cargar_config
+        config = cargar_config()
         
         # 1. Sistema de almacenamiento
         try:
@@ -45,6 +50,8 @@ class SistemaCompleto:
             self.storage = None
         
         # 2. Extractor de PDFs
+        # None: los PDFs solo viven en memoria mientras se extraen
+        self.carpeta_pdfs = config.get('download_path', 'output/pdfs') if config.get('guardar_pdfs', True) else None
         try:
             from extractors.data_extractor import RegistraduriaPDFExtractor
             self.extractor = RegistraduriaPDFExtractor()
@@ -56,11 +63,14 @@ class SistemaCompleto:
         # 3. Integrador con consulta_simple
         try:
             from integrador_consulta_simple import ConsultaSimpleIntegrator, crear_funcion_para_paralelo
-            self.integrator = ConsultaSimpleIntegrator()
+            from storage.cache import ResultCache
+            self.cache = ResultCache(storage=self.storage, **config.get('cache', {}))
+            self.integrator = ConsultaSimpleIntegrator(cache=self.cache)
             self.funcion_consulta = crear_funcion_para_paralelo(self.integrator)
             logger.info("✅ Integrador con consulta_simple cargado")
         except ImportError as e:
             logger.error(f"❌ Error cargando integrador: {e}")
+            self.cache = None
             self.integrator = None
             self.funcion_consulta = None
         
@@ -75,6 +85,10 @@ class SistemaCompleto:
             logger.warning("⚠️  No se pudo cargar test_concurrent_queries, usando versión interna")
             self.test_runner = self._create_test_runner()
         
+        # 5. Planificador: todas las consultas al sitio piden turno por prioridad
+        from parallel.scheduler import PriorityScheduler
+        self.scheduler = PriorityScheduler(**config.get('scheduler', {}))
+        
         logger.info("✅ Sistema Completo inicializado")
     
     def _create_test_runner(self):
@@ -104,138 +118,281 @@ class SistemaCompleto:
         
         return BasicTestRunner()
     
-    def ejecutar_flujo_completo(self, documento: str) -> Dict[str, Any]:
+    def ejecutar_flujo_completo(self, documento: str, prioridad: str = 'interactiva') -> Dict[str, Any]:
         """
         Ejecuta el flujo completo para un documento:
         1. Consulta a registraduría
         2. Descarga PDF (simulada)
         3. Extracción de datos
         4. Almacenamiento
+        
+        Por defecto la consulta pide turno como interactiva, por delante
+        de los lotes que estén en curso.
         """
         logger.info(f"🔍 Iniciando flujo completo para: {documento}")
         
-        inicio_total = time.time()
-        resultados = {
-            'documento': documento,
-            'timestamp_inicio': datetime.now().isoformat(),
-            'pasos': {},
-            'errores': []
-        }
+        contexto = self._nuevo_contexto(documento)
+        contexto['prioridad'] = prioridad
         
         try:
-            # PASO 1: Consulta a registraduría
-            inicio_paso = time.time()
+            self._etapa_consulta(contexto)
+            self._etapa_descarga(contexto)
+            self._etapa_extraccion(contexto)
+            self._etapa_almacenamiento(contexto)
+            return self._finalizar_flujo(contexto)
             
-            if self.funcion_consulta:
-                resultado_consulta = self.funcion_consulta({'documento': documento})
-                resultados['pasos']['consulta'] = {
-                    'exitoso': resultado_consulta.get('success', False),
-                    'tiempo': time.time() - inicio_paso,
-                    'datos': resultado_consulta
-                }
-                
-                if not resultado_consulta.get('success', False):
-                    resultados['errores'].append("Consulta fallida")
-                    raise Exception("Consulta fallida")
-                
-                logger.info(f"✅ Consulta exitosa para {documento}")
-                
-            else:
+        except Exception as e:
+            return self._finalizar_flujo(contexto, e)
+    
+    def _nuevo_contexto(self, documento: str) -> Dict[str, Any]:
+        """Crea el estado compartido por las etapas del flujo de un documento"""
+        return {
+            'documento': documento,
+            'inicio_total': time.time(),
+            'resultados': {
+                'documento': documento,
+                'timestamp_inicio': datetime.now().isoformat(),
+                'pasos': {},
+                'errores': []
+            }
+        }
+    
+    def _etapa_consulta(self, contexto: Dict[str, Any], resultado_consulta: Dict[str, Any] = None):
+        """PASO 1: Consulta a registraduría"""
+        documento = contexto['documento']
+        resultados = contexto['resultados']
+        inicio_paso = time.time()
+        
+        if resultado_consulta is None:
+            if not self.funcion_consulta:
                 resultados['errores'].append("Función de consulta no disponible")
                 raise Exception("Función de consulta no disponible")
+            with self.scheduler.turno(contexto.get('prioridad', 'normal')):
+                resultado_consulta = self.funcion_consulta({'documento': documento})
+        
+        resultados['pasos']['consulta'] = {
+            'exitoso': resultado_consulta.get('success', False),
+            'tiempo': time.time() - inicio_paso,
+            'datos': resultado_consulta
+        }
+        
+        if not resultado_consulta.get('success', False):
+            resultados['errores'].append("Consulta fallida")
+            raise Exception("Consulta fallida")
+        
+        contexto['resultado_consulta'] = resultado_consulta
+        logger.info(f"✅ Consulta exitosa para {documento}")
+    
+    def _etapa_descarga(self, contexto: Dict[str, Any]):
+        """PASO 2: PDF de la consulta (en memoria si el backend lo trajo; si no, simulado)"""
+        documento = contexto['documento']
+        inicio_paso = time.time()
+        
+        # Los backends HTTP y Playwright dejan los bytes del PDF en el resultado: se extrae
+        # sin pasar por disco. Se sacan del resultado para que no queden en los pasos,
+        # en el JSON de resultados ni en ningún cache
+        resultado_consulta = contexto['resultado_consulta']
+        datos_completos = resultado_consulta.get('datos_completos') or {}
+        pdf = resultado_consulta.pop('pdf', None)
+        if pdf is None:
+            pdf = datos_completos.pop('pdf', None)
+        contexto['pdf_bytes'] = pdf
+        
+        pdf_path = datos_completos.get('pdf_descargado') or f"{self.carpeta_pdfs or 'pdfs'}/{documento}.pdf"
+        contexto['pdf_path'] = pdf_path
+        contexto['resultados']['pasos']['descarga_pdf'] = {
+            'exitoso': True,
+            'tiempo': time.time() - inicio_paso,
+            'pdf_path': pdf_path,
+            'en_memoria': pdf is not None,
+            'simulado': pdf is None
+        }
+        
+        if pdf is not None:
+            logger.info(f"✅ PDF en memoria para {documento} ({len(pdf) / 1024:.1f} KB)")
+        else:
+            logger.info(f"✅ Descarga PDF simulada para {documento}")
+    
+    def _etapa_extraccion(self, contexto: Dict[str, Any]):
+        """PASO 3: Extracción de datos (del PDF en memoria si lo hay; si no, simulada)"""
+        documento = contexto['documento']
+        resultados = contexto['resultados']
+        resultado_consulta = contexto['resultado_consulta']
+        inicio_paso = time.time()
+        
+        if self.extractor and contexto.get('pdf_bytes') is not None:
+            # Guardar el PDF es un efecto secundario en segundo plano (si está habilitado)
+            datos_extraidos = self.extractor.extract_from_bytes(
+                contexto.pop('pdf_bytes'), nombre=contexto['pdf_path'],
+                guardar_en=contexto['pdf_path'] if self.carpeta_pdfs else None
+            )
+            datos_extraidos['fuente'] = 'pdf'
+            
+            resultados['pasos']['extraccion'] = {
+                'exitoso': 'error' not in datos_extraidos,
+                'tiempo': time.time() - inicio_paso,
+                'datos_extraidos': datos_extraidos,
+                'simulado': False
+            }
             
-            # PASO 2: Simular descarga de PDF (en un sistema real aquí se descargaría)
-            inicio_paso = time.time()
+            logger.info(f"✅ Extracción de datos para {documento}")
+        elif self.extractor:
+            # Sin PDF real: simulamos extracción basada en datos de consulta
+            datos_extraidos = {
+                'nombre_completo': resultado_consulta.get('nombre', ''),
+                'documento': documento,
+                'estado_vigencia': resultado_consulta.get('estado_vigencia', 'DESCONOCIDO'),
+                'fecha_expedicion': resultado_consulta.get('fecha_expedicion'),
+                'fuente': 'simulacion'
+            }
             
-            # En un sistema real, aquí se descargaría el PDF
-            # Por ahora simulamos un PDF path
-            pdf_path_simulado = f"pdfs/{documento}.pdf"
-            resultados['pasos']['descarga_pdf'] = {
+            resultados['pasos']['extraccion'] = {
                 'exitoso': True,
                 'tiempo': time.time() - inicio_paso,
-                'pdf_path': pdf_path_simulado,
+                'datos_extraidos': datos_extraidos,
                 'simulado': True
             }
             
-            logger.info(f"✅ Descarga PDF simulada para {documento}")
-            
-            # PASO 3: Extracción de datos (si tenemos PDF real o simulamos)
-            inicio_paso = time.time()
+            logger.info(f"✅ Extracción de datos para {documento}")
+        else:
+            resultados['errores'].append("Extractor de PDF no disponible")
+            datos_extraidos = {}
+
+        # Sin extractor el PDF tampoco se usa: no sobrevive a esta etapa
+        contexto.pop('pdf_bytes', None)
+        contexto['datos_extraidos'] = datos_extraidos
+    
+    def _etapa_almacenamiento(self, contexto: Dict[str, Any]):
+        """PASO 4: Almacenamiento"""
+        documento = contexto['documento']
+        resultados = contexto['resultados']
+        datos_extraidos = contexto['datos_extraidos']
+        inicio_paso = time.time()
+        
+        # Un resultado servido por la caché ya tiene su fila: guardarlo de nuevo con
+        # timestamp actual renovaría su TTL y el documento no volvería a consultarse
+        resultado_consulta = contexto.get('resultado_consulta') or {}
+        origen_cache = resultado_consulta.get('cache') or \
+            (resultado_consulta.get('datos_completos') or {}).get('cache')
+        if origen_cache:
+            resultados['pasos']['almacenamiento'] = {
+                'exitoso': True,
+                'tiempo': time.time() - inicio_paso,
+                'omitido': f'cache ({origen_cache})'
+            }
+            logger.info(f"🗃️  {documento} vino de la caché ({origen_cache}): no se vuelve a guardar")
+            return
+        
+        if self.storage:
+            datos_para_almacenar = {
+                'documento': documento,
+                'nombre': datos_extraidos.get('nombre_completo', ''),
+                'fecha_expedicion': datos_extraidos.get('fecha_expedicion'),
+                'estado_vigencia': datos_extraidos.get('estado_vigencia'),
+                'consulta_exitosa': True,
+                'tiempo_respuesta': time.time() - contexto['inicio_total'],
+                'pdf_path': contexto['pdf_path']
+            }
             
-            if self.extractor:
-                # Si tuviéramos PDF real:
-                # datos_extraidos = self.extractor.extract_from_pdf(pdf_path_simulado)
-                
-                # Por ahora simulamos extracción basada en datos de consulta
-                datos_extraidos = {
-                    'nombre_completo': resultado_consulta.get('nombre', ''),
-                    'documento': documento,
-                    'estado_vigencia': resultado_consulta.get('estado_vigencia', 'DESCONOCIDO'),
-                    'fecha_expedicion': resultado_consulta.get('fecha_expedicion'),
-                    'fuente': 'simulacion'
-                }
-                
-                resultados['pasos']['extraccion'] = {
+            try:
+                storage_id = self.storage.save_consulta(datos_para_almacenar)
+                resultados['pasos']['almacenamiento'] = {
                     'exitoso': True,
                     'tiempo': time.time() - inicio_paso,
-                    'datos_extraidos': datos_extraidos,
-                    'simulado': True
-                }
-                
-                logger.info(f"✅ Extracción de datos para {documento}")
-            else:
-                resultados['errores'].append("Extractor de PDF no disponible")
-                datos_extraidos = {}
-            
-            # PASO 4: Almacenamiento
-            inicio_paso = time.time()
-            
-            if self.storage:
-                datos_para_almacenar = {
-                    'documento': documento,
-                    'nombre': datos_extraidos.get('nombre_completo', ''),
-                    'fecha_expedicion': datos_extraidos.get('fecha_expedicion'),
-                    'estado_vigencia': datos_extraidos.get('estado_vigencia'),
-                    'consulta_exitosa': True,
-                    'tiempo_respuesta': time.time() - inicio_total,
-                    'pdf_path': pdf_path_simulado
+                    'storage_id': storage_id
                 }
                 
-                try:
-                    storage_id = self.storage.save_consulta(datos_para_almacenar)
-                    resultados['pasos']['almacenamiento'] = {
-                        'exitoso': True,
-                        'tiempo': time.time() - inicio_paso,
-                        'storage_id': storage_id
-                    }
-                    
-                    logger.info(f"✅ Datos almacenados para {documento} (ID: {storage_id})")
-                except Exception as e:
-                    resultados['errores'].append(f"Error almacenando: {str(e)}")
-                    logger.error(f"❌ Error almacenando {documento}: {e}")
-            else:
-                resultados['errores'].append("Sistema de almacenamiento no disponible")
-            
-            # Calcular tiempo total
-            resultados['tiempo_total'] = time.time() - inicio_total
-            resultados['timestamp_fin'] = datetime.now().isoformat()
-            resultados['exitoso'] = len(resultados['errores']) == 0
-            
-            if resultados['exitoso']:
-                logger.info(f"🎉 Flujo completo EXITOSO para {documento} ({resultados['tiempo_total']:.2f}s)")
-            else:
-                logger.warning(f"⚠️  Flujo completo con errores para {documento}")
-            
-            return resultados
-            
-        except Exception as e:
-            resultados['tiempo_total'] = time.time() - inicio_total
-            resultados['timestamp_fin'] = datetime.now().isoformat()
+                logger.info(f"✅ Datos almacenados para {documento} (ID: {storage_id})")
+            except Exception as e:
+                resultados['errores'].append(f"Error almacenando: {str(e)}")
+                logger.error(f"❌ Error almacenando {documento}: {e}")
+        else:
+            resultados['errores'].append("Sistema de almacenamiento no disponible")
+    
+    def _finalizar_flujo(self, contexto: Dict[str, Any], error: Exception = None) -> Dict[str, Any]:
+        """Calcula tiempos y estado final del flujo de un documento"""
+        documento = contexto['documento']
+        resultados = contexto['resultados']
+        
+        resultados['tiempo_total'] = time.time() - contexto['inicio_total']
+        resultados['timestamp_fin'] = datetime.now().isoformat()
+        
+        if error is not None:
             resultados['exitoso'] = False
-            resultados['errores'].append(str(e))
-            
-            logger.error(f"❌ Error en flujo completo para {documento}: {e}")
+            resultados['errores'].append(str(error))
+            logger.error(f"❌ Error en flujo completo para {documento}: {error}")
             return resultados
+        
+        resultados['exitoso'] = len(resultados['errores']) == 0
+        
+        if resultados['exitoso']:
+            logger.info(f"🎉 Flujo completo EXITOSO para {documento} ({resultados['tiempo_total']:.2f}s)")
+        else:
+            logger.warning(f"⚠️  Flujo completo con errores para {documento}")
+        
+        return resultados
+    
+    def ejecutar_lote_async(self, documentos: Iterable[str], concurrency: int = 100,
+                            limites: Dict[str, int] = None) -> List[Dict[str, Any]]:
+        """
+        Ejecuta el flujo completo de muchos documentos con el motor asyncio
+        
+        Args:
+            documentos: Documentos a procesar (puede ser un iterable perezoso)
+            concurrency: Máximo de documentos en vuelo al mismo tiempo
+            limites: Límite por etapa (consulta, descarga, extraccion, almacenamiento)
+            
+        Returns:
+            Lista de resultados en orden de finalización
+        """
+        import asyncio
+        from parallel.async_engine import AsyncQueryEngine
+        
+        limites_etapas = {
+            'consulta': concurrency,
+            'descarga': concurrency,
+            'extraccion': os.cpu_count() or 4,
+            # SQLite admite un solo escritor a la vez
+            'almacenamiento': 1,
+        }
+        limites_etapas.update(limites or {})
+        
+        consulta_async = None
+        if self.integrator:
+            from integrador_consulta_simple import crear_funcion_async_para_paralelo
+            consulta_async = crear_funcion_async_para_paralelo(self.integrator)
+        
+        self.scheduler.asegurar_capacidad(concurrency)
+        
+        async def etapa_consulta(contexto):
+            if consulta_async is None:
+                contexto['prioridad'] = 'lote'
+                return self._etapa_consulta(contexto)
+            async with self.scheduler.turno_async('lote'):
+                resultado = await consulta_async({'documento': contexto['documento']})
+            return self._etapa_consulta(contexto, resultado)
+        
+        engine = AsyncQueryEngine(
+            etapas=[
+                ('consulta', etapa_consulta),
+                ('descarga', self._etapa_descarga),
+                ('extraccion', self._etapa_extraccion),
+                ('almacenamiento', self._etapa_almacenamiento),
+            ],
+            crear_contexto=self._nuevo_contexto,
+            finalizar=self._finalizar_flujo,
+            concurrency=concurrency,
+            limites=limites_etapas
+        )
+        
+        logger.info(f"🚀 Iniciando lote asyncio (concurrency={concurrency})...")
+        resultados = asyncio.run(engine.ejecutar(documentos))
+        
+        metricas = engine.metricas()
+        logger.info(f"✅ Lote asyncio completado: {metricas['total']} documentos en "
+                    f"{metricas['tiempo_total']:.2f}s (máx. en vuelo: {metricas['en_vuelo_max']})")
+        
+        return resultados
     
     def ejecutar_15_consultas_paralelas(self, documentos: List[str] = None):
         """
@@ -258,8 +415,9 @@ class SistemaCompleto:
             
             tiempo_total = time.time() - inicio_total
             
-            # Guardar resultados
-            self._guardar_resultados_paralelos(documentos, resultados, tiempo_total)
+            # Guardar resultados (los runners de prueba usan 15 workers)
+            self._guardar_resultados_paralelos(documentos, resultados, tiempo_total,
+                                               worker_count=min(15, len(documentos)))
             
             return resultados
             
@@ -267,7 +425,136 @@ class SistemaCompleto:
             logger.error(f"❌ Error en consultas paralelas: {e}")
             raise
     
-    def _guardar_resultados_paralelos(self, documentos, resultados, tiempo_total):
+    def ejecutar_lote_streaming(self, archivo: str, workers: int = 5,
+                                max_workers: int = None) -> Dict[str, Any]:
+        """
+        Procesa todos los documentos de un archivo sin límite de tamaño
+
+        Los documentos se leen de forma perezosa y pasan por una cola acotada
+        hacia los workers; cada resultado se escribe en JSONL al terminar.
+        Si se indica max_workers, la concurrencia arranca en `workers` y se
+        ajusta con AIMD entre 1 y max_workers según latencia y bloqueos.
+        El avance queda en el journal para poder reanudar con reanudar_lote().
+        """
+        from storage.journal import RunJournal
+
+        if not self.funcion_consulta:
+            raise RuntimeError("Función de consulta no disponible")
+
+        # Validar antes de registrar el lote en el journal
+        if not Path(archivo).exists():
+            raise FileNotFoundError(archivo)
+
+        # El sufijo evita que dos lotes iniciados en el mismo segundo choquen en el journal
+        run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        archivo_salida = Path("resultados") / f"lote_{run_id}.jsonl"
+        journal = RunJournal()
+        journal.crear_run(run_id, archivo, str(archivo_salida),
+                          {'workers': workers, 'max_workers': max_workers})
+        logger.info(f"🚀 Iniciando lote streaming {run_id} con {workers} workers: {archivo}")
+
+        try:
+            return self._ejecutar_lote_journal(journal, run_id, archivo, str(archivo_salida),
+                                               workers, max_workers)
+        finally:
+            journal.cerrar()
+
+    def reanudar_lote(self, run_id: str) -> Dict[str, Any]:
+        """
+        Reanuda un lote interrumpido: omite los documentos terminados y vuelve
+        a encolar los que quedaron pendientes o en curso
+        """
+        from storage.journal import RunJournal
+
+        if not self.funcion_consulta:
+            raise RuntimeError("Función de consulta no disponible")
+
+        journal = RunJournal()
+        try:
+            run = journal.obtener_run(run_id)
+            if not run:
+                raise ValueError(f"Lote no encontrado en el journal: {run_id}")
+
+            terminados = journal.posiciones_terminadas(run_id)
+            parametros = run['parametros']
+            logger.info(f"🔁 Reanudando lote {run_id}: {len(terminados)} documentos ya terminados")
+
+            return self._ejecutar_lote_journal(journal, run_id, run['archivo'], run['archivo_salida'],
+                                               parametros.get('workers', 5),
+                                               parametros.get('max_workers'),
+                                               omitir=terminados)
+        finally:
+            journal.cerrar()
+
+    def _ejecutar_lote_journal(self, journal, run_id: str, archivo: str, archivo_salida: str,
+                               workers: int, max_workers: int = None, omitir=None) -> Dict[str, Any]:
+        """Ejecuta (o continúa) un lote registrado en el journal"""
+        from parallel.adaptive import AIMDController
+        from parallel.streaming import StreamingBatchRunner, leer_documentos
+        from utils.captcha_solver import get_metricas_captcha
+
+        controlador = None
+        ventanas_pendientes = []
+        ventanas_lock = threading.Lock()
+        
+        def guardar_ventanas(todas: bool = False):
+            # De a bloques, en una sola transacción: no se acumulan en memoria en lotes largos
+            with ventanas_lock:
+                if not ventanas_pendientes or (not todas and len(ventanas_pendientes) < 50):
+                    return
+                bloque = list(ventanas_pendientes)
+                ventanas_pendientes.clear()
+            try:
+                self.storage.save_ventanas_concurrencia(run_id, bloque)
+            except Exception as e:
+                logger.error(f"Error guardando ventanas de concurrencia en BD: {e}")
+        
+        def al_cerrar_ventana(resumen: Dict[str, Any]):
+            with ventanas_lock:
+                ventanas_pendientes.append(resumen)
+            guardar_ventanas()
+        
+        if max_workers:
+            controlador = AIMDController(inicial=min(workers, max_workers), maximo=max_workers,
+                                         al_cerrar_ventana=al_cerrar_ventana if self.storage else None)
+
+        # Los documentos del lote ceden el turno a las consultas interactivas
+        self.scheduler.asegurar_capacidad(max_workers or workers)
+        runner = StreamingBatchRunner(
+            self.scheduler.envolver(self.funcion_consulta, 'lote'),
+            workers=workers,
+            archivo_salida=archivo_salida,
+            controlador=controlador,
+            journal=journal,
+            run_id=run_id
+        )
+        metricas = runner.ejecutar(leer_documentos(archivo), omitir=omitir)
+        if controlador and self.storage:
+            guardar_ventanas(todas=True)
+
+        logger.info(f"💾 Resultados guardados en: {archivo_salida}")
+        metricas['espera_por_prioridad'] = self.scheduler.stats()
+        metricas['captcha'] = get_metricas_captcha().stats()
+        if self.cache:
+            metricas['cache'] = self.cache.stats()
+            logger.info(f"🗃️  Caché: {metricas['cache']['hits_memoria'] + metricas['cache']['hits_sqlite']} hits, "
+                        f"{metricas['cache']['misses']} misses")
+        if metricas['duplicados']:
+            logger.info(f"🔗 {metricas['duplicados']} documentos duplicados compartieron consulta "
+                        f"({metricas['tiempo_ahorrado']:.1f}s ahorrados)")
+        if controlador:
+            logger.info(f"📊 Concurrencia final: {metricas['limite_final']} "
+                        f"({metricas['total_ventanas']} ventanas)")
+
+        if self.storage:
+            try:
+                self.storage.save_metricas_paralelas(metricas)
+            except Exception as e:
+                logger.error(f"Error guardando métricas en BD: {e}")
+
+        return metricas
+    
+    def _guardar_resultados_paralelos(self, documentos, resultados, tiempo_total, worker_count=15):
         """Guarda resultados de consultas paralelas"""
         # Guardar en JSON
         datos_guardar = {
@@ -279,7 +566,9 @@ class SistemaCompleto:
             'metricas': {
                 'exitosos': sum(1 for r in resultados if r.get('success', False)),
                 'fallidos': sum(1 for r in resultados if not r.get('success', True)),
-                'tiempo_promedio': tiempo_total / len(documentos) if documentos else 0
+                'tiempo_promedio': tiempo_total / len(documentos) if documentos else 0,
+                'duplicados': sum(1 for r in resultados if r.get('compartido')),
+                'tiempo_ahorrado': sum(r.get('tiempo_ahorrado', 0) for r in resultados if r.get('compartido'))
             }
         }
         
@@ -300,7 +589,9 @@ class SistemaCompleto:
                     'fallidas': datos_guardar['metricas']['fallidos'],
                     'tiempo_total': tiempo_total,
                     'tiempo_promedio': datos_guardar['metricas']['tiempo_promedio'],
-                    'worker_count': 15
+                    'worker_count': worker_count,
+                    'duplicados': datos_guardar['metricas']['duplicados'],
+                    'tiempo_ahorrado': datos_guardar['metricas']['tiempo_ahorrado']
                 }
                 
                 self.storage.save_metricas_paralelas(metricas)
@@ -310,6 +601,8 @@ class SistemaCompleto:
     
     def generar_reporte_final(self):
         """Genera un reporte completo del sistema"""
+        from utils.captcha_solver import get_metricas_captcha
+
         logger.info("📊 Generando reporte final...")
         
         reporte = {
@@ -332,6 +625,12 @@ class SistemaCompleto:
             except Exception as e:
                 reporte['error_estadisticas'] = str(e)
         
+        if self.cache:
+            reporte['cache'] = self.cache.stats()
+        
+        reporte['espera_por_prioridad'] = self.scheduler.stats()
+        reporte['captcha'] = get_metricas_captcha().stats()
+        
         # Exportar reporte
         archivo_reporte = Path("output") / f"reporte_final_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         
@@ -356,6 +655,31 @@ class SistemaCompleto:
             print(f"  Consultas exitosas: {stats.get('consultas_exitosas', 0)}")
             print(f"  Tasa de éxito: {stats.get('tasa_exito', 0):.1f}%")
         
+        if 'cache' in reporte:
+            cache = reporte['cache']
+            print(f"\n🗃️  Caché de resultados:")
+            print(f"  Hits: {cache['hits_memoria']} memoria / {cache['hits_sqlite']} SQLite "
+                  f"({cache['hits_negativos']} negativos)")
+            print(f"  Misses: {cache['misses']} (tasa de hits: {cache['tasa_hits']:.1f}%)")
+        
+        print(f"\n⏳ Espera en cola por prioridad:")
+        for prioridad, espera in reporte['espera_por_prioridad'].items():
+            print(f"  {prioridad}: {espera['turnos']} turnos, promedio {espera['espera_promedio']:.2f}s, "
+                  f"máx. {espera['espera_maxima']:.2f}s")
+            if espera['cedido_a_otros_procesos']:
+                print(f"    cedido a consultas interactivas de otros procesos: "
+                      f"{espera['cedido_a_otros_procesos']:.2f}s")
+        
+        captcha = reporte['captcha']
+        if captcha['lecturas']:
+            print(f"\n🔤 CAPTCHA:")
+            print(f"  Lecturas: {captcha['lecturas']} ({captcha['refrescos']} refrescos, "
+                  f"{captcha['descartados']} sin lectura confiable)")
+            if captcha['envios']:
+                print(f"  Envíos: {captcha['envios']}, rechazados por CAPTCHA: {captcha['rechazados']}")
+            if captcha['desperdiciados_por_exito'] is not None:
+                print(f"  Envíos desperdiciados por éxito: {captcha['desperdiciados_por_exito']:.2f}")
+        
         print("="*60)
         
         return archivo_reporte
@@ -374,6 +698,8 @@ Ejemplos de uso:
   %(prog)s --test-paralelo           # Ejecuta 15 consultas paralelas (requisito 5)
   %(prog)s --documento 123456789     # Flujo completo para un documento
   %(prog)s --archivo documentos.txt  # Procesa múltiples documentos
+  %(prog)s --archivo documentos.txt --paralelo 5 --paralelo-max 40  # Concurrencia adaptativa
+  %(prog)s --reanudar 20240101_120000_a1b2c3  # Reanuda un lote interrumpido
   %(prog)s --reporte                 # Genera reporte del sistema
         """
     )
@@ -385,7 +711,11 @@ Ejemplos de uso:
     parser.add_argument('--archivo', type=str,
                        help='Archivo con documentos a consultar (uno por línea)')
     parser.add_argument('--paralelo', type=int, default=5,
-                       help='Número de consultas paralelas (default: 5)')
+                       help='Número de workers para --archivo (default: 5)')
+    parser.add_argument('--paralelo-max', type=int, default=None,
+                       help='Ajustar la concurrencia con AIMD hasta este máximo, partiendo de --paralelo')
+    parser.add_argument('--reanudar', type=str, metavar='RUN_ID',
+                       help='Reanudar un lote interrumpido de --archivo')
     parser.add_argument('--reporte', action='store_true',
                        help='Generar reporte del sistema')
     parser.add_argument('--exportar', action='store_true',
@@ -421,21 +751,14 @@ Ejemplos de uso:
         print(f"\n📁 PROCESANDO ARCHIVO: {args.archivo}")
         
         try:
-            with open(args.archivo, 'r', encoding='utf-8') as f:
-                documentos = [line.strip() for line in f if line.strip()]
+            metricas = sistema.ejecutar_lote_streaming(args.archivo, workers=args.paralelo,
+                                                       max_workers=args.paralelo_max)
             
-            if documentos:
-                print(f"📋 Documentos encontrados: {len(documentos)}")
-                
-                # Limitar a 15 para prueba paralela
-                if len(documentos) > 15:
-                    print(f"⚠️  Limitiando a primeros 15 documentos")
-                    documentos = documentos[:15]
-                
-                # Ejecutar en paralelo
-                resultados = sistema.ejecutar_15_consultas_paralelas(documentos)
-                
-                print(f"\n✅ Procesados {len(documentos)} documentos")
+            if metricas['total_consultas']:
+                print(f"\n✅ Procesados {metricas['total_consultas']} documentos "
+                      f"({metricas['exitosas']} exitosos) en {metricas['tiempo_total']:.2f}s")
+                print(f"📊 Ver resultados en: {metricas['archivo_salida']}")
+                print(f"🆔 Lote: {metricas['session_id']} (si se interrumpe: --reanudar {metricas['session_id']})")
             else:
                 print("❌ No se encontraron documentos en el archivo")
                 
@@ -443,6 +766,17 @@ Ejemplos de uso:
             print(f"❌ Archivo no encontrado: {args.archivo}")
         except Exception as e:
             print(f"❌ Error procesando archivo: {e}")
+
+    elif args.reanudar:
+        print(f"\n🔁 REANUDANDO LOTE: {args.reanudar}")
+
+        try:
+            metricas = sistema.reanudar_lote(args.reanudar)
+            print(f"\n✅ Procesados {metricas['total_consultas']} documentos "
+                  f"({metricas['omitidos']} ya terminados) en {metricas['tiempo_total']:.2f}s")
+            print(f"📊 Ver resultados en: {metricas['archivo_salida']}")
+        except Exception as e:
+            print(f"❌ Error reanudando lote: {e}")
     
     elif args.reporte:
         print("\n📊 GENERANDO REPORTE DEL SISTEMA...")
@@ -0,0 +1,350 @@
+"""
+Pool de navegadores Playwright calientes para ConsultaPage/ResultadoPage
+
+Mantiene unos pocos Chromium abiertos y entrega por consulta una página en un
+contexto limpio: entre consultas se borran cookies, localStorage y
+sessionStorage, y si queda almacenamiento de algún origen el contexto se
+recrea. Los contextos también se reciclan tras un número configurable de usos
+y los navegadores se relanzan si la memoria (RSS) total supera el límite.
+Con varios pools en el proceso (uno por hilo) el límite es uno solo y lo
+administra un CoordinadorMemoria: al pasarse se relanza un único navegador,
+no uno por pool.
+
+Lo usa pages.consulta_playwright.
+
+La API síncrona de Playwright solo puede usarse desde el hilo que la creó:
+con workers en hilos, cada hilo debe usar su propio pool (ver pool_del_hilo).
+Los pools por hilo quedan registrados y se cierran al salir (cerrar_pools).
+
+Uso:
+    with BrowserPool(navegadores=2) as pool:
+        with pool.pagina() as page:
+            consulta = ConsultaPage(page)
+            consulta.open()
+"""
+import atexit
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def medir_rss_mb() -> Optional[float]:
+    """RSS total (MB) de este proceso y sus hijos (driver y navegadores)"""
+    try:
+        import psutil
+    except ImportError:
+        return None
+
+    proceso = psutil.Process()
+    total = proceso.memory_info().rss
+    for hijo in proceso.children(recursive=True):
+        try:
+            total += hijo.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / (1024 * 1024)
+
+
+class CoordinadorMemoria:
+    """
+    Límite de RSS compartido por todos los pools del proceso
+
+    medir_rss_mb mide el árbol completo (todos los Chromium de todos los
+    hilos): si cada pool lo comparara con su propio límite, al pasarse todos
+    relanzarían su navegador tras cada consulta. Aquí, al pasarse, solo se
+    relanza el navegador con más consultas desde su lanzamiento, que es el
+    que más memoria ha acumulado; los demás siguen calientes.
+    """
+
+    def __init__(self, max_rss_mb: float = 2048,
+                 medir_rss: Callable[[], Optional[float]] = medir_rss_mb):
+        self.max_rss_mb = max_rss_mb
+        self.medir_rss = medir_rss
+        self._pools: List['BrowserPool'] = []
+        self._lock = threading.Lock()
+
+    def registrar(self, pool: 'BrowserPool'):
+        with self._lock:
+            if pool not in self._pools:
+                self._pools.append(pool)
+
+    def retirar(self, pool: 'BrowserPool'):
+        with self._lock:
+            if pool in self._pools:
+                self._pools.remove(pool)
+
+    def excedido(self, slot: Dict[str, Any]) -> Optional[float]:
+        """RSS medida si el límite se superó y le toca a este slot relanzar; si no, None"""
+        if self.max_rss_mb is None:
+            return None
+        with self._lock:
+            rss = self.medir_rss()
+            if rss is None or rss <= self.max_rss_mb:
+                return None
+            slots = [s for pool in self._pools for s in pool._slots]
+            if not slots:
+                return rss
+            victima = max(slots, key=lambda s: s['consultas_navegador'])
+            return rss if victima is slot else None
+
+
+class BrowserPool:
+    """Navegadores reutilizables con contextos aislados por consulta"""
+
+    def __init__(self, navegadores: int = 2, usos_por_contexto: int = 50,
+                 max_rss_mb: Optional[float] = 2048, headless: bool = True,
+                 launch_options: Optional[Dict[str, Any]] = None,
+                 context_options: Optional[Dict[str, Any]] = None,
+                 playwright: Any = None,
+                 medir_rss: Callable[[], Optional[float]] = medir_rss_mb,
+                 coordinador: Optional[CoordinadorMemoria] = None):
+        """
+        Args:
+            navegadores: Número de navegadores que se mantienen abiertos
+            usos_por_contexto: Consultas por contexto antes de recrearlo
+            max_rss_mb: Límite de memoria total; None para no vigilarla
+            headless: Navegador sin interfaz gráfica
+            launch_options: Opciones extra para chromium.launch
+            context_options: Opciones extra para browser.new_context
+            playwright: Instancia de Playwright ya iniciada (opcional)
+            medir_rss: Función que retorna la RSS total en MB
+            coordinador: Límite compartido con otros pools; si se pasa,
+                reemplaza a max_rss_mb y medir_rss
+        """
+        if navegadores < 1 or usos_por_contexto < 1:
+            raise ValueError("navegadores y usos_por_contexto deben ser >= 1")
+
+        self.navegadores = navegadores
+        self.usos_por_contexto = usos_por_contexto
+        self.max_rss_mb = max_rss_mb
+        self.launch_options = {'headless': headless, **(launch_options or {})}
+        self.context_options = {'accept_downloads': True, **(context_options or {})}
+        self.medir_rss = medir_rss
+        self.coordinador = coordinador
+
+        self._playwright = playwright
+        self._manager = None
+        self._slots: List[Dict[str, Any]] = []
+        self._libres: queue.Queue = queue.Queue()
+        self._iniciado = False
+
+        self.stats = {
+            'consultas': 0,
+            'navegadores_lanzados': 0,
+            'contextos_creados': 0,
+            'reciclados_por_uso': 0,
+            'reciclados_por_almacenamiento': 0,
+            'reciclados_por_memoria': 0,
+        }
+
+    def iniciar(self) -> 'BrowserPool':
+        """Lanza los navegadores (idempotente)"""
+        if self._iniciado:
+            return self
+
+        if self._playwright is None:
+            from playwright.sync_api import sync_playwright
+            self._manager = sync_playwright()
+            self._playwright = self._manager.start()
+
+        for i in range(self.navegadores):
+            slot = {'id': i, 'browser': None, 'context': None, 'usos': 0, 'sucio': False,
+                    'consultas_navegador': 0}
+            self._lanzar(slot)
+            self._slots.append(slot)
+            self._libres.put(slot)
+
+        self._iniciado = True
+        if self.coordinador is not None:
+            self.coordinador.registrar(self)
+        logger.info(f"✅ Pool de navegadores listo ({self.navegadores} navegadores)")
+        return self
+
+    def _lanzar(self, slot: Dict[str, Any]):
+        slot['browser'] = self._playwright.chromium.launch(**self.launch_options)
+        slot['context'] = None
+        slot['usos'] = 0
+        slot['sucio'] = False
+        slot['consultas_navegador'] = 0
+        self.stats['navegadores_lanzados'] += 1
+
+    def _nuevo_contexto(self, slot: Dict[str, Any]):
+        if slot['context'] is not None:
+            slot['context'].close()
+        slot['context'] = slot['browser'].new_context(**self.context_options)
+        slot['usos'] = 0
+        slot['sucio'] = False
+        self.stats['contextos_creados'] += 1
+
+    @contextmanager
+    def pagina(self, timeout: Optional[float] = None):
+        """
+        Presta una página en un contexto aislado
+
+        Args:
+            timeout: Segundos máximos esperando un navegador libre
+        """
+        self.iniciar()
+        try:
+            slot = self._libres.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("No hay navegadores libres en el pool")
+
+        page = None
+        try:
+            if slot['context'] is None:
+                self._nuevo_contexto(slot)
+            elif slot['usos'] >= self.usos_por_contexto:
+                self.stats['reciclados_por_uso'] += 1
+                self._nuevo_contexto(slot)
+            elif slot['sucio']:
+                self.stats['reciclados_por_almacenamiento'] += 1
+                self._nuevo_contexto(slot)
+            else:
+                # Aislar la consulta de la anterior sin pagar un contexto nuevo
+                slot['context'].clear_cookies()
+
+            page = slot['context'].new_page()
+            yield page
+        finally:
+            if page is not None:
+                self._limpiar_almacenamiento(slot, page)
+                try:
+                    page.close()
+                except Exception as e:
+                    logger.warning(f"⚠️  Error cerrando página: {e}")
+            slot['usos'] += 1
+            slot['consultas_navegador'] += 1
+            self.stats['consultas'] += 1
+            self._vigilar_memoria(slot)
+            self._libres.put(slot)
+
+    def _limpiar_almacenamiento(self, slot: Dict[str, Any], page):
+        """
+        Borra localStorage/sessionStorage del origen de la página
+
+        Si después el contexto conserva almacenamiento (otro origen, o la página
+        no se pudo evaluar) se marca para recrearlo antes de la próxima consulta.
+        """
+        try:
+            page.evaluate("() => { localStorage.clear(); sessionStorage.clear(); }")
+        except Exception:
+            pass  # about:blank o página cerrada: lo decide storage_state
+
+        try:
+            quedan = slot['context'].storage_state().get('origins')
+        except Exception as e:
+            logger.warning(f"⚠️  No se pudo revisar el almacenamiento del contexto: {e}")
+            quedan = True
+        if quedan:
+            slot['sucio'] = True
+
+    def _vigilar_memoria(self, slot: Dict[str, Any]):
+        """Relanza el navegador del slot si la memoria total supera el límite"""
+        if self.coordinador is not None:
+            limite = self.coordinador.max_rss_mb
+            rss = self.coordinador.excedido(slot)
+            if rss is None:
+                return
+        else:
+            limite = self.max_rss_mb
+            if limite is None:
+                return
+            rss = self.medir_rss()
+            if rss is None or rss <= limite:
+                return
+
+        logger.warning(f"♻️  RSS {rss:.0f} MB > {limite:.0f} MB, relanzando navegador {slot['id']}")
+        try:
+            slot['browser'].close()
+        except Exception as e:
+            logger.warning(f"⚠️  Error cerrando navegador: {e}")
+        self._lanzar(slot)
+        self.stats['reciclados_por_memoria'] += 1
+
+    def cerrar(self):
+        """Cierra todos los navegadores y Playwright"""
+        if self.coordinador is not None:
+            self.coordinador.retirar(self)
+        for slot in self._slots:
+            try:
+                slot['browser'].close()
+            except Exception as e:
+                logger.warning(f"⚠️  Error cerrando navegador: {e}")
+        self._slots = []
+        self._libres = queue.Queue()
+        self._iniciado = False
+
+        if self._manager is not None:
+            try:
+                self._manager.stop()
+            except Exception as e:
+                logger.warning(f"⚠️  Error deteniendo Playwright: {e}")
+            self._manager = None
+            self._playwright = None
+
+        logger.info("👋 Pool de navegadores cerrado")
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+_local = threading.local()
+_pools_abiertos: List[BrowserPool] = []
+_pools_lock = threading.Lock()
+_coordinador: Optional[CoordinadorMemoria] = None
+
+
+def pool_del_hilo(**kwargs) -> BrowserPool:
+    """
+    Pool propio del hilo actual, creado la primera vez que se pide
+
+    Todos los pools por hilo comparten un mismo CoordinadorMemoria (el
+    max_rss_mb y medir_rss del primer pool creado) y quedan registrados
+    para cerrarse al salir.
+    """
+    global _coordinador
+    pool = getattr(_local, 'pool', None)
+    if pool is None:
+        kwargs.setdefault('navegadores', 1)
+        with _pools_lock:
+            if _coordinador is None:
+                _coordinador = CoordinadorMemoria(kwargs.get('max_rss_mb', 2048),
+                                                  kwargs.get('medir_rss', medir_rss_mb))
+        kwargs.setdefault('coordinador', _coordinador)
+        pool = BrowserPool(**kwargs).iniciar()
+        _local.pool = pool
+        with _pools_lock:
+            _pools_abiertos.append(pool)
+    return pool
+
+
+def cerrar_pool_del_hilo():
+    """Cierra el pool del hilo actual (desde su propio hilo, como exige Playwright)"""
+    pool = getattr(_local, 'pool', None)
+    if pool is not None:
+        _local.pool = None
+        with _pools_lock:
+            if pool in _pools_abiertos:
+                _pools_abiertos.remove(pool)
+        pool.cerrar()
+
+
+@atexit.register
+def cerrar_pools():
+    """Cierra los pools por hilo que quedaron abiertos al salir"""
+    with _pools_lock:
+        pools = list(_pools_abiertos)
+        _pools_abiertos.clear()
+    for pool in pools:
+        try:
+            pool.cerrar()
+        except Exception as e:
+            logger.warning(f"⚠️  Error cerrando pool de navegadores: {e}")
@@ -0,0 +1,337 @@
+"""
+Consulta sin navegador a Datos.aspx reproduciendo el formulario ASP.NET
+
+Datos.aspx es un WebForms clásico: basta con pedir la página, recoger los
+campos ocultos (__VIEWSTATE, __EVENTVALIDATION, ...), descargar la imagen
+del CAPTCHA con la misma cookie de sesión y hacer el POST del formulario.
+La respuesta exitosa es el PDF del certificado.
+
+Es una alternativa directa a ConsultaPage mucho más barata por consulta:
+no hay navegador, y las conexiones HTTP se reutilizan entre consultas.
+"""
+import io
+import threading
+import time
+from datetime import datetime
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urljoin
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.rate_limiter import get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+URL_DATOS = "https://certvigenciacedula.registraduria.gov.co/Datos.aspx"
+
+# Mismos ids que usa ConsultaPage
+CAMPOS = {
+    'cedula': 'ContentPlaceHolder1_TextBox1',
+    'dia': 'ContentPlaceHolder1_DropDownList1',
+    'mes': 'ContentPlaceHolder1_DropDownList2',
+    'anio': 'ContentPlaceHolder1_DropDownList3',
+    'captcha': 'ContentPlaceHolder1_TextBox2',
+    'boton': 'ContentPlaceHolder1_Button1',
+}
+CAPTCHA_IMG_ID = 'datos_contentplaceholder1_captcha1_CaptchaImage'
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+
+class _FormularioParser(HTMLParser):
+    """Recoge inputs, selects, la imagen del CAPTCHA y el action del formulario"""
+
+    def __init__(self):
+        super().__init__()
+        self.action = None
+        self.ocultos: Dict[str, str] = {}
+        self.nombres: Dict[str, str] = {}
+        self.valores: Dict[str, str] = {}
+        self.captcha_src = None
+        self.texto = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'form' and self.action is None:
+            self.action = attrs.get('action')
+        elif tag in ('input', 'select', 'textarea'):
+            nombre = attrs.get('name')
+            if not nombre:
+                return
+            if attrs.get('id'):
+                self.nombres[attrs['id']] = nombre
+            if tag == 'input':
+                self.valores[nombre] = attrs.get('value', '')
+                if (attrs.get('type') or '').lower() == 'hidden':
+                    self.ocultos[nombre] = attrs.get('value', '')
+        elif tag == 'img' and (attrs.get('id') or '').lower() == CAPTCHA_IMG_ID.lower():
+            self.captcha_src = attrs.get('src')
+
+    def handle_data(self, data):
+        if data.strip():
+            self.texto.append(data.strip())
+
+
+def _solver_por_defecto(imagen: bytes) -> Tuple[str, float]:
+    from utils.captcha_solver import solve_captcha_image
+    return solve_captcha_image(imagen)
+
+
+class ConsultaHTTP:
+    """Backend HTTP puro para la consulta de vigencia de cédula"""
+
+    def __init__(self, url: str = URL_DATOS, pool_size: int = 20, timeout: float = 15,
+                 solver: Optional[Callable[[bytes], Tuple[str, float]]] = None, rate_limiter=None):
+        """
+        Args:
+            url: URL de Datos.aspx
+            pool_size: Conexiones HTTP reutilizables por host
+            timeout: Segundos por petición
+            solver: Función bytes PNG -> (texto, confianza) del CAPTCHA
+            rate_limiter: Limitador de tasa (default: el compartido del proceso)
+        """
+        self.url = url
+        self.timeout = timeout
+        self.solver = solver or _solver_por_defecto
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+
+        # Un solo pool de conexiones compartido por todas las sesiones
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+
+    def _nueva_sesion(self) -> requests.Session:
+        """
+        Sesión por consulta: cada una necesita su propia cookie ASP.NET,
+        pero todas comparten el pool de conexiones del adapter
+        """
+        sesion = requests.Session()
+        sesion.headers['User-Agent'] = USER_AGENT
+        sesion.mount('https://', self._adapter)
+        sesion.mount('http://', self._adapter)
+        return sesion
+
+    def cargar_formulario(self, sesion: requests.Session) -> _FormularioParser:
+        """GET de Datos.aspx y extracción de los campos del formulario"""
+        self.rate_limiter.adquirir("formulario")
+        respuesta = sesion.get(self.url, timeout=self.timeout)
+        respuesta.raise_for_status()
+
+        formulario = _FormularioParser()
+        formulario.feed(respuesta.text)
+
+        if '__VIEWSTATE' not in formulario.ocultos:
+            raise ValueError("Formulario sin __VIEWSTATE: la página cambió o hay bloqueo")
+        return formulario
+
+    def descargar_captcha(self, sesion: requests.Session, formulario: _FormularioParser,
+                          refrescar: bool = False) -> bytes:
+        """
+        Descarga la imagen del CAPTCHA con la cookie de la sesión
+
+        Con refrescar=True se evita cualquier caché para que el handler genere
+        un código nuevo; el formulario (ViewState) sigue siendo válido.
+        """
+        if not formulario.captcha_src:
+            raise ValueError("No se encontró la imagen del CAPTCHA")
+
+        self.rate_limiter.adquirir("captcha")
+        parametros = {'_r': time.time_ns()} if refrescar else None
+        respuesta = sesion.get(urljoin(self.url, formulario.captcha_src), params=parametros,
+                               timeout=self.timeout)
+        respuesta.raise_for_status()
+        return respuesta.content
+
+    def _armar_payload(self, formulario: _FormularioParser, cedula: str,
+                       dia: str, mes: str, anio: str, captcha: str) -> Dict[str, str]:
+        nombres = formulario.nombres
+        faltantes = [campo for campo, id_ in CAMPOS.items() if id_ not in nombres]
+        if faltantes:
+            raise ValueError(f"Campos no encontrados en el formulario: {faltantes}")
+
+        payload = dict(formulario.ocultos)
+        payload.update({
+            nombres[CAMPOS['cedula']]: cedula,
+            nombres[CAMPOS['dia']]: dia,
+            nombres[CAMPOS['mes']]: mes,
+            nombres[CAMPOS['anio']]: anio,
+            nombres[CAMPOS['captcha']]: captcha,
+        })
+        # WebForms identifica el evento por el nombre/valor del botón
+        boton = nombres[CAMPOS['boton']]
+        payload[boton] = formulario.valores.get(boton, '')
+        return payload
+
+    def consultar(self, cedula: str, dia: str, mes: str, anio: str,
+                  destino=None) -> Dict[str, Any]:
+        """
+        Realiza una consulta completa
+
+        Args:
+            cedula: Número de cédula
+            dia, mes, anio: Fecha de expedición tal como la esperan los DropDownList
+            destino: Ruta o archivo binario donde escribir el PDF (opcional)
+
+        Returns:
+            Diccionario con consulta_exitosa, pdf (bytes si no hay destino) y tiempos
+        """
+        from storage.captcha_corpus import get_captcha_corpus
+        from utils.captcha_solver import get_metricas_captcha, resolver_con_refresco
+
+        inicio = time.time()
+        tiempos = {}
+        resultado = {'cedula': cedula, 'consulta_exitosa': False, 'backend': 'http'}
+        sesion = self._nueva_sesion()
+
+        try:
+            t = time.time()
+            formulario = self.cargar_formulario(sesion)
+            tiempos['formulario'] = time.time() - t
+
+            t = time.time()
+            imagenes = []
+
+            def imagen_captcha(refrescar):
+                imagenes.append(self.descargar_captcha(sesion, formulario, refrescar))
+                return imagenes[-1]
+
+            lectura = resolver_con_refresco(imagen_captcha, solver=self.solver)
+            tiempos['captcha'] = time.time() - t
+            if lectura is None:
+                # Un CAPTCHA dudoso gastaría el POST completo: mejor no enviarlo
+                raise ValueError("CAPTCHA ilegible")
+            captcha, confianza = lectura
+            resultado['captcha'] = captcha
+            resultado['captcha_confianza'] = confianza
+
+            payload = self._armar_payload(formulario, cedula, dia, mes, anio, captcha)
+            accion = urljoin(self.url, formulario.action or self.url)
+
+            t = time.time()
+            self.rate_limiter.adquirir("pdf")
+            with sesion.post(accion, data=payload, timeout=self.timeout, stream=True) as respuesta:
+                respuesta.raise_for_status()
+                tipo = respuesta.headers.get('Content-Type', '').lower()
+
+                if 'application/pdf' in tipo:
+                    resultado.update(self._guardar_pdf(respuesta, destino))
+                    resultado['consulta_exitosa'] = True
+                else:
+                    resultado['error'] = mensaje_error(respuesta.text)
+            get_metricas_captcha().registrar_envio(
+                resultado['consulta_exitosa'],
+                captcha_rechazado=resultado.get('error') == "CAPTCHA rechazado"
+            )
+            corpus = get_captcha_corpus()
+            if corpus is not None:
+                corpus.registrar(imagenes[-1], captcha, confianza, captcha_aceptado(resultado))
+            tiempos['envio'] = time.time() - t
+
+        except requests.Timeout as e:
+            resultado['error'] = f"Timeout: {e}"
+        except requests.HTTPError as e:
+            resultado['error'] = str(e)
+            # Código estructurado para es_bloqueo (403/429/5xx), sin adivinarlo del texto
+            if e.response is not None:
+                resultado['status_code'] = e.response.status_code
+        except Exception as e:
+            resultado['error'] = str(e)
+
+        resultado['tiempos'] = tiempos
+        resultado['tiempo_respuesta'] = round(time.time() - inicio, 2)
+
+        if resultado['consulta_exitosa']:
+            logger.info(f"✅ PDF obtenido por HTTP para {cedula} ({resultado['tiempo_respuesta']}s)")
+        else:
+            logger.warning(f"⚠️  Consulta HTTP fallida para {cedula}: {resultado.get('error')}")
+        return resultado
+
+    def _guardar_pdf(self, respuesta: requests.Response, destino) -> Dict[str, Any]:
+        """Escribe el PDF por bloques, sin materializar la respuesta completa dos veces"""
+        if destino is None:
+            buffer = io.BytesIO()
+            for bloque in respuesta.iter_content(chunk_size=8192):
+                buffer.write(bloque)
+            return {'pdf': buffer.getvalue()}
+
+        if hasattr(destino, 'write'):
+            for bloque in respuesta.iter_content(chunk_size=8192):
+                destino.write(bloque)
+            return {'pdf_descargado': getattr(destino, 'name', None)}
+
+        with open(destino, 'wb') as f:
+            for bloque in respuesta.iter_content(chunk_size=8192):
+                f.write(bloque)
+        return {'pdf_descargado': str(destino)}
+
+
+def captcha_aceptado(resultado: Dict[str, Any]) -> Optional[bool]:
+    """Veredicto del sitio sobre el CAPTCHA enviado (None si la respuesta no lo dice)"""
+    if resultado['consulta_exitosa'] or resultado.get('error') == "Documento no encontrado":
+        return True
+    if resultado.get('error') == "CAPTCHA rechazado":
+        return False
+    return None
+
+
+def mensaje_error(html: str) -> str:
+    """Traduce la página de respuesta no-PDF a un mensaje de error (todos los backends)"""
+    parser = _FormularioParser()
+    parser.feed(html)
+    texto = ' '.join(parser.texto).lower()
+
+    # La página de error suele volver a incluir el formulario con su CAPTCHA,
+    # así que primero se buscan los mensajes más específicos
+    if 'no se encuentra' in texto or 'no existe' in texto or 'no registra' in texto:
+        return "Documento no encontrado"
+    if 'captcha' in texto or 'código de verificación' in texto or 'codigo de verificacion' in texto:
+        return "CAPTCHA rechazado"
+    return "Respuesta sin PDF (página de error)"
+
+
+_cliente: Optional[ConsultaHTTP] = None
+_cliente_lock = threading.Lock()
+
+
+def get_cliente() -> ConsultaHTTP:
+    """Cliente compartido por todo el proceso (una sola sesión y un solo pool de conexiones)"""
+    global _cliente
+    with _cliente_lock:
+        if _cliente is None:
+            _cliente = ConsultaHTTP()
+        return _cliente
+
+
+def partes_fecha(fecha: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Día, mes y año (DD, MM, YYYY) como los esperan los DropDownList
+
+    Retorna None si la fecha no es una fecha real en formato DD/MM/YYYY.
+    """
+    try:
+        valida = datetime.strptime(fecha.strip(), '%d/%m/%Y')
+    except (AttributeError, ValueError):
+        return None
+    return f"{valida.day:02d}", f"{valida.month:02d}", str(valida.year)
+
+
+def consulta_individual(cedula: str, fecha: str = None) -> Dict[str, Any]:
+    """
+    Misma firma que consulta_simple.consulta_individual, sin navegador
+
+    Args:
+        cedula: Número de cédula
+        fecha: Fecha de expedición DD/MM/YYYY (obligatoria en Datos.aspx)
+    """
+    if not fecha:
+        return {'cedula': cedula, 'consulta_exitosa': False,
+                'error': 'La consulta HTTP requiere fecha de expedición (DD/MM/YYYY)'}
+    partes = partes_fecha(fecha)
+    if partes is None:
+        return {'cedula': cedula, 'consulta_exitosa': False,
+                'error': f'Fecha de expedición inválida: {fecha!r} (se espera DD/MM/YYYY)'}
+
+    resultado = get_cliente().consultar(cedula, *partes)
+    resultado['fecha_expedicion'] = fecha
+    return resultado
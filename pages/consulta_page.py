@@ -1,10 +1,18 @@
 import time
-from utils.captcha_solver import solve_captcha
+from storage.captcha_corpus import get_captcha_corpus
+from utils.captcha_solver import CaptchaEnParalelo, resolver_con_refresco
+from utils.rate_limiter import get_rate_limiter
 
 class ConsultaPage:
 
-    def __init__(self, page):
+    def __init__(self, page, rate_limiter=None):
         self.page = page
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.captcha_confianza = None
+        self.captcha_png = None
+        self.captcha_texto = None
+        self.tiempos = {}
+        self._captcha_en_curso = None
         self.url = "https://certvigenciacedula.registraduria.gov.co/Datos.aspx"
 
         # Selectores reales
@@ -17,8 +25,15 @@ class ConsultaPage:
         self.btn_continuar = "#ContentPlaceHolder1_Button1"
 
     def open(self):
+        # Cargar la página también descarga la imagen del CAPTCHA
+        self.rate_limiter.adquirir("formulario")
+        self.rate_limiter.adquirir("captcha")
         self.page.goto(self.url, timeout=15000)
 
+        # El OCR arranca apenas está la imagen y corre mientras se llena el formulario
+        self.page.wait_for_selector(self.captcha_img)
+        self._captcha_en_curso = CaptchaEnParalelo(self._captcha_png())
+
     def fill_cedula(self, cedula):
         self.page.fill(self.cedula_input, cedula)
 
@@ -27,18 +42,58 @@ class ConsultaPage:
         self.page.select_option(self.mes_select, mes)
         self.page.select_option(self.anio_select, anio)
 
+    def refresh_captcha(self):
+        # Pide otra imagen al mismo handler sin recargar el formulario (conserva el ViewState)
+        self.rate_limiter.adquirir("captcha")
+        self.page.eval_on_selector(self.captcha_img, """img => new Promise(listo => {
+            img.onload = img.onerror = () => listo();
+            const url = new URL(img.src, location.href);
+            url.searchParams.set('_r', Date.now());
+            img.src = url.href;
+        })""")
+
+    def _captcha_png(self, refrescar=False):
+        if refrescar:
+            self.refresh_captcha()
+        # Captura en memoria (sin ruta: cada worker tiene la suya)
+        self.captcha_png = self.page.locator(self.captcha_img).screenshot()
+        return self.captcha_png
+
     def solve_and_fill_captcha(self):
-        # Capturar imagen CAPTCHA
+        """
+        Resuelve el CAPTCHA refrescándolo mientras la confianza sea baja
+
+        Si open() ya lanzó la lectura en segundo plano solo se espera a que
+        termine (y se registran los tiempos en self.tiempos). Retorna el texto
+        escrito, o None si no hubo lectura confiable: en ese caso el campo
+        queda vacío y no conviene enviar el formulario.
+        """
         self.page.wait_for_selector(self.captcha_img)
-        img_bytes = self.page.locator(self.captcha_img).screenshot(path="captcha/temp.png")
+        primera_lectura = None
+        if self._captcha_en_curso is not None:
+            primera_lectura = self._captcha_en_curso.resultado()
+            self.tiempos.update(self._captcha_en_curso.tiempos)
+            self._captcha_en_curso = None
 
-        # Resolver CAPTCHA
-        resultado = solve_captcha("captcha/temp.png")
+        lectura = resolver_con_refresco(self._captcha_png, primera_lectura=primera_lectura)
+        if lectura is None:
+            self.captcha_confianza = None
+            return None
 
-        # Llenar CAPTCHA
+        resultado, self.captcha_confianza = lectura
+        self.captcha_texto = resultado
         self.page.fill(self.captcha_input, resultado)
         return resultado
 
+    def registrar_captcha(self, aceptado):
+        """Guarda el último CAPTCHA enviado en el corpus (si config corpus_captcha.grabar)"""
+        corpus = get_captcha_corpus()
+        if corpus is not None and self.captcha_png is not None:
+            corpus.registrar(self.captcha_png, self.captcha_texto, self.captcha_confianza,
+                             aceptado, fuente='playwright')
+
     def enviar(self):
+        # El envío del formulario es lo que genera el PDF
+        self.rate_limiter.adquirir("pdf")
         self.page.click(self.btn_continuar)
         self.page.wait_for_load_state("networkidle")
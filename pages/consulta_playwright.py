@@ -0,0 +1,93 @@
+"""
+Consulta a Datos.aspx con Playwright sobre navegadores reutilizados
+
+Cada hilo toma su pool de navegadores calientes (pages.browser_pool) y cada
+consulta recibe una página en un contexto limpio, así que solo la primera
+consulta del hilo paga el arranque de Chromium. Misma firma y forma de
+resultado que pages.consulta_http.consulta_individual.
+"""
+import time
+from typing import Any, Dict
+import logging
+
+from pages.browser_pool import BrowserPool, pool_del_hilo
+from pages.consulta_http import captcha_aceptado, mensaje_error, partes_fecha
+from pages.consulta_page import ConsultaPage
+
+logger = logging.getLogger(__name__)
+
+
+def consultar(pool: BrowserPool, cedula: str, dia: str, mes: str, anio: str,
+              timeout_descarga: float = 15000) -> Dict[str, Any]:
+    """
+    Realiza una consulta completa con una página prestada por el pool
+
+    Returns:
+        Diccionario con consulta_exitosa, pdf (bytes) y tiempos
+    """
+    from utils.captcha_solver import get_metricas_captcha
+    from utils.downloader import leer_pdf
+
+    inicio = time.time()
+    resultado = {'cedula': cedula, 'consulta_exitosa': False, 'backend': 'playwright'}
+    try:
+        with pool.pagina() as page:
+            consulta = ConsultaPage(page)
+            consulta.open()
+            consulta.fill_cedula(cedula)
+            consulta.fill_fecha(dia, mes, anio)
+            captcha = consulta.solve_and_fill_captcha()
+            resultado['tiempos'] = consulta.tiempos
+            if captcha is None:
+                # Un CAPTCHA dudoso gastaría el envío completo: mejor no enviarlo
+                raise ValueError("CAPTCHA ilegible")
+            resultado['captcha'] = captcha
+            resultado['captcha_confianza'] = consulta.captcha_confianza
+
+            # El PDF llega como descarga del envío: se lee del temporal de Playwright
+            try:
+                with page.expect_download(timeout=timeout_descarga) as descarga:
+                    consulta.enviar()
+                resultado['pdf'] = leer_pdf(descarga.value)
+                resultado['consulta_exitosa'] = True
+            except Exception as e:
+                # Sin descarga: la página dice por qué (p. ej. CAPTCHA rechazado)
+                try:
+                    resultado['error'] = mensaje_error(page.content())
+                except Exception:
+                    resultado['error'] = str(e)
+            get_metricas_captcha().registrar_envio(
+                resultado['consulta_exitosa'],
+                captcha_rechazado=resultado.get('error') == "CAPTCHA rechazado"
+            )
+            consulta.registrar_captcha(captcha_aceptado(resultado))
+    except Exception as e:
+        resultado['error'] = str(e)
+
+    resultado['tiempo_respuesta'] = round(time.time() - inicio, 2)
+    if resultado['consulta_exitosa']:
+        logger.info(f"✅ PDF obtenido con Playwright para {cedula} ({resultado['tiempo_respuesta']}s)")
+    else:
+        logger.warning(f"⚠️  Consulta Playwright fallida para {cedula}: {resultado.get('error')}")
+    return resultado
+
+
+def consulta_individual(cedula: str, fecha: str = None) -> Dict[str, Any]:
+    """
+    Misma firma que consulta_simple.consulta_individual, con el pool del hilo
+
+    Args:
+        cedula: Número de cédula
+        fecha: Fecha de expedición DD/MM/YYYY (obligatoria en Datos.aspx)
+    """
+    if not fecha:
+        return {'cedula': cedula, 'consulta_exitosa': False,
+                'error': 'La consulta requiere fecha de expedición (DD/MM/YYYY)'}
+    partes = partes_fecha(fecha)
+    if partes is None:
+        return {'cedula': cedula, 'consulta_exitosa': False,
+                'error': f'Fecha de expedición inválida: {fecha!r} (se espera DD/MM/YYYY)'}
+
+    resultado = consultar(pool_del_hilo(), cedula, *partes)
+    resultado['fecha_expedicion'] = fecha
+    return resultado
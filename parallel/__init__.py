@@ -0,0 +1 @@
+"""Módulos de ejecución concurrente de consultas"""
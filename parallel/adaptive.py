@@ -0,0 +1,216 @@
+"""
+Control adaptativo de concurrencia (AIMD)
+
+Aumenta el límite de consultas simultáneas en +1 por ventana mientras la
+latencia y la tasa de éxito se mantienen, y lo reduce multiplicativamente
+cuando aparecen señales de bloqueo (timeouts, páginas de error, CAPTCHA
+rechazado). Una ráfaga de bloqueos recorta una sola vez: el primero recorta
+al instante y el resto de la ventana, o las consultas que ya estaban en vuelo
+al recortar, solo se cuentan.
+"""
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fragmentos de error que indican que el sitio está limitando o bloqueando
+SENALES_BLOQUEO = (
+    'timeout', 'timed out', 'tiempo de espera',
+    'captcha rechazado',  # el veredicto del sitio; "CAPTCHA ilegible" es un fallo de nuestro OCR
+    'bloqueo', 'bloqueado', 'blocked',
+    'forbidden', 'too many requests', 'service unavailable',
+    'página de error', 'pagina de error', 'error page',
+)
+
+# Códigos HTTP de bloqueo; en el texto del error solo cuentan como número aislado
+# (una cédula como 79403221 no es un 403)
+CODIGOS_BLOQUEO = (403, 429, 502, 503)
+_CODIGO_EN_TEXTO = re.compile(r'\b(?:' + '|'.join(str(codigo) for codigo in CODIGOS_BLOQUEO) + r')\b')
+
+
+def es_bloqueo(resultado: Dict[str, Any]) -> bool:
+    """Indica si un resultado fallido parece un bloqueo del sitio"""
+    if resultado.get('success', False) or resultado.get('consulta_exitosa', False):
+        return False
+    if resultado.get('bloqueo'):
+        return True
+    if resultado.get('status_code') is not None:
+        return resultado['status_code'] in CODIGOS_BLOQUEO
+    error = str(resultado.get('error') or '').lower()
+    return any(senal in error for senal in SENALES_BLOQUEO) or bool(_CODIGO_EN_TEXTO.search(error))
+
+
+class AIMDController:
+    """Límite de concurrencia ajustable por ventanas de resultados"""
+
+    def __init__(self, inicial: int = 5, minimo: int = 1, maximo: int = 50,
+                 incremento: int = 1, factor_reduccion: float = 0.5,
+                 tamano_ventana: int = 20, tasa_exito_minima: float = 0.8,
+                 tolerancia_latencia: float = 1.5,
+                 reloj: Callable[[], float] = time.monotonic,
+                 ventanas_en_memoria: int = 100,
+                 al_cerrar_ventana: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Args:
+            inicial: Límite con el que se arranca
+            minimo / maximo: Cotas del límite
+            incremento: Aumento aditivo por ventana sana
+            factor_reduccion: Multiplicador aplicado ante bloqueos o degradación
+            tamano_ventana: Resultados por ventana de evaluación
+            tasa_exito_minima: Por debajo de esta tasa se reduce el límite
+            tolerancia_latencia: Reducir si la latencia supera base * tolerancia
+            reloj: Función de tiempo (inyectable para pruebas)
+            ventanas_en_memoria: Resúmenes recientes que se conservan en self.ventanas
+            al_cerrar_ventana: Se llama (fuera del lock) con cada resumen al cerrarse
+                su ventana; es la forma de guardarlas todas en lotes largos
+        """
+        if not 1 <= minimo <= inicial <= maximo:
+            raise ValueError("Se requiere 1 <= minimo <= inicial <= maximo")
+
+        self.minimo = minimo
+        self.maximo = maximo
+        self.incremento = incremento
+        self.factor_reduccion = factor_reduccion
+        self.tamano_ventana = tamano_ventana
+        self.tasa_exito_minima = tasa_exito_minima
+        self.tolerancia_latencia = tolerancia_latencia
+        self.reloj = reloj
+        self.al_cerrar_ventana = al_cerrar_ventana
+
+        self._limite = inicial
+        self._en_curso = 0
+        # Momento del último recorte por bloqueo: las consultas que ya estaban en
+        # vuelo entonces no vuelven a recortar (responden a la misma congestión)
+        self._ultimo_recorte: Optional[float] = None
+        self._cond = threading.Condition()
+
+        self.latencia_base: Optional[float] = None
+        # Solo las últimas: un lote de millones de documentos cierra cientos de miles
+        self.ventanas: Deque[Dict[str, Any]] = deque(maxlen=ventanas_en_memoria)
+        self.total_ventanas = 0
+        # Mayor límite con que trabajó alguna ventana (la concurrencia que sostuvo el lote)
+        self.limite_maximo: Optional[int] = None
+        self._reset_ventana()
+
+    @property
+    def limite(self) -> int:
+        return self._limite
+
+    def _reset_ventana(self):
+        self._ventana = {'inicio': self.reloj(), 'n': 0, 'exitosas': 0,
+                         'bloqueos': 0, 'en_vuelo': 0, 'latencia': 0.0,
+                         'limite': self._limite, 'reducida': False}
+
+    def adquirir(self):
+        """Bloquea hasta que haya cupo bajo el límite actual"""
+        with self._cond:
+            while self._en_curso >= self._limite:
+                self._cond.wait()
+            self._en_curso += 1
+
+    def liberar(self):
+        with self._cond:
+            self._en_curso -= 1
+            self._cond.notify()
+
+    def registrar(self, latencia: float, exito: bool, bloqueo: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Registra el resultado de una consulta
+
+        Returns:
+            El resumen de la ventana si este resultado la cerró, si no None
+        """
+        resumen = self._registrar(latencia, exito, bloqueo)
+        if resumen and self.al_cerrar_ventana:
+            self.al_cerrar_ventana(resumen)
+        return resumen
+
+    def _registrar(self, latencia: float, exito: bool, bloqueo: bool) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            v = self._ventana
+            v['n'] += 1
+            v['latencia'] += latencia
+            if exito:
+                v['exitosas'] += 1
+            if bloqueo:
+                v['bloqueos'] += 1
+                inicio_consulta = self.reloj() - latencia
+                if self._ultimo_recorte is not None and inicio_consulta < self._ultimo_recorte:
+                    # Salió antes del último recorte: ya se pagó por esta congestión
+                    v['en_vuelo'] += 1
+                elif not v['reducida']:
+                    # El primer bloqueo se atiende de inmediato, una sola vez por ventana
+                    self._recortar('bloqueo')
+                    v['reducida'] = True
+
+            if v['n'] >= self.tamano_ventana:
+                return self._cerrar_ventana()
+            return None
+
+    def _recortar(self, motivo: str):
+        anterior = self._limite
+        self._limite = max(self.minimo, int(self._limite * self.factor_reduccion))
+        self._ultimo_recorte = self.reloj()
+        logger.warning(f"📉 Concurrencia {anterior} → {self._limite} ({motivo})")
+
+    def finalizar(self) -> Optional[Dict[str, Any]]:
+        """Cierra la ventana parcial pendiente al terminar el lote"""
+        with self._cond:
+            resumen = self._cerrar_ventana() if self._ventana['n'] else None
+        if resumen and self.al_cerrar_ventana:
+            self.al_cerrar_ventana(resumen)
+        return resumen
+
+    def _cerrar_ventana(self) -> Dict[str, Any]:
+        v = self._ventana
+        duracion = max(self.reloj() - v['inicio'], 1e-9)
+        latencia_promedio = v['latencia'] / v['n']
+        tasa_exito = v['exitosas'] / v['n']
+        # Los bloqueos de consultas en vuelo durante un recorte no vuelven a penalizar
+        evaluadas = v['n'] - v['en_vuelo']
+        tasa_evaluada = v['exitosas'] / evaluadas if evaluadas else 1.0
+
+        if v['reducida']:
+            motivo = 'bloqueo'  # ya recortado al llegar el bloqueo
+        elif tasa_evaluada < self.tasa_exito_minima:
+            motivo = 'tasa_exito'
+        elif (self.latencia_base is not None
+              and latencia_promedio > self.latencia_base * self.tolerancia_latencia):
+            motivo = 'latencia'
+        else:
+            motivo = None
+
+        # Si todavía llegan bloqueos de la ráfaga anterior (en_vuelo) el límite se mantiene
+        if motivo and not v['reducida']:
+            self._recortar(motivo)
+        elif not motivo and not v['en_vuelo']:
+            self._limite = min(self.maximo, self._limite + self.incremento)
+            if self.latencia_base is None or latencia_promedio < self.latencia_base:
+                self.latencia_base = latencia_promedio
+            logger.debug(f"📈 Concurrencia {v['limite']} → {self._limite}")
+
+        resumen = {
+            'ventana': self.total_ventanas + 1,
+            'limite': v['limite'],
+            'nuevo_limite': self._limite,
+            'consultas': v['n'],
+            'exitosas': v['exitosas'],
+            'bloqueos': v['bloqueos'],
+            'tasa_exito': tasa_exito * 100,
+            'latencia_promedio': latencia_promedio,
+            'duracion': duracion,
+            'throughput': v['n'] / duracion,
+            'motivo_reduccion': motivo,
+        }
+        self.ventanas.append(resumen)
+        self.total_ventanas += 1
+        self.limite_maximo = max(self.limite_maximo or 0, v['limite'])
+
+        self._reset_ventana()
+        # Si el límite subió, despertar a los workers en espera
+        self._cond.notify_all()
+        return resumen
@@ -0,0 +1,147 @@
+"""
+Motor asyncio para consultas masivas
+
+Cada documento recorre una lista de etapas (consulta, descarga, extracción,
+almacenamiento) y cada etapa tiene su propio semáforo. Las etapas pueden ser
+corutinas nativas o funciones síncronas; estas últimas se ejecutan en un pool
+de hilos acotado, de modo que cientos de documentos pueden estar en vuelo sin
+un hilo por consulta.
+"""
+import asyncio
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+_FIN = object()
+
+
+class AsyncQueryEngine:
+    """Ejecuta documentos a través de etapas con concurrencia acotada por etapa"""
+
+    def __init__(self, etapas: List[Tuple[str, Callable[[Dict[str, Any]], Any]]],
+                 crear_contexto: Optional[Callable[[Any], Dict[str, Any]]] = None,
+                 finalizar: Optional[Callable[[Dict[str, Any], Optional[Exception]], Any]] = None,
+                 concurrency: int = 100, limites: Optional[Dict[str, int]] = None,
+                 max_hilos: int = 32):
+        """
+        Args:
+            etapas: Lista ordenada de (nombre, función) que reciben el contexto
+            crear_contexto: Construye el contexto inicial a partir de un documento
+            finalizar: Convierte (contexto, error) en el resultado final
+            concurrency: Máximo de documentos en vuelo
+            limites: Máximo de documentos simultáneos por etapa
+            max_hilos: Hilos disponibles para etapas síncronas
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency debe ser >= 1")
+
+        self.etapas = etapas
+        self.crear_contexto = crear_contexto or (lambda item: {'item': item})
+        self.finalizar = finalizar or (lambda contexto, error: contexto)
+        self.concurrency = concurrency
+        self.limites = {nombre: concurrency for nombre, _ in etapas}
+        self.limites.update(limites or {})
+        self.max_hilos = max_hilos
+
+        self._en_vuelo = 0
+        self._stats: Dict[str, Any] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def ejecutar(self, documentos: Iterable[Any],
+                       on_resultado: Optional[Callable[[Any], None]] = None) -> List[Any]:
+        """
+        Procesa todos los documentos y retorna sus resultados
+
+        Args:
+            documentos: Iterable (posiblemente perezoso) de documentos
+            on_resultado: Callback opcional invocado al terminar cada documento
+        """
+        semaforos = {nombre: asyncio.Semaphore(self.limites[nombre]) for nombre, _ in self.etapas}
+        cola: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+        resultados: List[Any] = []
+
+        self._en_vuelo = 0
+        self._stats = {
+            'total': 0,
+            'errores': 0,
+            'en_vuelo_max': 0,
+            'etapas': {nombre: {'llamadas': 0, 'tiempo': 0.0, 'en_curso_max': 0, '_en_curso': 0}
+                       for nombre, _ in self.etapas},
+        }
+
+        # Pool propio: el executor por defecto del loop es del llamador y no se toca
+        executor = ThreadPoolExecutor(max_workers=self.max_hilos, thread_name_prefix="async-etapa")
+        self._executor = executor
+
+        async def worker():
+            while True:
+                item = await cola.get()
+                if item is _FIN:
+                    return
+                resultado = await self._procesar(item, semaforos)
+                resultados.append(resultado)
+                if on_resultado:
+                    on_resultado(resultado)
+
+        inicio = time.time()
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            for documento in documentos:
+                await cola.put(documento)
+        finally:
+            for _ in workers:
+                await cola.put(_FIN)
+            await asyncio.gather(*workers)
+            executor.shutdown(wait=True)
+            self._executor = None
+
+        self._stats['tiempo_total'] = time.time() - inicio
+        return resultados
+
+    async def _procesar(self, documento: Any, semaforos: Dict[str, asyncio.Semaphore]) -> Any:
+        """Recorre todas las etapas para un documento"""
+        contexto = self.crear_contexto(documento)
+        error = None
+
+        self._en_vuelo += 1
+        self._stats['en_vuelo_max'] = max(self._stats['en_vuelo_max'], self._en_vuelo)
+        try:
+            for nombre, funcion in self.etapas:
+                async with semaforos[nombre]:
+                    await self._ejecutar_etapa(nombre, funcion, contexto)
+        except Exception as e:
+            error = e
+        finally:
+            self._en_vuelo -= 1
+
+        self._stats['total'] += 1
+        if error is not None:
+            self._stats['errores'] += 1
+        return self.finalizar(contexto, error)
+
+    async def _ejecutar_etapa(self, nombre: str, funcion: Callable, contexto: Dict[str, Any]):
+        stats = self._stats['etapas'][nombre]
+        stats['_en_curso'] += 1
+        stats['en_curso_max'] = max(stats['en_curso_max'], stats['_en_curso'])
+        inicio = time.time()
+        try:
+            if inspect.iscoroutinefunction(funcion):
+                return await funcion(contexto)
+            return await asyncio.get_running_loop().run_in_executor(self._executor, funcion, contexto)
+        finally:
+            stats['_en_curso'] -= 1
+            stats['llamadas'] += 1
+            stats['tiempo'] += time.time() - inicio
+
+    def metricas(self) -> Dict[str, Any]:
+        """Métricas de la última ejecución"""
+        metricas = dict(self._stats)
+        metricas['etapas'] = {
+            nombre: {k: v for k, v in stats.items() if not k.startswith('_')}
+            for nombre, stats in self._stats.get('etapas', {}).items()
+        }
+        return metricas
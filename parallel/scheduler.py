@@ -0,0 +1,290 @@
+"""
+Planificador por prioridad: todas las consultas piden turno en una cola
+multinivel (interactiva > normal > lote) con envejecimiento, de modo que una
+consulta urgente no espere detrás de miles de documentos de un lote
+
+La cola vive en memoria y solo ordena las consultas de un proceso. `--documento`
+y `--archivo` corren en procesos distintos: para que una consulta interactiva
+también pase delante de un lote de otro proceso, el planificador usa una
+PuertaInteractiva (archivos en una carpeta compartida, ver carpeta_compartida).
+"""
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Menor valor = mayor prioridad
+PRIORIDADES = {'interactiva': 0, 'normal': 1, 'lote': 2}
+
+
+class _Espera:
+    """Solicitud de turno encolada"""
+
+    def __init__(self, prioridad: str, llegada: float, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.prioridad = prioridad
+        self.llegada = llegada
+        self.loop = loop
+        self.evento = None if loop else threading.Event()
+        self.futuro = loop.create_future() if loop else None
+        self.otorgada = False
+
+    def despertar(self):
+        self.otorgada = True
+        if self.loop:
+            self.loop.call_soon_threadsafe(self._resolver)
+        else:
+            self.evento.set()
+
+    def _resolver(self):
+        if not self.futuro.done():
+            self.futuro.set_result(None)
+
+
+class PuertaInteractiva:
+    """
+    Consultas interactivas en curso, visibles desde cualquier proceso
+
+    Cada consulta interactiva deja un archivo en `carpeta` mientras dura; los
+    documentos de lote, antes de pedir turno, ceden el paso mientras haya
+    alguno, hasta `espera_maxima` segundos (el lote no se queda sin turno).
+    Un archivo más viejo que `vencimiento` es de un proceso que murió sin
+    borrarlo y se descarta.
+    """
+
+    SUFIJO = '.interactiva'
+
+    def __init__(self, carpeta: str, espera_maxima: float = 5.0,
+                 vencimiento: float = 120.0, intervalo: float = 0.05):
+        self.carpeta = Path(carpeta)
+        self.espera_maxima = espera_maxima
+        self.vencimiento = vencimiento
+        self.intervalo = intervalo
+
+    @contextmanager
+    def marcar(self):
+        """Anuncia una consulta interactiva mientras dura el bloque"""
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        marca = self.carpeta / f"{os.getpid()}-{uuid.uuid4().hex}{self.SUFIJO}"
+        marca.touch()
+        try:
+            yield
+        finally:
+            marca.unlink(missing_ok=True)
+
+    def hay_interactivas(self) -> bool:
+        try:
+            entradas = list(os.scandir(self.carpeta))
+        except FileNotFoundError:
+            return False
+
+        ahora = time.time()
+        for entrada in entradas:
+            if not entrada.name.endswith(self.SUFIJO):
+                continue
+            try:
+                if ahora - entrada.stat().st_mtime < self.vencimiento:
+                    return True
+                os.unlink(entrada.path)
+            except FileNotFoundError:
+                continue
+        return False
+
+    def ceder(self) -> float:
+        """Espera a que no haya consultas interactivas (con tope); retorna los segundos cedidos"""
+        inicio = time.monotonic()
+        while self.hay_interactivas() and time.monotonic() - inicio < self.espera_maxima:
+            time.sleep(self.intervalo)
+        return time.monotonic() - inicio
+
+    async def ceder_async(self) -> float:
+        inicio = time.monotonic()
+        while self.hay_interactivas() and time.monotonic() - inicio < self.espera_maxima:
+            await asyncio.sleep(self.intervalo)
+        return time.monotonic() - inicio
+
+
+class PriorityScheduler:
+    """Reparte `capacidad` turnos concurrentes según prioridad y tiempo de espera"""
+
+    def __init__(self, capacidad: int = 5, envejecimiento: float = 5.0,
+                 reloj: Callable[[], float] = time.monotonic,
+                 carpeta_compartida: Optional[str] = None):
+        """
+        Args:
+            capacidad: Consultas que pueden ejecutarse a la vez
+            envejecimiento: Segundos de espera que suben un nivel de prioridad
+                (evita que el trabajo de lote quede sin turno)
+            reloj: Fuente de tiempo monotónica, inyectable para pruebas
+            carpeta_compartida: Carpeta de la PuertaInteractiva; sin ella la
+                prioridad solo vale entre consultas del mismo proceso
+        """
+        if capacidad < 1:
+            raise ValueError("capacidad debe ser >= 1")
+
+        self.envejecimiento = envejecimiento
+        self.reloj = reloj
+        self._capacidad = capacidad
+        self._lock = threading.Lock()
+        self._colas = {prioridad: deque() for prioridad in PRIORIDADES}
+        self._en_uso = 0
+        # Un lote cede a lo sumo lo mismo que tarda en ganar un nivel por envejecimiento
+        self.puerta = (PuertaInteractiva(carpeta_compartida, espera_maxima=envejecimiento)
+                       if carpeta_compartida else None)
+        self._stats = {
+            prioridad: {'turnos': 0, 'espera_total': 0.0, 'espera_maxima': 0.0, 'envejecidos': 0,
+                        'cedido_a_otros_procesos': 0.0}
+            for prioridad in PRIORIDADES
+        }
+
+    @property
+    def capacidad(self) -> int:
+        return self._capacidad
+
+    @capacidad.setter
+    def capacidad(self, valor: int):
+        with self._lock:
+            self._capacidad = max(1, valor)
+            self._despachar()
+
+    def asegurar_capacidad(self, minimo: int):
+        """Amplía la capacidad si un lote pide más workers de los disponibles"""
+        if minimo > self._capacidad:
+            self.capacidad = minimo
+
+    def _encolar(self, prioridad: str, loop=None) -> _Espera:
+        if prioridad not in PRIORIDADES:
+            raise ValueError(f"Prioridad desconocida: {prioridad}")
+        espera = _Espera(prioridad, self.reloj(), loop)
+        with self._lock:
+            self._colas[prioridad].append(espera)
+            self._despachar()
+        return espera
+
+    def _despachar(self):
+        """Otorga turnos libres a la solicitud con mejor prioridad efectiva (con lock)"""
+        while self._en_uso < self._capacidad:
+            ahora = self.reloj()
+            mejor = None
+            for prioridad, cola in self._colas.items():
+                if not cola:
+                    continue
+                # La cabeza de cada nivel es la más antigua: basta comparar cabezas
+                cabeza = cola[0]
+                niveles_ganados = int((ahora - cabeza.llegada) / self.envejecimiento) if self.envejecimiento else 0
+                clave = (PRIORIDADES[prioridad] - niveles_ganados, cabeza.llegada)
+                if mejor is None or clave < mejor[0]:
+                    mejor = (clave, prioridad)
+            if mejor is None:
+                return
+
+            _, prioridad = mejor
+            # Turno ganado por envejecimiento: había niveles más prioritarios esperando
+            envejecido = any(self._colas[p] for p, nivel in PRIORIDADES.items()
+                             if nivel < PRIORIDADES[prioridad])
+            espera = self._colas[prioridad].popleft()
+            self._en_uso += 1
+
+            tiempo = ahora - espera.llegada
+            stats = self._stats[prioridad]
+            stats['turnos'] += 1
+            stats['espera_total'] += tiempo
+            stats['espera_maxima'] = max(stats['espera_maxima'], tiempo)
+            if envejecido:
+                stats['envejecidos'] += 1
+            espera.despertar()
+
+    def liberar(self):
+        """Devuelve un turno"""
+        with self._lock:
+            self._en_uso -= 1
+            self._despachar()
+
+    def adquirir(self, prioridad: str = 'normal'):
+        """Bloquea hasta obtener turno"""
+        espera = self._encolar(prioridad)
+        espera.evento.wait()
+
+    def _contar_cedido(self, prioridad: str, segundos: float):
+        with self._lock:
+            self._stats[prioridad]['cedido_a_otros_procesos'] += segundos
+
+    @contextmanager
+    def turno(self, prioridad: str = 'normal'):
+        if self.puerta and prioridad == 'interactiva':
+            with self.puerta.marcar():
+                with self._turno_local(prioridad):
+                    yield
+            return
+        if self.puerta and prioridad == 'lote':
+            self._contar_cedido(prioridad, self.puerta.ceder())
+        with self._turno_local(prioridad):
+            yield
+
+    @contextmanager
+    def _turno_local(self, prioridad: str):
+        self.adquirir(prioridad)
+        try:
+            yield
+        finally:
+            self.liberar()
+
+    @asynccontextmanager
+    async def turno_async(self, prioridad: str = 'normal'):
+        if self.puerta and prioridad == 'interactiva':
+            with self.puerta.marcar():
+                async with self._turno_local_async(prioridad):
+                    yield
+            return
+        if self.puerta and prioridad == 'lote':
+            self._contar_cedido(prioridad, await self.puerta.ceder_async())
+        async with self._turno_local_async(prioridad):
+            yield
+
+    @asynccontextmanager
+    async def _turno_local_async(self, prioridad: str):
+        espera = self._encolar(prioridad, asyncio.get_running_loop())
+        try:
+            await espera.futuro
+        except asyncio.CancelledError:
+            with self._lock:
+                otorgada = espera.otorgada
+                if not otorgada:
+                    self._colas[prioridad].remove(espera)
+            if otorgada:
+                self.liberar()
+            raise
+        try:
+            yield
+        finally:
+            self.liberar()
+
+    def envolver(self, funcion: Callable[..., Any], prioridad: str) -> Callable[..., Any]:
+        """Retorna una versión de `funcion` que pide turno antes de ejecutarse"""
+        def funcion_con_turno(*args, **kwargs):
+            with self.turno(prioridad):
+                return funcion(*args, **kwargs)
+
+        return funcion_con_turno
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Espera en cola por prioridad"""
+        with self._lock:
+            resumen = {}
+            for prioridad, s in self._stats.items():
+                resumen[prioridad] = {
+                    'turnos': s['turnos'],
+                    'en_cola': len(self._colas[prioridad]),
+                    'espera_promedio': s['espera_total'] / s['turnos'] if s['turnos'] else 0.0,
+                    'espera_maxima': s['espera_maxima'],
+                    'envejecidos': s['envejecidos'],
+                    'cedido_a_otros_procesos': s['cedido_a_otros_procesos'],
+                }
+            return resumen
@@ -0,0 +1,130 @@
+"""
+Coalescencia de consultas en vuelo (single-flight): llamadas concurrentes con
+la misma clave comparten una sola consulta y reciben su mismo resultado
+
+SingleFlight es para hilos; SingleFlightAsync, para corutinas de un loop de asyncio.
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Llamada:
+    """Consulta en vuelo compartida por todos los que piden la misma clave"""
+
+    def __init__(self):
+        self.listo = threading.Event()
+        self.resultado = None
+        self.error = None
+        self.duracion = 0.0
+
+
+class SingleFlight:
+    """Agrupa llamadas concurrentes con la misma clave en una sola ejecución"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_vuelo: Dict[Hashable, _Llamada] = {}
+        self.llamadas = 0
+        self.duplicados = 0
+        self.tiempo_ahorrado = 0.0
+
+    def ejecutar(self, clave: Hashable, funcion: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Ejecuta funcion() salvo que ya haya una llamada en vuelo con la misma clave
+
+        Returns:
+            (resultado, compartido): compartido es True si el resultado vino
+            de la llamada de otro hilo. Si esa llamada falló, se relanza su excepción.
+        """
+        with self._lock:
+            self.llamadas += 1
+            llamada = self._en_vuelo.get(clave)
+            lider = llamada is None
+            if lider:
+                llamada = self._en_vuelo[clave] = _Llamada()
+
+        if not lider:
+            llamada.listo.wait()
+            with self._lock:
+                self.duplicados += 1
+                # Cada duplicado evita una consulta completa al sitio
+                self.tiempo_ahorrado += llamada.duracion
+            logger.debug(f"🔗 Consulta compartida para {clave}")
+            if llamada.error is not None:
+                raise llamada.error
+            return llamada.resultado, True
+
+        inicio = time.time()
+        try:
+            llamada.resultado = funcion()
+            return llamada.resultado, False
+        except Exception as e:
+            llamada.error = e
+            raise
+        finally:
+            llamada.duracion = time.time() - inicio
+            # Se retira antes de avisar: quien llegue después inicia una consulta nueva
+            with self._lock:
+                del self._en_vuelo[clave]
+            llamada.listo.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'llamadas': self.llamadas,
+                'duplicados': self.duplicados,
+                'tiempo_ahorrado': self.tiempo_ahorrado,
+            }
+
+
+class SingleFlightAsync:
+    """
+    SingleFlight para corutinas: los duplicados esperan el futuro de la primera
+
+    Solo se usa desde el hilo del loop, así que no necesita lock.
+    """
+
+    def __init__(self):
+        self._en_vuelo: Dict[Hashable, asyncio.Future] = {}
+        self.llamadas = 0
+        self.duplicados = 0
+        self.tiempo_ahorrado = 0.0
+
+    async def ejecutar(self, clave: Hashable, funcion: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Igual que SingleFlight.ejecutar, con funcion una corutina sin argumentos"""
+        self.llamadas += 1
+        futuro = self._en_vuelo.get(clave)
+        if futuro is not None:
+            # shield: si este duplicado se cancela, la consulta de los demás sigue
+            resultado, duracion = await asyncio.shield(futuro)
+            self.duplicados += 1
+            self.tiempo_ahorrado += duracion
+            logger.debug(f"🔗 Consulta compartida para {clave}")
+            return resultado, True
+
+        futuro = self._en_vuelo[clave] = asyncio.get_running_loop().create_future()
+        inicio = time.time()
+        try:
+            resultado = await funcion()
+            futuro.set_result((resultado, time.time() - inicio))
+            return resultado, False
+        except Exception as e:
+            futuro.set_exception(e)
+            futuro.exception()  # leída: sin duplicados esperando, asyncio no la reporta
+            raise
+        finally:
+            del self._en_vuelo[clave]
+            if not futuro.done():
+                futuro.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'llamadas': self.llamadas,
+            'duplicados': self.duplicados,
+            'tiempo_ahorrado': self.tiempo_ahorrado,
+        }
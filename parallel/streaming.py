@@ -0,0 +1,242 @@
+"""
+Ejecución de lotes en streaming: lee documentos de forma perezosa y los
+reparte entre N workers a través de una cola acotada
+"""
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Set
+import logging
+
+from parallel.adaptive import AIMDController, es_bloqueo
+from storage.journal import EN_CURSO, FALLIDO, HECHO, PENDIENTE, RunJournal
+
+logger = logging.getLogger(__name__)
+
+# Encabezados habituales en los CSV de entrada
+ENCABEZADOS = {'cedula', 'documento', 'documentos', 'cedulas'}
+
+_FIN = object()
+
+
+def leer_documentos(archivo: str) -> Iterator[str]:
+    """
+    Lee documentos de un archivo línea por línea sin cargarlo en memoria
+
+    Acepta un documento por línea, comentarios con '#' y CSV (se toma la
+    primera columna). Se ignoran líneas vacías y encabezados.
+    """
+    with open(archivo, 'r', encoding='utf-8') as f:
+        for linea in f:
+            documento = linea.split('#', 1)[0].split(',', 1)[0].strip()
+            if documento and documento.lower() not in ENCABEZADOS:
+                yield documento
+
+
+class StreamingBatchRunner:
+    """Procesa un flujo ilimitado de documentos con memoria constante"""
+
+    def __init__(self, funcion_consulta: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 workers: int = 5, archivo_salida: Optional[str] = None,
+                 tamano_cola: Optional[int] = None,
+                 controlador: Optional[AIMDController] = None,
+                 journal: Optional[RunJournal] = None, run_id: Optional[str] = None):
+        """
+        Args:
+            funcion_consulta: Función que toma {'documento': ...} y retorna un resultado
+            workers: Número de workers concurrentes
+            archivo_salida: Archivo JSONL donde se escribe cada resultado al terminar
+            tamano_cola: Máximo de documentos en espera (default: 2 * workers)
+            controlador: Control AIMD opcional; si se pasa, se lanzan
+                controlador.maximo workers y solo controlador.limite trabajan a la vez
+            journal: Journal donde se registra el estado de cada documento
+            run_id: Identificador del lote en el journal (requerido con journal)
+        """
+        if workers < 1:
+            raise ValueError("workers debe ser >= 1")
+        if journal and not run_id:
+            raise ValueError("run_id es requerido cuando se usa journal")
+
+        self.funcion_consulta = funcion_consulta
+        self.controlador = controlador
+        self.journal = journal
+        self.run_id = run_id
+        if controlador:
+            workers = controlador.maximo
+        self.workers = workers
+        self.archivo_salida = Path(archivo_salida) if archivo_salida else None
+        self.tamano_cola = tamano_cola or workers * 2
+
+        self._lock = threading.Lock()
+        self._reset_metricas()
+
+    def _reset_metricas(self):
+        self.metricas = {
+            'total_consultas': 0,
+            'exitosas': 0,
+            'fallidas': 0,
+            'tiempo_minimo': None,
+            'tiempo_maximo': 0.0,
+            'tiempo_acumulado': 0.0,
+            'bloqueos_detectados': 0,
+            'omitidos': 0,
+            'duplicados': 0,
+            'tiempo_ahorrado': 0.0,
+        }
+
+    def ejecutar(self, documentos: Iterable[str], omitir: Optional[Set[int]] = None) -> Dict[str, Any]:
+        """
+        Ejecuta las consultas de todos los documentos del iterable
+
+        Args:
+            documentos: Iterable (posiblemente perezoso) de documentos
+            omitir: Posiciones (1-based) ya terminadas en una ejecución anterior
+
+        Returns:
+            Métricas agregadas de la ejecución
+        """
+        self._reset_metricas()
+        cola: queue.Queue = queue.Queue(maxsize=self.tamano_cola)
+
+        salida = None
+        if self.archivo_salida:
+            self.archivo_salida.parent.mkdir(parents=True, exist_ok=True)
+            salida = open(self.archivo_salida, 'a', encoding='utf-8')
+
+        hilos = [
+            threading.Thread(target=self._worker, args=(cola, salida),
+                             name=f"lote-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+
+        inicio = time.time()
+        for hilo in hilos:
+            hilo.start()
+
+        try:
+            # El productor se bloquea cuando la cola está llena
+            for i, documento in enumerate(documentos, 1):
+                if omitir and i in omitir:
+                    self.metricas['omitidos'] += 1
+                    continue
+                if self.journal:
+                    self.journal.marcar(self.run_id, i, documento, PENDIENTE)
+                cola.put({'id': i, 'documento': documento})
+        finally:
+            for _ in hilos:
+                cola.put(_FIN)
+            for hilo in hilos:
+                hilo.join()
+            if salida:
+                salida.close()
+
+        return self._resumen(time.time() - inicio)
+
+    def _worker(self, cola: queue.Queue, salida):
+        """Consume documentos de la cola hasta recibir la señal de fin"""
+        while True:
+            item = cola.get()
+            if item is _FIN:
+                break
+
+            if self.controlador:
+                self.controlador.adquirir()
+            if self.journal:
+                self.journal.marcar(self.run_id, item['id'], item['documento'], EN_CURSO)
+
+            inicio = time.time()
+            try:
+                resultado = self.funcion_consulta(item)
+                if not isinstance(resultado, dict):
+                    # Un resultado inesperado no puede tumbar al worker: el productor
+                    # quedaría bloqueado con la cola llena
+                    raise TypeError(f"funcion_consulta retornó {type(resultado).__name__}, se esperaba dict")
+            except Exception as e:
+                resultado = {
+                    'success': False,
+                    'documento': item['documento'],
+                    'error': str(e),
+                }
+            finally:
+                if self.controlador:
+                    self.controlador.liberar()
+            tiempo = time.time() - inicio
+
+            resultado.setdefault('tiempo_respuesta', tiempo)
+            bloqueo = es_bloqueo(resultado)
+            if self.controlador:
+                self.controlador.registrar(tiempo, resultado.get('success', False), bloqueo)
+
+            self._registrar(item, resultado, tiempo, bloqueo, salida)
+
+    def _registrar(self, item: Dict[str, Any], resultado: Dict[str, Any],
+                   tiempo: float, bloqueo: bool, salida):
+        """Actualiza métricas y escribe el resultado apenas termina"""
+        with self._lock:
+            m = self.metricas
+            m['total_consultas'] += 1
+            if resultado.get('success', False):
+                m['exitosas'] += 1
+            else:
+                m['fallidas'] += 1
+            if bloqueo:
+                m['bloqueos_detectados'] += 1
+            if resultado.get('compartido'):
+                m['duplicados'] += 1
+                m['tiempo_ahorrado'] += resultado.get('tiempo_ahorrado', 0.0)
+            m['tiempo_acumulado'] += tiempo
+            m['tiempo_maximo'] = max(m['tiempo_maximo'], tiempo)
+            if m['tiempo_minimo'] is None or tiempo < m['tiempo_minimo']:
+                m['tiempo_minimo'] = tiempo
+
+            if salida:
+                # Los bytes del PDF (backend HTTP/Playwright) no van al JSONL
+                registro = {'id': item['id'], **{k: v for k, v in resultado.items() if k != 'pdf'}}
+                salida.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
+                salida.flush()
+
+            # El journal se confirma después del JSONL: ante una caída el
+            # documento se repite, nunca se pierde
+            if self.journal:
+                estado = HECHO if resultado.get('success', False) else FALLIDO
+                self.journal.marcar(self.run_id, item['id'], item['documento'], estado,
+                                    error=resultado.get('error'))
+
+            if m['total_consultas'] % 1000 == 0:
+                logger.info(f"📈 {m['total_consultas']} documentos procesados")
+
+    def _resumen(self, tiempo_total: float) -> Dict[str, Any]:
+        m = self.metricas
+        total = m['total_consultas']
+        resumen = {
+            'session_id': self.run_id or datetime.now().strftime('%Y%m%d_%H%M%S'),
+            'total_consultas': total,
+            'exitosas': m['exitosas'],
+            'fallidas': m['fallidas'],
+            'tiempo_total': tiempo_total,
+            'tiempo_promedio': m['tiempo_acumulado'] / total if total else 0,
+            'tiempo_minimo': m['tiempo_minimo'] or 0,
+            'tiempo_maximo': m['tiempo_maximo'],
+            'tasa_exito': (m['exitosas'] / total * 100) if total else 0,
+            'bloqueos_detectados': m['bloqueos_detectados'],
+            'omitidos': m['omitidos'],
+            'duplicados': m['duplicados'],
+            'tiempo_ahorrado': m['tiempo_ahorrado'],
+            'worker_count': self.workers,
+            'archivo_salida': str(self.archivo_salida) if self.archivo_salida else None,
+        }
+
+        if self.controlador:
+            self.controlador.finalizar()
+            # Solo las últimas ventanas; todas pasan por controlador.al_cerrar_ventana
+            resumen['ventanas'] = list(self.controlador.ventanas)
+            resumen['total_ventanas'] = self.controlador.total_ventanas
+            resumen['limite_final'] = self.controlador.limite
+            # worker_count refleja la concurrencia que realmente sostuvo el lote
+            if self.controlador.limite_maximo is not None:
+                resumen['worker_count'] = self.controlador.limite_maximo
+
+        return resumen
@@ -0,0 +1,194 @@
+"""
+Caché de resultados de consulta con vigencia (TTL) en dos niveles:
+LRU en memoria y la tabla de consultas de SQLite (DataStorage)
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+NO_ENCONTRADO = 'NO_ENCONTRADO'
+ERROR = 'ERROR'
+
+# Segundos de vigencia por estado_vigencia (o NO_ENCONTRADO / ERROR)
+TTL_DEFAULT = {
+    'VIGENTE': 7 * 24 * 3600,
+    NO_ENCONTRADO: 6 * 3600,
+    ERROR: 60,
+    'default': 3600,
+}
+
+SENALES_NO_ENCONTRADO = ('no encontrado', 'no se encontr', 'no existe', 'no registra')
+
+# Claves que nunca se guardan: los bytes del PDF solo viven mientras se extraen
+NO_CACHEABLES = ('pdf',)
+
+
+def clasificar(resultado: Dict[str, Any]) -> str:
+    """Estado con el que se elige el TTL de un resultado"""
+    # Los backends reportan 'success' (flujo paralelo) o 'consulta_exitosa' (HTTP, Selenium);
+    # sin ninguno de los dos no es un éxito
+    if resultado.get('success', False) or resultado.get('consulta_exitosa', False):
+        return (resultado.get('estado_vigencia') or 'DESCONOCIDO').upper()
+
+    error = str(resultado.get('error', '')).lower()
+    if any(senal in error for senal in SENALES_NO_ENCONTRADO):
+        return NO_ENCONTRADO
+    return ERROR
+
+
+class ResultCache:
+    """Caché de consultas: primero memoria, luego SQLite, y si no, el sitio"""
+
+    def __init__(self, storage=None, capacidad: int = 10000,
+                 ttl: Optional[Dict[str, float]] = None, reloj=time.time):
+        """
+        Args:
+            storage: DataStorage para el segundo nivel (opcional)
+            capacidad: Máximo de entradas en memoria (LRU)
+            ttl: Vigencia en segundos por estado; se combina con TTL_DEFAULT
+            reloj: Fuente de tiempo (epoch), inyectable para pruebas
+        """
+        self.storage = storage
+        self.capacidad = capacidad
+        self.ttl = {**TTL_DEFAULT, **(ttl or {})}
+        self.reloj = reloj
+
+        self._lock = threading.Lock()
+        self._memoria: 'OrderedDict[Any, tuple]' = OrderedDict()
+        self.contadores = {
+            'hits_memoria': 0,
+            'hits_sqlite': 0,
+            'hits_negativos': 0,
+            'misses': 0,
+            'expirados': 0,
+            'guardados': 0,
+        }
+
+    def ttl_para(self, estado: str) -> float:
+        return self.ttl.get(estado, self.ttl['default'])
+
+    def obtener(self, documento: str, fecha_expedicion: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Retorna una copia del resultado vigente o None si hay que consultar"""
+        clave = (documento, fecha_expedicion)
+        ahora = self.reloj()
+
+        with self._lock:
+            entrada = self._memoria.get(clave)
+            if entrada:
+                expira, resultado = entrada
+                if expira > ahora:
+                    self._memoria.move_to_end(clave)
+                    self._contar_hit('hits_memoria', resultado)
+                    return {**resultado, 'cache': 'memoria'}
+                del self._memoria[clave]
+                self.contadores['expirados'] += 1
+
+        encontrado = self._obtener_sqlite(documento, fecha_expedicion, ahora)
+        if encontrado:
+            resultado, expira = encontrado
+            with self._lock:
+                self._contar_hit('hits_sqlite', resultado)
+            # En memoria vence cuando vence la fila: un hit no renueva el TTL
+            self._guardar_memoria(clave, resultado, expira)
+            return {**resultado, 'cache': 'sqlite'}
+
+        with self._lock:
+            self.contadores['misses'] += 1
+        return None
+
+    def guardar(self, documento: str, resultado: Dict[str, Any],
+                fecha_expedicion: Optional[str] = None) -> None:
+        """Guarda un resultado recién obtenido del sitio"""
+        estado = clasificar(resultado)
+        if self.ttl_para(estado) <= 0:
+            return
+
+        self._guardar_memoria((documento, fecha_expedicion), resultado,
+                              self.reloj() + self.ttl_para(estado))
+        with self._lock:
+            self.contadores['guardados'] += 1
+
+        # Los positivos ya los persiste el flujo completo; los "no encontrado" solo la caché
+        if estado == NO_ENCONTRADO and self.storage:
+            try:
+                self.storage.save_consulta({
+                    'documento': documento,
+                    'consulta_exitosa': False,
+                    'codigo_error': NO_ENCONTRADO,
+                    'fecha_expedicion': fecha_expedicion,
+                })
+            except Exception as e:
+                logger.warning(f"⚠️  No se pudo persistir resultado negativo de {documento}: {e}")
+
+    def _guardar_memoria(self, clave, resultado: Dict[str, Any], expira: float) -> None:
+        with self._lock:
+            self._memoria[clave] = (expira, {k: v for k, v in resultado.items() if k not in NO_CACHEABLES})
+            self._memoria.move_to_end(clave)
+            while len(self._memoria) > self.capacidad:
+                self._memoria.popitem(last=False)
+
+    def _obtener_sqlite(self, documento: str, fecha_expedicion: Optional[str],
+                        ahora: float) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Reconstruye el resultado a partir de la última consulta guardada, si sigue vigente
+
+        Con fecha_expedicion solo sirve una consulta hecha con esa misma fecha (misma
+        clave que la memoria); sin ella, la última del documento.
+
+        Returns:
+            (resultado, epoch en que vence la fila) o None
+        """
+        if not self.storage:
+            return None
+
+        try:
+            fila = self.storage.get_consulta_by_documento(documento, fecha_expedicion)
+        except Exception as e:
+            logger.warning(f"⚠️  Error leyendo caché SQLite para {documento}: {e}")
+            return None
+        if not fila:
+            return None
+
+        if fila.get('consulta_exitosa'):
+            resultado = {
+                'success': True,
+                'documento': documento,
+                'nombre': fila.get('nombre') or '',
+                'fecha_expedicion': fila.get('fecha_expedicion'),
+                'estado_vigencia': fila.get('estado_vigencia'),
+                'pdf_path': fila.get('pdf_path'),
+                'fuente': fila.get('fuente'),
+            }
+        elif fila.get('codigo_error') == NO_ENCONTRADO:
+            resultado = {'success': False, 'documento': documento, 'error': 'Documento no encontrado'}
+        else:
+            return None
+
+        try:
+            guardado = datetime.fromisoformat(fila['timestamp']).timestamp()
+        except (TypeError, ValueError):
+            return None
+
+        expira = guardado + self.ttl_para(clasificar(resultado))
+        if expira <= ahora:
+            return None
+        return resultado, expira
+
+    def _contar_hit(self, nivel: str, resultado: Dict[str, Any]) -> None:
+        self.contadores[nivel] += 1
+        if clasificar(resultado) == NO_ENCONTRADO:
+            self.contadores['hits_negativos'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self.contadores)
+            c['entradas_memoria'] = len(self._memoria)
+        hits = c['hits_memoria'] + c['hits_sqlite']
+        total = hits + c['misses']
+        c['tasa_hits'] = (hits / total * 100) if total else 0
+        return c
@@ -0,0 +1,134 @@
+"""
+Corpus de CAPTCHAs: cada imagen enviada se guarda con lo que leyó el solver y
+lo que respondió el sitio, en un único archivo SQLite, para medir solvers sin
+tocar el sitio real
+"""
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from utils.helpers import cargar_config
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CaptchaCorpus:
+    """Imágenes PNG de CAPTCHA con el veredicto del sitio"""
+
+    def __init__(self, db_name: str = "corpus_captchas.db"):
+        self.db_name = db_name
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_name, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._lock:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS captchas (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    imagen BLOB NOT NULL,
+                    texto_leido TEXT,
+                    confianza REAL,
+                    aceptado INTEGER,
+                    etiqueta TEXT,
+                    fuente TEXT,
+                    creado TEXT NOT NULL
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_captchas_etiqueta ON captchas(etiqueta)')
+            self._conn.commit()
+
+    def registrar(self, imagen: bytes, texto_leido: str, confianza: Optional[float],
+                  aceptado: Optional[bool], fuente: str = 'http') -> int:
+        """
+        Guarda un CAPTCHA enviado
+
+        Args:
+            imagen: Bytes PNG tal como llegaron del sitio
+            texto_leido: Lo que se envió
+            confianza: Confianza del solver (0-100)
+            aceptado: Veredicto del sitio (None si la respuesta no lo deja claro)
+            fuente: 'http', 'playwright', ...
+
+        Si el sitio aceptó el CAPTCHA, lo leído queda como etiqueta.
+        """
+        etiqueta = texto_leido if aceptado else None
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO captchas (imagen, texto_leido, confianza, aceptado, etiqueta, fuente, creado) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (sqlite3.Binary(bytes(imagen)), texto_leido, confianza,
+                 None if aceptado is None else int(aceptado), etiqueta, fuente, datetime.now().isoformat())
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def etiquetar(self, captcha_id: int, etiqueta: str) -> None:
+        """Etiqueta a mano un CAPTCHA rechazado o dudoso"""
+        with self._lock:
+            self._conn.execute('UPDATE captchas SET etiqueta = ? WHERE id = ?', (etiqueta, captcha_id))
+            self._conn.commit()
+
+    def muestras(self, solo_etiquetadas: bool = True,
+                 limite: Optional[int] = None) -> Iterator[Tuple[int, bytes, Optional[str]]]:
+        """(id, PNG, etiqueta) en orden de registro"""
+        consulta = 'SELECT id, imagen, etiqueta FROM captchas'
+        if solo_etiquetadas:
+            consulta += ' WHERE etiqueta IS NOT NULL'
+        consulta += ' ORDER BY id'
+        if limite:
+            consulta += f' LIMIT {int(limite)}'
+        with self._lock:
+            filas = self._conn.execute(consulta).fetchall()
+        for captcha_id, imagen, etiqueta in filas:
+            yield captcha_id, bytes(imagen), etiqueta
+
+    def exportar(self, directorio: str) -> int:
+        """Escribe las muestras etiquetadas como <etiqueta>_<id>.png (formato de utils.glyph_classifier)"""
+        destino = Path(directorio)
+        destino.mkdir(parents=True, exist_ok=True)
+        cantidad = 0
+        for captcha_id, imagen, etiqueta in self.muestras():
+            (destino / f"{etiqueta}_{captcha_id}.png").write_bytes(imagen)
+            cantidad += 1
+        return cantidad
+
+    def resumen(self) -> Dict[str, Any]:
+        with self._lock:
+            total, aceptados, rechazados, etiquetados = self._conn.execute(
+                'SELECT COUNT(*), SUM(aceptado = 1), SUM(aceptado = 0), SUM(etiqueta IS NOT NULL) FROM captchas'
+            ).fetchone()
+        return {
+            'total': total,
+            'aceptados': aceptados or 0,
+            'rechazados': rechazados or 0,
+            'etiquetados': etiquetados or 0,
+        }
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_corpus: Optional[CaptchaCorpus] = None
+_cargado = False
+_corpus_lock = threading.Lock()
+
+
+def get_captcha_corpus() -> Optional[CaptchaCorpus]:
+    """
+    Corpus compartido (config/settings.json → corpus_captcha)
+
+    Retorna None si la grabación está deshabilitada ("grabar": false).
+    """
+    global _corpus, _cargado
+    with _corpus_lock:
+        if not _cargado:
+            _cargado = True
+            config = cargar_config().get('corpus_captcha', {})
+            if config.get('grabar', False):
+                _corpus = CaptchaCorpus(config.get('db', "corpus_captchas.db"))
+                logger.info(f"🎞️  Grabando CAPTCHAs en {_corpus.db_name}")
+        return _corpus
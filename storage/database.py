@@ -14,6 +14,27 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _variantes_fecha(fecha: str) -> List[str]:
+    """La misma fecha como llega en la consulta (DD/MM/YYYY) y como la guarda el extractor (ISO)"""
+    variantes = [fecha]
+    for entrada, salida in (('%d/%m/%Y', '%Y-%m-%d'), ('%Y-%m-%d', '%d/%m/%Y')):
+        try:
+            variantes.append(datetime.strptime(fecha, entrada).strftime(salida))
+        except ValueError:
+            continue
+    return variantes
+
+
+_INSERT_METRICAS = '''
+    INSERT INTO metricas_paralelas 
+    (session_id, total_consultas, exitosas, fallidas, tiempo_total,
+     tiempo_promedio, tiempo_minimo, tiempo_maximo, bloqueos_detectados,
+     tasa_exito, fecha_ejecucion, worker_count, ventana, throughput,
+     duplicados, tiempo_ahorrado)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
 class DataStorage:
     """Clase principal para almacenamiento de datos"""
     
@@ -65,10 +86,22 @@ class DataStorage:
                 bloqueos_detectados INTEGER,
                 tasa_exito REAL,
                 fecha_ejecucion TEXT,
-                worker_count INTEGER
+                worker_count INTEGER,
+                ventana INTEGER,
+                throughput REAL,
+                duplicados INTEGER,
+                tiempo_ahorrado REAL
             )
         ''')
         
+        # Bases creadas antes de las métricas por ventana y de la coalescencia
+        self._migrar_columnas(cursor, 'metricas_paralelas', {
+            'ventana': 'INTEGER',
+            'throughput': 'REAL',
+            'duplicados': 'INTEGER',
+            'tiempo_ahorrado': 'REAL'
+        })
+        
         # Tabla de logs de errores
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS logs_errores (
@@ -91,6 +124,16 @@ class DataStorage:
         conn.close()
         logger.info("✅ Base de datos inicializada con 3 tablas")
     
+    def _migrar_columnas(self, cursor, tabla: str, columnas: Dict[str, str]) -> None:
+        """Agrega a una tabla existente las columnas que le falten"""
+        cursor.execute(f'PRAGMA table_info({tabla})')
+        existentes = {fila[1] for fila in cursor.fetchall()}
+        
+        for nombre, tipo in columnas.items():
+            if nombre not in existentes:
+                cursor.execute(f'ALTER TABLE {tabla} ADD COLUMN {nombre} {tipo}')
+                logger.info(f"🔧 Columna agregada: {tabla}.{nombre}")
+    
     def save_consulta(self, data: Dict[str, Any]) -> int:
         """
         Guarda los datos de una consulta en la base de datos
@@ -175,26 +218,7 @@ class DataStorage:
         cursor = conn.cursor()
         
         try:
-            cursor.execute('''
-                INSERT INTO metricas_paralelas 
-                (session_id, total_consultas, exitosas, fallidas, tiempo_total,
-                 tiempo_promedio, tiempo_minimo, tiempo_maximo, bloqueos_detectados,
-                 tasa_exito, fecha_ejecucion, worker_count)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                metricas.get('session_id', datetime.now().strftime('%Y%m%d_%H%M%S')),
-                metricas.get('total_consultas', 0),
-                metricas.get('exitosas', 0),
-                metricas.get('fallidas', 0),
-                metricas.get('tiempo_total', 0),
-                metricas.get('tiempo_promedio', 0),
-                metricas.get('tiempo_minimo', 0),
-                metricas.get('tiempo_maximo', 0),
-                metricas.get('bloqueos_detectados', 0),
-                metricas.get('tasa_exito', 0),
-                datetime.now().isoformat(),
-                metricas.get('worker_count', 15)
-            ))
+            cursor.execute(_INSERT_METRICAS, self._fila_metricas(metricas))
             
             conn.commit()
             return cursor.lastrowid
@@ -205,6 +229,67 @@ class DataStorage:
         finally:
             conn.close()
     
+    def _fila_metricas(self, metricas: Dict[str, Any]) -> tuple:
+        """Valores de una fila de metricas_paralelas, en el orden de _INSERT_METRICAS"""
+        return (
+            metricas.get('session_id', datetime.now().strftime('%Y%m%d_%H%M%S')),
+            metricas.get('total_consultas', 0),
+            metricas.get('exitosas', 0),
+            metricas.get('fallidas', 0),
+            metricas.get('tiempo_total', 0),
+            metricas.get('tiempo_promedio', 0),
+            metricas.get('tiempo_minimo', 0),
+            metricas.get('tiempo_maximo', 0),
+            metricas.get('bloqueos_detectados', 0),
+            metricas.get('tasa_exito', 0),
+            datetime.now().isoformat(),
+            metricas.get('worker_count', 15),
+            metricas.get('ventana'),
+            metricas.get('throughput'),
+            metricas.get('duplicados'),
+            metricas.get('tiempo_ahorrado')
+        )
+    
+    def save_ventanas_concurrencia(self, session_id: str, ventanas: List[Dict[str, Any]]) -> int:
+        """
+        Guarda en metricas_paralelas una fila por ventana del control adaptativo
+        
+        Todas las filas van en una conexión y una transacción.
+        
+        Args:
+            session_id: Sesión del lote al que pertenecen las ventanas
+            ventanas: Resúmenes producidos por AIMDController
+            
+        Returns:
+            Número de filas insertadas
+        """
+        filas = [self._fila_metricas({
+            'session_id': session_id,
+            'ventana': v['ventana'],
+            'worker_count': v['limite'],
+            'throughput': v['throughput'],
+            'total_consultas': v['consultas'],
+            'exitosas': v['exitosas'],
+            'fallidas': v['consultas'] - v['exitosas'],
+            'tiempo_total': v['duracion'],
+            'tiempo_promedio': v['latencia_promedio'],
+            'bloqueos_detectados': v['bloqueos'],
+            'tasa_exito': v['tasa_exito']
+        }) for v in ventanas]
+        if not filas:
+            return 0
+        
+        conn = sqlite3.connect(self.db_name)
+        try:
+            with conn:
+                conn.executemany(_INSERT_METRICAS, filas)
+            return len(filas)
+        except sqlite3.Error as e:
+            logger.error(f"Error guardando ventanas de concurrencia: {e}")
+            raise
+        finally:
+            conn.close()
+    
     def export_to_csv(self, filename: str = "consultas.csv") -> Path:
         """Exporta todas las consultas a CSV"""
         conn = sqlite3.connect(self.db_name)
@@ -321,19 +406,31 @@ class DataStorage:
         finally:
             conn.close()
     
-    def get_consulta_by_documento(self, documento: str) -> Optional[Dict[str, Any]]:
-        """Busca una consulta por número de documento"""
+    def get_consulta_by_documento(self, documento: str,
+                                  fecha_expedicion: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Busca la última consulta de un documento
+        
+        Args:
+            documento: Número de documento
+            fecha_expedicion: Si se da, solo consultas con esa fecha (DD/MM/YYYY o YYYY-MM-DD)
+        """
         conn = sqlite3.connect(self.db_name)
         conn.row_factory = sqlite3.Row
         
         try:
             cursor = conn.cursor()
-            cursor.execute('''
+            filtro, parametros = '', [documento]
+            if fecha_expedicion is not None:
+                variantes = _variantes_fecha(fecha_expedicion)
+                filtro = f" AND fecha_expedicion IN ({', '.join('?' * len(variantes))})"
+                parametros += variantes
+            cursor.execute(f'''
                 SELECT * FROM consultas 
-                WHERE documento = ? 
+                WHERE documento = ?{filtro} 
                 ORDER BY timestamp DESC 
                 LIMIT 1
-            ''', (documento,))
+            ''', parametros)
             
             row = cursor.fetchone()
             return dict(row) if row else None
@@ -0,0 +1,155 @@
+"""
+Cache de extracciones de PDF direccionado por contenido
+
+Cada PDF se identifica por el SHA-256 de sus bytes, así que el mismo
+certificado descargado dos veces (o una carpeta procesada de nuevo) no vuelve
+a pasar por pdfplumber. Se guarda el texto extraído junto con los campos y el
+hash de los patrones de cada campo: si cambian los patrones de un campo, solo
+ese campo se recalcula sobre el texto guardado.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from utils.helpers import cargar_config
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def sha256_pdf(contenido: bytes) -> str:
+    return hashlib.sha256(contenido).hexdigest()
+
+
+class CacheExtracciones:
+    """Tabla extracciones (junto a consultas en la base de la registraduría)"""
+
+    def __init__(self, db_name: str = "consultas_registraduria.db", version: int = 1):
+        """
+        Args:
+            db_name: Archivo SQLite
+            version: Versión de la extracción de texto por defecto; las entradas de otra
+                versión se ignoran. Quien extrae debería pasar la suya en cada llamada.
+        """
+        self.db_name = db_name
+        self.version = version
+        self.aciertos = 0
+        self.parciales = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_name, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._lock:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS extracciones (
+                    sha256 TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    texto TEXT NOT NULL,
+                    campos TEXT NOT NULL,
+                    hashes TEXT NOT NULL,
+                    actualizado TEXT NOT NULL
+                )
+            ''')
+            self._conn.commit()
+
+    def obtener(self, sha256: str, hashes: Dict[str, str],
+                version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Entrada guardada para el PDF
+
+        Args:
+            sha256: Hash del contenido del PDF
+            hashes: Hash vigente de los patrones de cada campo
+            version: Versión de la extracción de texto (default: la del cache)
+
+        Returns:
+            {'texto', 'campos', 'obsoletos'} o None si no está o es de otra versión.
+            'campos' trae solo los campos cuyos patrones no cambiaron; 'obsoletos'
+            son los que hay que recalcular sobre el texto.
+        """
+        with self._lock:
+            fila = self._conn.execute(
+                'SELECT texto, campos, hashes FROM extracciones WHERE sha256 = ? AND version = ?',
+                (sha256, self.version if version is None else version)
+            ).fetchone()
+            if fila is None:
+                self.fallos += 1
+                return None
+
+            texto, campos, guardados = fila[0], json.loads(fila[1]), json.loads(fila[2])
+            obsoletos = [campo for campo, hash_campo in hashes.items() if guardados.get(campo) != hash_campo]
+            if obsoletos:
+                self.parciales += 1
+            else:
+                self.aciertos += 1
+        return {
+            'texto': texto,
+            'campos': {campo: valor for campo, valor in campos.items()
+                       if campo in hashes and campo not in obsoletos},
+            'obsoletos': obsoletos,
+        }
+
+    def guardar(self, sha256: str, texto: str, campos: Dict[str, Any], hashes: Dict[str, str],
+                version: Optional[int] = None) -> None:
+        """Guarda (o reemplaza) la extracción de un PDF con su versión de texto (default: la del cache)"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO extracciones (sha256, version, texto, campos, hashes, actualizado) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (sha256, self.version if version is None else version, texto,
+                 json.dumps(campos, ensure_ascii=False),
+                 json.dumps(hashes), datetime.now().isoformat())
+            )
+            self._conn.commit()
+
+    def purgar_versiones(self, version: Optional[int] = None) -> int:
+        """Borra las entradas de versiones de la extracción de texto distintas de `version`"""
+        with self._lock:
+            cursor = self._conn.execute('DELETE FROM extracciones WHERE version != ?',
+                                        (self.version if version is None else version,))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._conn.execute('SELECT COUNT(*) FROM extracciones').fetchone()[0]
+        consultas = self.aciertos + self.parciales + self.fallos
+        return {
+            'entradas': total,
+            'aciertos': self.aciertos,
+            'parciales': self.parciales,
+            'fallos': self.fallos,
+            'tasa_aciertos': (self.aciertos + self.parciales) / consultas * 100 if consultas else 0.0,
+        }
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_caches: Dict[int, CacheExtracciones] = {}
+_config: Optional[Dict[str, Any]] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache_extracciones(version: int = 1) -> Optional[CacheExtracciones]:
+    """
+    Cache compartido para esa versión de la extracción de texto
+    (config/settings.json → cache_extracciones)
+
+    Retorna None si está deshabilitado ("habilitado": false).
+    """
+    global _config
+    with _cache_lock:
+        if _config is None:
+            _config = cargar_config().get('cache_extracciones', {})
+        if not _config.get('habilitado', False):
+            return None
+        if version not in _caches:
+            _caches[version] = CacheExtracciones(_config.get('db', "consultas_registraduria.db"), version)
+            logger.info(f"🗃️  Cache de extracciones en {_caches[version].db_name} (versión {version})")
+        return _caches[version]
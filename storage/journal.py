@@ -0,0 +1,136 @@
+"""
+Journal de lotes: registra el estado de cada documento a medida que avanza
+(pendiente → en_curso → hecho/fallido) para poder reanudar tras una caída
+"""
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = 'pendiente'
+EN_CURSO = 'en_curso'
+HECHO = 'hecho'
+FALLIDO = 'fallido'
+
+ESTADOS_TERMINALES = (HECHO, FALLIDO)
+
+
+class RunJournal:
+    """
+    Journal en SQLite, seguro ante interrupciones
+
+    Una fila por documento y lote que se actualiza (UPSERT) en cada cambio de
+    estado; los lotes se registran aparte, una sola vez.
+    """
+
+    def __init__(self, db_name: str = "journal_lotes.db"):
+        self.db_name = db_name
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_name, check_same_thread=False)
+        # WAL + NORMAL: cada commit sobrevive a la caída del proceso sin fsync por fila
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._init_tablas()
+
+    def _init_tablas(self) -> None:
+        with self._lock:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS lotes (
+                    run_id TEXT PRIMARY KEY,
+                    archivo TEXT NOT NULL,
+                    archivo_salida TEXT,
+                    parametros TEXT,
+                    creado TEXT NOT NULL
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS journal (
+                    run_id TEXT NOT NULL,
+                    posicion INTEGER NOT NULL,
+                    documento TEXT NOT NULL,
+                    estado TEXT NOT NULL,
+                    intentos INTEGER DEFAULT 0,
+                    error TEXT,
+                    actualizado TEXT NOT NULL,
+                    PRIMARY KEY (run_id, posicion)
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_journal_estado ON journal(run_id, estado)')
+            self._conn.commit()
+
+    def crear_run(self, run_id: str, archivo: str, archivo_salida: Optional[str] = None,
+                  parametros: Optional[Dict[str, Any]] = None) -> str:
+        """Registra un lote nuevo"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO lotes (run_id, archivo, archivo_salida, parametros, creado) VALUES (?, ?, ?, ?, ?)',
+                (run_id, archivo, archivo_salida, json.dumps(parametros or {}), datetime.now().isoformat())
+            )
+            self._conn.commit()
+        logger.info(f"📒 Lote registrado en journal: {run_id}")
+        return run_id
+
+    def obtener_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            fila = self._conn.execute(
+                'SELECT run_id, archivo, archivo_salida, parametros, creado FROM lotes WHERE run_id = ?',
+                (run_id,)
+            ).fetchone()
+        if not fila:
+            return None
+        return {
+            'run_id': fila[0],
+            'archivo': fila[1],
+            'archivo_salida': fila[2],
+            'parametros': json.loads(fila[3] or '{}'),
+            'creado': fila[4],
+        }
+
+    def marcar(self, run_id: str, posicion: int, documento: str, estado: str,
+               error: Optional[str] = None) -> None:
+        """
+        Registra el estado de un documento
+
+        Solo los estados terminales se confirman de inmediato: pendiente y
+        en_curso son informativos, porque al reanudar todo lo que no esté
+        terminado se vuelve a encolar de todas formas.
+        """
+        with self._lock:
+            self._conn.execute('''
+                INSERT INTO journal (run_id, posicion, documento, estado, intentos, error, actualizado)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(run_id, posicion) DO UPDATE SET
+                    estado = excluded.estado,
+                    intentos = journal.intentos + excluded.intentos,
+                    error = excluded.error,
+                    actualizado = excluded.actualizado
+            ''', (run_id, posicion, documento, estado, 1 if estado == EN_CURSO else 0,
+                  error, datetime.now().isoformat()))
+            if estado in ESTADOS_TERMINALES:
+                self._conn.commit()
+
+    def posiciones_terminadas(self, run_id: str) -> Set[int]:
+        """Posiciones ya resueltas (hecho o fallido) de un lote"""
+        with self._lock:
+            filas = self._conn.execute(
+                'SELECT posicion FROM journal WHERE run_id = ? AND estado IN (?, ?)',
+                (run_id, *ESTADOS_TERMINALES)
+            )
+            return {fila[0] for fila in filas}
+
+    def resumen(self, run_id: str) -> Dict[str, int]:
+        """Cantidad de documentos por estado"""
+        with self._lock:
+            filas = self._conn.execute(
+                'SELECT estado, COUNT(*) FROM journal WHERE run_id = ? GROUP BY estado', (run_id,)
+            ).fetchall()
+        return {estado: cantidad for estado, cantidad in filas}
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,255 @@
+"""
+Test de integración del backend HTTP contra un Datos.aspx local de imitación
+"""
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs
+
+import pytest
+
+# Agregar directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+pytest.importorskip("requests")
+
+from pages.consulta_http import ConsultaHTTP, consulta_individual, partes_fecha
+from utils.captcha_solver import get_metricas_captcha
+from utils.rate_limiter import RateLimiter
+
+PDF_FALSO = b"%PDF-1.4\n" + b"0" * 50000 + b"\n%%EOF"
+CAPTCHA_PNG = b"\x89PNG\r\n\x1a\nCAPTCHA-7391"
+
+FORMULARIO = """<html><body>
+<form method="post" action="./Datos.aspx" id="form1">
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="VS-{sesion}" />
+<input type="hidden" name="__VIEWSTATEGENERATOR" id="__VIEWSTATEGENERATOR" value="GEN" />
+<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="EV-{sesion}" />
+<input name="ctl00$ContentPlaceHolder1$TextBox1" type="text" id="ContentPlaceHolder1_TextBox1" />
+<select name="ctl00$ContentPlaceHolder1$DropDownList1" id="ContentPlaceHolder1_DropDownList1"></select>
+<select name="ctl00$ContentPlaceHolder1$DropDownList2" id="ContentPlaceHolder1_DropDownList2"></select>
+<select name="ctl00$ContentPlaceHolder1$DropDownList3" id="ContentPlaceHolder1_DropDownList3"></select>
+<img id="datos_ContentPlaceHolder1_Captcha1_CaptchaImage" src="BotDetectCaptcha.ashx?get=image&amp;c=x" />
+<input name="ctl00$ContentPlaceHolder1$TextBox2" type="text" id="ContentPlaceHolder1_TextBox2" />
+<input type="submit" name="ctl00$ContentPlaceHolder1$Button1" value="Continuar" id="ContentPlaceHolder1_Button1" />
+{mensaje}
+</form></body></html>"""
+
+
+class DatosAspxFalso(BaseHTTPRequestHandler):
+    """Imita el ciclo GET formulario → GET captcha → POST con cookie de sesión"""
+    sesiones = {}
+    envios = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _sesion(self):
+        cookie = self.headers.get('Cookie', '')
+        for parte in cookie.split(';'):
+            if parte.strip().startswith('ASP.NET_SessionId='):
+                return parte.strip().split('=', 1)[1]
+        return None
+
+    def _responder(self, codigo, tipo, cuerpo, cookie=None):
+        self.send_response(codigo)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(cuerpo)))
+        if cookie:
+            self.send_header('Set-Cookie', f'ASP.NET_SessionId={cookie}; path=/')
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        if self.path.startswith('/Datos.aspx'):
+            with self.lock:
+                sesion = f"S{len(self.sesiones) + 1}"
+                self.sesiones[sesion] = {'captcha_visto': False}
+            html = FORMULARIO.format(sesion=sesion, mensaje='')
+            self._responder(200, 'text/html; charset=utf-8', html.encode(), cookie=sesion)
+        elif self.path.startswith('/BotDetectCaptcha.ashx'):
+            sesion = self._sesion()
+            if sesion not in self.sesiones:
+                return self._responder(403, 'text/plain', b'sin sesion')
+            self.sesiones[sesion]['captcha_visto'] = True
+            # Una imagen refrescada trae otro código legible
+            self._responder(200, 'image/png', CAPTCHA_PNG + (b'-R' if '_r=' in self.path else b''))
+        else:
+            self._responder(404, 'text/plain', b'no')
+
+    def do_POST(self):
+        largo = int(self.headers.get('Content-Length', 0))
+        datos = {k: v[0] for k, v in parse_qs(self.rfile.read(largo).decode()).items()}
+        sesion = self._sesion()
+        with self.lock:
+            DatosAspxFalso.envios += 1
+
+        valido = (
+            sesion in self.sesiones
+            and self.sesiones[sesion]['captcha_visto']
+            and datos.get('__VIEWSTATE') == f"VS-{sesion}"
+            and datos.get('__EVENTVALIDATION') == f"EV-{sesion}"
+            and datos.get('ctl00$ContentPlaceHolder1$Button1') == 'Continuar'
+            and datos.get('ctl00$ContentPlaceHolder1$DropDownList1') == '09'
+        )
+        if valido and datos.get('ctl00$ContentPlaceHolder1$TextBox2') == '7391':
+            self._responder(200, 'application/pdf', PDF_FALSO)
+        else:
+            html = FORMULARIO.format(sesion=sesion, mensaje='<span>El código captcha es incorrecto</span>')
+            self._responder(200, 'text/html; charset=utf-8', html.encode())
+
+
+@pytest.fixture
+def servidor():
+    DatosAspxFalso.sesiones = {}
+    DatosAspxFalso.envios = 0
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), DatosAspxFalso)
+    hilo = threading.Thread(target=httpd.serve_forever, daemon=True)
+    hilo.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/Datos.aspx"
+    httpd.shutdown()
+
+
+def _limiter_libre():
+    return RateLimiter({e: {'tasa': 1000.0, 'capacidad': 1000}
+                        for e in ('formulario', 'captcha', 'pdf')})
+
+
+def test_consulta_http_descarga_pdf(servidor):
+    """Recorre el formulario completo y obtiene el PDF en memoria"""
+    imagenes = []
+
+    def solver(imagen):
+        imagenes.append(imagen)
+        return imagen.split(b'-')[-1].decode(), 90.0
+
+    cliente = ConsultaHTTP(url=servidor, solver=solver, rate_limiter=_limiter_libre())
+    resultado = cliente.consultar('1032493824', '09', '10', '2015')
+
+    assert resultado['consulta_exitosa'], resultado
+    assert resultado['pdf'] == PDF_FALSO
+    assert imagenes == [CAPTCHA_PNG]
+    assert set(resultado['tiempos']) == {'formulario', 'captcha', 'envio'}
+
+
+def test_consulta_http_pdf_a_archivo(servidor, tmp_path):
+    cliente = ConsultaHTTP(url=servidor, solver=lambda img: ('7391', 90.0), rate_limiter=_limiter_libre())
+    destino = tmp_path / "certificado.pdf"
+
+    resultado = cliente.consultar('1032493824', '09', '10', '2015', destino=destino)
+
+    assert resultado['pdf_descargado'] == str(destino)
+    assert destino.read_bytes() == PDF_FALSO
+
+
+def test_consulta_http_captcha_rechazado(servidor):
+    cliente = ConsultaHTTP(url=servidor, solver=lambda img: ('0000', 90.0), rate_limiter=_limiter_libre())
+    resultado = cliente.consultar('1032493824', '09', '10', '2015')
+
+    assert not resultado['consulta_exitosa']
+    assert resultado['error'] == "CAPTCHA rechazado"
+
+
+def test_consultas_concurrentes_aisladas(servidor):
+    """Cada consulta usa su propia cookie aunque compartan conexiones"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    cliente = ConsultaHTTP(url=servidor, solver=lambda img: ('7391', 90.0), rate_limiter=_limiter_libre())
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        resultados = list(executor.map(
+            lambda i: cliente.consultar(str(100000000 + i), '09', '10', '2015'), range(16)))
+
+    assert all(r['consulta_exitosa'] for r in resultados)
+    assert len(DatosAspxFalso.sesiones) == 16
+
+
+def test_captcha_dudoso_se_refresca_antes_de_enviar(servidor):
+    """Con confianza baja se pide otra imagen en la misma sesión y se envía una sola vez"""
+    imagenes = []
+
+    def solver(imagen):
+        imagenes.append(imagen)
+        return ('7391', 92.0) if imagen.endswith(b'-R') else ('7S91', 12.0)
+
+    antes = get_metricas_captcha().stats()
+    cliente = ConsultaHTTP(url=servidor, solver=solver, rate_limiter=_limiter_libre())
+    resultado = cliente.consultar('1032493824', '09', '10', '2015')
+    despues = get_metricas_captcha().stats()
+
+    assert resultado['consulta_exitosa'], resultado
+    assert imagenes == [CAPTCHA_PNG, CAPTCHA_PNG + b'-R']
+    assert DatosAspxFalso.envios == 1
+    assert despues['refrescos'] - antes['refrescos'] == 1
+    assert despues['exitos'] - antes['exitos'] == 1
+
+
+def test_captcha_ilegible_no_se_envia(servidor):
+    antes = get_metricas_captcha().stats()
+    cliente = ConsultaHTTP(url=servidor, solver=lambda img: ('', 0.0), rate_limiter=_limiter_libre())
+    resultado = cliente.consultar('1032493824', '09', '10', '2015')
+    despues = get_metricas_captcha().stats()
+
+    assert resultado['error'] == "CAPTCHA ilegible"
+    assert DatosAspxFalso.envios == 0
+    assert despues['descartados'] - antes['descartados'] == 1
+    assert despues['envios'] == antes['envios']
+
+
+def test_graba_captcha_con_veredicto(servidor, tmp_path, monkeypatch):
+    """Con el corpus activo se guarda la imagen enviada y si el sitio la aceptó"""
+    from storage import captcha_corpus
+
+    corpus = captcha_corpus.CaptchaCorpus(str(tmp_path / "corpus.db"))
+    monkeypatch.setattr(captcha_corpus, 'get_captcha_corpus', lambda: corpus)
+
+    for captcha in ('7391', '0000'):
+        cliente = ConsultaHTTP(url=servidor, solver=lambda img, c=captcha: (c, 90.0),
+                               rate_limiter=_limiter_libre())
+        cliente.consultar('1032493824', '09', '10', '2015')
+
+    assert corpus.resumen() == {'total': 2, 'aceptados': 1, 'rechazados': 1, 'etiquetados': 1}
+    assert list(corpus.muestras()) == [(1, CAPTCHA_PNG, '7391')]
+    corpus.cerrar()
+
+
+def test_fecha_invalida_no_consulta():
+    assert partes_fecha("9/10/2015") == ('09', '10', '2015')
+    for fecha in ("2015-10-09", "9/10", "31/02/2015", "09/10/2015/1", "hoy"):
+        assert partes_fecha(fecha) is None
+        resultado = consulta_individual('1032493824', fecha)
+        assert resultado['consulta_exitosa'] is False
+        assert 'inválida' in resultado['error']
+
+
+def test_cliente_compartido_se_crea_una_vez(monkeypatch):
+    """Primeras llamadas concurrentes comparten un solo cliente (y su pool de conexiones)"""
+    import time
+    from pages import consulta_http
+
+    creados = []
+
+    class ClienteLento:
+        def __init__(self):
+            time.sleep(0.05)
+            creados.append(self)
+
+    monkeypatch.setattr(consulta_http, 'ConsultaHTTP', ClienteLento)
+    monkeypatch.setattr(consulta_http, '_cliente', None)
+
+    barrera = threading.Barrier(8)
+    clientes = []
+
+    def hilo():
+        barrera.wait()
+        clientes.append(consulta_http.get_cliente())
+
+    hilos = [threading.Thread(target=hilo) for _ in range(8)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    assert len(creados) == 1
+    assert all(c is creados[0] for c in clientes)
@@ -0,0 +1,134 @@
+"""
+Test del control adaptativo de concurrencia (AIMD)
+"""
+import threading
+import time
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importaciones
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from parallel.adaptive import AIMDController, es_bloqueo
+from parallel.streaming import StreamingBatchRunner
+
+
+class RelojFalso:
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def test_crece_mientras_el_sitio_responde_bien():
+    reloj = RelojFalso()
+    control = AIMDController(inicial=2, maximo=6, tamano_ventana=5, reloj=reloj)
+
+    for _ in range(4):
+        for _ in range(5):
+            reloj.ahora += 0.1
+            control.registrar(latencia=0.5, exito=True)
+
+    assert control.limite == 6
+    assert [v['limite'] for v in control.ventanas] == [2, 3, 4, 5]
+    assert all(abs(v['throughput'] - 10.0) < 1e-6 for v in control.ventanas)
+
+
+def test_reduce_ante_bloqueo_y_latencia():
+    reloj = RelojFalso()
+    control = AIMDController(inicial=8, maximo=20, tamano_ventana=4, reloj=reloj)
+
+    # Ventana sana fija la latencia base
+    for _ in range(4):
+        control.registrar(latencia=1.0, exito=True)
+    assert control.limite == 9
+
+    # Un bloqueo reduce a la mitad de inmediato, sin esperar a cerrar la ventana
+    reloj.ahora += 1.0
+    assert control.registrar(latencia=1.0, exito=False, bloqueo=True) is None
+    assert control.limite == 4
+    for _ in range(3):
+        control.registrar(latencia=1.0, exito=True)
+    assert control.ventanas[-1]['motivo_reduccion'] == 'bloqueo'
+    assert control.limite == 4
+
+    # Latencia muy por encima de la base también reduce
+    for _ in range(4):
+        control.registrar(latencia=3.0, exito=True)
+    assert control.ventanas[-1]['motivo_reduccion'] == 'latencia'
+    assert control.limite == 2
+
+
+def test_rafaga_de_bloqueos_recorta_una_vez():
+    """N consultas en vuelo que reciben 429 juntas no llevan el límite al mínimo"""
+    reloj = RelojFalso()
+    control = AIMDController(inicial=32, maximo=32, tamano_ventana=4, reloj=reloj)
+
+    # 10 consultas salieron en t=0 y vuelven bloqueadas en t=2: más de una ventana
+    reloj.ahora = 2.0
+    for _ in range(10):
+        control.registrar(latencia=2.0, exito=False, bloqueo=True)
+    assert control.limite == 16
+    assert sum(v['bloqueos'] for v in control.ventanas) == 8
+    assert [v['nuevo_limite'] for v in control.ventanas] == [16, 16]
+
+    # Una consulta que salió después del recorte sí vuelve a recortar
+    reloj.ahora = 3.0
+    control.registrar(latencia=0.5, exito=False, bloqueo=True)
+    assert control.limite == 8
+
+
+def test_es_bloqueo():
+    assert es_bloqueo({'success': False, 'error': 'Timeout esperando la página'})
+    assert es_bloqueo({'success': False, 'error': 'CAPTCHA rechazado'})
+    assert es_bloqueo({'success': False, 'error': '429 Client Error: Too Many Requests for url'})
+    assert es_bloqueo({'consulta_exitosa': False, 'error': 'HTTP 503'})
+    assert es_bloqueo({'success': False, 'status_code': 403, 'error': 'sin PDF'})
+    assert not es_bloqueo({'success': False, 'error': 'Documento no encontrado'})
+    assert not es_bloqueo({'success': True, 'error': 'timeout'})
+    # Los códigos dentro de una cédula no son bloqueos
+    assert not es_bloqueo({'success': False, 'error': 'Sin datos para 1050312345'})
+    assert not es_bloqueo({'success': False, 'error': 'Documento 79403221 no encontrado'})
+    assert not es_bloqueo({'success': False, 'status_code': 404, 'error': 'Not Found'})
+    # Un CAPTCHA que nuestro OCR no pudo leer no es el sitio bloqueando
+    assert not es_bloqueo({'consulta_exitosa': False, 'error': 'CAPTCHA ilegible'})
+    assert not es_bloqueo({'consulta_exitosa': False, 'error': 'CAPTCHA ilegible tras refrescar'})
+
+
+def test_ventanas_se_entregan_al_cerrar_y_no_se_acumulan():
+    entregadas = []
+    control = AIMDController(inicial=2, maximo=50, tamano_ventana=2, reloj=RelojFalso(),
+                             ventanas_en_memoria=3, al_cerrar_ventana=entregadas.append)
+
+    for _ in range(21):
+        control.registrar(latencia=0.5, exito=True)
+    control.finalizar()
+
+    assert [v['ventana'] for v in entregadas] == list(range(1, 12))
+    assert [v['ventana'] for v in control.ventanas] == [9, 10, 11]
+    assert control.total_ventanas == 11
+    assert control.limite_maximo == 12
+
+
+def test_runner_respeta_limite_del_controlador():
+    """Con límite 3 nunca hay más de 3 consultas simultáneas"""
+    control = AIMDController(inicial=3, minimo=3, maximo=3)
+    lock = threading.Lock()
+    estado = {'en_curso': 0, 'max': 0}
+
+    def consulta(query_data):
+        with lock:
+            estado['en_curso'] += 1
+            estado['max'] = max(estado['max'], estado['en_curso'])
+        time.sleep(0.005)
+        with lock:
+            estado['en_curso'] -= 1
+        return {'success': True, 'documento': query_data['documento']}
+
+    runner = StreamingBatchRunner(consulta, controlador=control)
+    metricas = runner.ejecutar(str(i) for i in range(60))
+
+    assert metricas['total_consultas'] == 60
+    assert estado['max'] <= 3
+    assert metricas['ventanas'] and metricas['worker_count'] == 3
@@ -0,0 +1,106 @@
+"""
+Test del motor asyncio con semáforos por etapa
+"""
+import asyncio
+import threading
+import time
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importaciones
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from parallel.async_engine import AsyncQueryEngine
+
+
+def test_cientos_en_vuelo_sin_hilo_por_consulta():
+    """200 consultas de 0.2s con etapas async terminan casi en paralelo"""
+    async def consulta(contexto):
+        await asyncio.sleep(0.2)
+        contexto['consultado'] = True
+
+    hilos_inicio = threading.active_count()
+    hilos_max = [hilos_inicio]
+
+    async def descarga(contexto):
+        hilos_max[0] = max(hilos_max[0], threading.active_count())
+        await asyncio.sleep(0)
+
+    engine = AsyncQueryEngine(
+        etapas=[('consulta', consulta), ('descarga', descarga)],
+        crear_contexto=lambda doc: {'documento': doc},
+        concurrency=200
+    )
+
+    inicio = time.time()
+    resultados = asyncio.run(engine.ejecutar(f"DOC{i}" for i in range(200)))
+    total = time.time() - inicio
+
+    assert len(resultados) == 200
+    assert all(r['consultado'] for r in resultados)
+    assert total < 2.0, f"Sin concurrencia real: {total:.2f}s"
+    assert engine.metricas()['en_vuelo_max'] >= 100
+    assert hilos_max[0] - hilos_inicio < 5
+
+
+def test_semaforo_por_etapa():
+    """La etapa de almacenamiento respeta su propio límite"""
+    def almacenar(contexto):
+        time.sleep(0.01)
+
+    async def consulta(contexto):
+        await asyncio.sleep(0.01)
+
+    engine = AsyncQueryEngine(
+        etapas=[('consulta', consulta), ('almacenamiento', almacenar)],
+        concurrency=20,
+        limites={'almacenamiento': 1}
+    )
+    asyncio.run(engine.ejecutar(range(20)))
+
+    etapas = engine.metricas()['etapas']
+    assert etapas['almacenamiento']['en_curso_max'] == 1
+    assert etapas['almacenamiento']['llamadas'] == 20
+    assert etapas['consulta']['en_curso_max'] > 1
+
+
+def test_error_en_etapa_detiene_documento():
+    """Un error corta las etapas siguientes y llega a finalizar"""
+    llamadas = []
+
+    def consulta(contexto):
+        if contexto['item'] == 'MALO':
+            raise RuntimeError("Consulta fallida")
+
+    def descarga(contexto):
+        llamadas.append(contexto['item'])
+
+    engine = AsyncQueryEngine(
+        etapas=[('consulta', consulta), ('descarga', descarga)],
+        finalizar=lambda contexto, error: {'item': contexto['item'], 'error': error},
+        concurrency=4
+    )
+    resultados = asyncio.run(engine.ejecutar(['A', 'MALO', 'B']))
+
+    errores = {r['item']: r['error'] for r in resultados}
+    assert isinstance(errores['MALO'], RuntimeError)
+    assert sorted(llamadas) == ['A', 'B']
+    assert engine.metricas()['errores'] == 1
+
+
+def test_no_toca_el_executor_por_defecto_del_loop():
+    """Después del motor, el loop del llamador sigue usando su propio pool"""
+    hilos_etapa = []
+
+    def etapa(contexto):
+        hilos_etapa.append(threading.current_thread().name)
+
+    async def principal():
+        engine = AsyncQueryEngine(etapas=[('consulta', etapa)], concurrency=4)
+        await engine.ejecutar(range(8))
+        return await asyncio.get_running_loop().run_in_executor(
+            None, lambda: threading.current_thread().name)
+
+    hilo_default = asyncio.run(principal())
+    assert all(nombre.startswith("async-etapa") for nombre in hilos_etapa)
+    assert not hilo_default.startswith("async-etapa")
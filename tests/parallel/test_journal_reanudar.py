@@ -0,0 +1,73 @@
+"""
+Test del journal de lotes y la reanudación tras una interrupción
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Agregar el directorio raíz al path para importaciones
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from parallel.streaming import StreamingBatchRunner
+from storage.journal import EN_CURSO, FALLIDO, HECHO, RunJournal
+
+
+def test_reanudar_omite_terminados_y_reencola_en_curso(tmp_path):
+    """Tras una caída solo se repiten los documentos no terminados"""
+    documentos = [f"DOC{i:03d}" for i in range(1, 11)]
+    salida = tmp_path / "lote.jsonl"
+    journal = RunJournal(str(tmp_path / "journal.db"))
+    journal.crear_run("lote1", "documentos.txt", str(salida), {'workers': 3})
+
+    procesados = []
+
+    def consulta(query_data):
+        procesados.append(query_data['documento'])
+        return {'success': query_data['documento'] != 'DOC003', 'documento': query_data['documento']}
+
+    def documentos_con_caida():
+        for documento in documentos[:5]:
+            yield documento
+        raise KeyboardInterrupt
+
+    runner = StreamingBatchRunner(consulta, workers=3, archivo_salida=str(salida),
+                                  journal=journal, run_id="lote1")
+    with pytest.raises(KeyboardInterrupt):
+        runner.ejecutar(documentos_con_caida())
+    # Un sexto documento quedó en vuelo al momento de la caída
+    journal.marcar("lote1", 6, "DOC006", EN_CURSO)
+    journal.cerrar()
+
+    journal = RunJournal(str(tmp_path / "journal.db"))
+    assert journal.resumen("lote1") == {HECHO: 4, FALLIDO: 1, EN_CURSO: 1}
+
+    procesados.clear()
+    terminados = journal.posiciones_terminadas("lote1")
+    runner = StreamingBatchRunner(consulta, workers=3, archivo_salida=str(salida),
+                                  journal=journal, run_id="lote1")
+    metricas = runner.ejecutar(documentos, omitir=terminados)
+
+    assert sorted(procesados) == documentos[5:]
+    assert metricas['omitidos'] == 5
+    assert metricas['session_id'] == "lote1"
+    assert journal.resumen("lote1") == {HECHO: 9, FALLIDO: 1}
+    assert journal.obtener_run("lote1")['parametros'] == {'workers': 3}
+
+    # El JSONL acumula ambas ejecuciones sin repetir posiciones
+    ids = [json.loads(linea)['id'] for linea in salida.read_text(encoding='utf-8').splitlines()]
+    assert sorted(ids) == list(range(1, 11))
+    journal.cerrar()
+
+
+def test_journal_cuenta_intentos(tmp_path):
+    """Cada paso por en_curso suma un intento"""
+    journal = RunJournal(str(tmp_path / "journal.db"))
+    journal.marcar("lote", 1, "DOC1", EN_CURSO)
+    journal.marcar("lote", 1, "DOC1", EN_CURSO)
+    journal.marcar("lote", 1, "DOC1", FALLIDO, error="Timeout")
+
+    fila = journal._conn.execute('SELECT intentos, error FROM journal').fetchone()
+    assert fila == (2, "Timeout")
+    journal.cerrar()
@@ -0,0 +1,150 @@
+"""
+Test del planificador por prioridad con envejecimiento
+"""
+import asyncio
+import os
+import threading
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importaciones
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from parallel.scheduler import PriorityScheduler
+
+
+class RelojFalso:
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def test_interactiva_pasa_delante_del_lote():
+    """Con los turnos ocupados, la consulta interactiva obtiene el siguiente"""
+    reloj = RelojFalso()
+    scheduler = PriorityScheduler(capacidad=1, envejecimiento=100, reloj=reloj)
+
+    scheduler.adquirir('lote')
+    lote = [scheduler._encolar('lote') for _ in range(5)]
+    reloj.ahora = 1.0
+    interactiva = scheduler._encolar('interactiva')
+
+    reloj.ahora = 3.0
+    scheduler.liberar()
+    assert interactiva.otorgada
+    assert not any(e.otorgada for e in lote)
+
+    scheduler.liberar()
+    assert lote[0].otorgada and not lote[1].otorgada
+
+    stats = scheduler.stats()
+    assert stats['interactiva']['espera_promedio'] == 2.0
+    assert stats['lote']['en_cola'] == 4
+
+
+def test_envejecimiento_evita_inanicion():
+    """Un documento de lote que espera lo suficiente supera a las interactivas nuevas"""
+    reloj = RelojFalso()
+    scheduler = PriorityScheduler(capacidad=1, envejecimiento=1.0, reloj=reloj)
+
+    scheduler.adquirir('interactiva')
+    lote = scheduler._encolar('lote')
+
+    # Llegan interactivas continuamente; tras 2s el lote alcanza su nivel y es más antiguo
+    for segundo in range(1, 4):
+        reloj.ahora = float(segundo)
+        scheduler._encolar('interactiva')
+        scheduler.liberar()
+        if lote.otorgada:
+            break
+
+    assert lote.otorgada
+    assert reloj.ahora == 2.0
+    assert scheduler.stats()['lote']['envejecidos'] == 1
+
+
+def test_turnos_concurrentes_y_async():
+    """Nunca hay más consultas en curso que la capacidad, desde hilos o corutinas"""
+    scheduler = PriorityScheduler(capacidad=3)
+    lock = threading.Lock()
+    estado = {'en_curso': 0, 'max': 0}
+
+    def trabajo():
+        with lock:
+            estado['en_curso'] += 1
+            estado['max'] = max(estado['max'], estado['en_curso'])
+        threading.Event().wait(0.02)
+        with lock:
+            estado['en_curso'] -= 1
+
+    consulta = scheduler.envolver(trabajo, 'lote')
+    hilos = [threading.Thread(target=consulta) for _ in range(10)]
+    for h in hilos:
+        h.start()
+
+    async def corutinas():
+        async def una():
+            async with scheduler.turno_async('interactiva'):
+                await asyncio.to_thread(trabajo)
+        await asyncio.gather(*(una() for _ in range(5)))
+
+    asyncio.run(corutinas())
+    for h in hilos:
+        h.join()
+
+    stats = scheduler.stats()
+    assert estado['max'] <= 3
+    assert stats['lote']['turnos'] == 10
+    assert stats['interactiva']['turnos'] == 5
+
+
+def test_lote_cede_a_interactiva_de_otro_proceso(tmp_path):
+    """Dos planificadores (dos procesos) con la misma carpeta: el lote espera a la interactiva"""
+    proceso_cli = PriorityScheduler(capacidad=1, carpeta_compartida=str(tmp_path))
+    proceso_lote = PriorityScheduler(capacidad=5, envejecimiento=5.0, carpeta_compartida=str(tmp_path))
+    proceso_lote.puerta.intervalo = 0.01
+
+    en_interactiva = threading.Event()
+    soltar = threading.Event()
+    orden = []
+
+    def interactiva():
+        with proceso_cli.turno('interactiva'):
+            en_interactiva.set()
+            soltar.wait()
+            orden.append('interactiva')
+
+    def lote():
+        with proceso_lote.turno('lote'):
+            orden.append('lote')
+
+    hilo_cli = threading.Thread(target=interactiva)
+    hilo_cli.start()
+    en_interactiva.wait()
+    hilo_lote = threading.Thread(target=lote)
+    hilo_lote.start()
+    hilo_lote.join(0.1)
+    assert orden == []  # con turnos libres en su proceso, el lote igual cede
+
+    soltar.set()
+    hilo_cli.join()
+    hilo_lote.join()
+    assert orden == ['interactiva', 'lote']
+    assert proceso_lote.stats()['lote']['cedido_a_otros_procesos'] > 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_puerta_ignora_marcas_vencidas_y_tiene_tope(tmp_path):
+    from parallel.scheduler import PuertaInteractiva
+
+    puerta = PuertaInteractiva(str(tmp_path), espera_maxima=0.05, vencimiento=60, intervalo=0.01)
+    huerfana = tmp_path / f"999-caido{PuertaInteractiva.SUFIJO}"
+    huerfana.touch()
+    assert puerta.hay_interactivas()
+    assert puerta.ceder() >= 0.05  # con una interactiva eterna, el lote sigue tras el tope
+
+    os.utime(huerfana, (0, 0))
+    assert not puerta.hay_interactivas()
+    assert not huerfana.exists()
@@ -0,0 +1,180 @@
+"""
+Test de la coalescencia de consultas duplicadas en vuelo
+"""
+import asyncio
+import json
+import threading
+import time
+import sys
+from pathlib import Path
+
+import pytest
+
+# Agregar el directorio raíz al path para importaciones
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from integrador_consulta_simple import crear_funcion_async_para_paralelo, crear_funcion_para_paralelo
+from parallel.single_flight import SingleFlight
+from parallel.streaming import StreamingBatchRunner
+
+
+class IntegradorLento:
+    """Integrador falso que cuenta las consultas que llegan al sitio"""
+
+    def __init__(self, demora=0.1):
+        self.demora = demora
+        self.consultas = []
+        self.fechas = []
+        self._lock = threading.Lock()
+
+    def realizar_consulta(self, documento, **kwargs):
+        with self._lock:
+            self.consultas.append(documento)
+            self.fechas.append(kwargs.get('fecha_expedicion'))
+        time.sleep(self.demora)
+        if documento == 'ERROR':
+            raise RuntimeError("Timeout simulado")
+        return {'success': True, 'documento': documento, 'nombre': f'CIUDADANO {documento}'}
+
+
+def test_llamadas_concurrentes_comparten_resultado():
+    """Diez hilos con la misma clave producen una sola ejecución"""
+    sf = SingleFlight()
+    barrera = threading.Barrier(10)
+    ejecuciones = []
+    resultados = []
+
+    def funcion():
+        ejecuciones.append(1)
+        time.sleep(0.1)
+        return {'nombre': 'UNO'}
+
+    def hilo():
+        barrera.wait()
+        resultados.append(sf.ejecutar('123', funcion))
+
+    hilos = [threading.Thread(target=hilo) for _ in range(10)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    assert len(ejecuciones) == 1
+    assert all(r == {'nombre': 'UNO'} for r, _ in resultados)
+    assert sum(compartido for _, compartido in resultados) == 9
+    stats = sf.stats()
+    assert stats['duplicados'] == 9
+    assert stats['tiempo_ahorrado'] == pytest.approx(9 * 0.1, abs=0.2)
+
+    # Terminada la llamada, la clave vuelve a consultarse
+    sf.ejecutar('123', funcion)
+    assert len(ejecuciones) == 2
+
+
+def test_error_se_propaga_a_los_duplicados():
+    """Si la consulta compartida falla, todos reciben la excepción"""
+    sf = SingleFlight()
+    barrera = threading.Barrier(3)
+    errores = []
+
+    def funcion():
+        time.sleep(0.1)
+        raise ValueError("falló")
+
+    def hilo():
+        barrera.wait()
+        try:
+            sf.ejecutar('x', funcion)
+        except ValueError as e:
+            errores.append(str(e))
+
+    hilos = [threading.Thread(target=hilo) for _ in range(3)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    assert errores == ["falló"] * 3
+
+
+def test_lote_con_documentos_repetidos():
+    """El runner reporta los duplicados que no llegaron al sitio"""
+    integrador = IntegradorLento()
+    funcion = crear_funcion_para_paralelo(integrador)
+    documentos = ['111', '111', '222', '111', 'ERROR', 'ERROR', '222', '333']
+
+    metricas = StreamingBatchRunner(funcion, workers=8).ejecutar(documentos)
+
+    assert metricas['total_consultas'] == len(documentos)
+    assert sorted(set(integrador.consultas)) == ['111', '222', '333', 'ERROR']
+    assert metricas['duplicados'] == len(documentos) - len(integrador.consultas)
+    assert metricas['duplicados'] > 0
+    assert metricas['tiempo_ahorrado'] > 0
+    assert metricas['fallidas'] == 2
+
+
+def test_fecha_distinta_no_se_agrupa():
+    """La clave incluye la fecha de expedición"""
+    integrador = IntegradorLento()
+    funcion = crear_funcion_para_paralelo(integrador)
+    consultas = [
+        {'documento': '111', 'fecha_expedicion': '01/01/2010'},
+        {'documento': '111', 'fecha_expedicion': '02/02/2012'},
+    ]
+
+    hilos = [threading.Thread(target=funcion, args=(c,)) for c in consultas]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    assert integrador.consultas == ['111', '111']
+    assert sorted(integrador.fechas) == ['01/01/2010', '02/02/2012']  # la fecha llega a la consulta
+    assert funcion.single_flight.stats()['duplicados'] == 0
+
+
+def test_version_async_tambien_agrupa():
+    """Las corutinas con la misma clave comparten una consulta; otra fecha no"""
+    integrador = IntegradorLento()
+    llamadas = []
+
+    async def realizar_consulta_async(documento, **kwargs):
+        llamadas.append((documento, kwargs.get('fecha_expedicion')))
+        await asyncio.sleep(0.05)
+        if documento == 'ERROR':
+            raise RuntimeError("Timeout simulado")
+        return {'success': True, 'documento': documento}
+
+    integrador.realizar_consulta_async = realizar_consulta_async
+    funcion = crear_funcion_async_para_paralelo(integrador)
+    consultas = [{'documento': '111'}] * 5 + [{'documento': '111', 'fecha_expedicion': '01/01/2010'},
+                                               {'documento': 'ERROR'}, {'documento': 'ERROR'}]
+
+    async def principal():
+        return await asyncio.gather(*(funcion(c) for c in consultas))
+
+    resultados = asyncio.run(principal())
+
+    assert sorted(llamadas, key=str) == sorted([('111', None), ('111', '01/01/2010'), ('ERROR', None)], key=str)
+    assert sum(r.get('compartido', False) for r in resultados) == 5
+    assert [r['success'] for r in resultados[-2:]] == [False, False]
+    assert funcion.single_flight.stats()['duplicados'] == 5
+
+
+def test_pdf_fuera_de_datos_completos_y_del_jsonl(tmp_path):
+    """Los bytes del PDF viajan aparte y no llegan al JSONL de salida"""
+    integrador = IntegradorLento(demora=0)
+    integrador.realizar_consulta = lambda documento, **kwargs: {
+        'consulta_exitosa': True, 'cedula': documento, 'pdf': b'%PDF-1.4'}
+    funcion = crear_funcion_para_paralelo(integrador)
+
+    resultado = funcion({'documento': '111'})
+    assert resultado['pdf'] == b'%PDF-1.4'
+    assert 'pdf' not in resultado['datos_completos']
+
+    salida = tmp_path / "resultados.jsonl"
+    StreamingBatchRunner(funcion, workers=1, archivo_salida=str(salida)).ejecutar(['222'])
+    registro = json.loads(salida.read_text(encoding='utf-8'))
+    assert registro['documento'] == '222'
+    assert 'pdf' not in registro
+    assert '%PDF' not in salida.read_text(encoding='utf-8')
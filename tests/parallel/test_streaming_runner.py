@@ -0,0 +1,83 @@
+"""
+Test del runner de lotes en streaming
+"""
+import json
+import threading
+import time
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importaciones
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from parallel.streaming import StreamingBatchRunner, leer_documentos
+
+
+def test_leer_documentos_perezoso(tmp_path):
+    """Lee documentos ignorando encabezados, comentarios y líneas vacías"""
+    archivo = tmp_path / "documentos.csv"
+    archivo.write_text("cedula\n1032493824  # Real\n\n100000001,extra\n", encoding='utf-8')
+
+    documentos = leer_documentos(str(archivo))
+
+    assert not isinstance(documentos, list)
+    assert list(documentos) == ['1032493824', '100000001']
+
+
+def test_lote_streaming_memoria_acotada(tmp_path):
+    """Procesa todos los documentos sin adelantar más de la cola + workers"""
+    workers = 4
+    tamano_cola = 8
+    total = 300
+
+    lock = threading.Lock()
+    estado = {'producidos': 0, 'terminados': 0, 'max_adelanto': 0}
+
+    def documentos():
+        for i in range(total):
+            with lock:
+                estado['producidos'] += 1
+                adelanto = estado['producidos'] - estado['terminados']
+                estado['max_adelanto'] = max(estado['max_adelanto'], adelanto)
+            yield f"DOC{i:06d}"
+
+    def consulta(query_data):
+        time.sleep(0.001)
+        with lock:
+            estado['terminados'] += 1
+        return {'success': query_data['id'] % 10 != 0, 'documento': query_data['documento']}
+
+    salida = tmp_path / "lote.jsonl"
+    runner = StreamingBatchRunner(consulta, workers=workers,
+                                  archivo_salida=str(salida), tamano_cola=tamano_cola)
+    metricas = runner.ejecutar(documentos())
+
+    assert metricas['total_consultas'] == total
+    assert metricas['exitosas'] == total - total // 10
+    assert metricas['worker_count'] == workers
+
+    # Cola llena + uno en manos de cada worker + uno esperando en el productor
+    assert estado['max_adelanto'] <= tamano_cola + workers + 1
+
+    registros = [json.loads(linea) for linea in salida.read_text(encoding='utf-8').splitlines()]
+    assert len(registros) == total
+    assert {r['documento'] for r in registros} == {f"DOC{i:06d}" for i in range(total)}
+
+
+def test_lote_streaming_errores_no_detienen_workers():
+    """Una excepción en la consulta se registra como fallida"""
+    def consulta(query_data):
+        if query_data['documento'] == 'MALO':
+            raise RuntimeError("bloqueo")
+        if query_data['documento'] == 'NULO':
+            return None
+        if query_data['documento'] == 'TEXTO':
+            return "sin resultado"
+        return {'success': True, 'documento': query_data['documento']}
+
+    # Cola de 1 con un solo worker: si el worker muriera, el productor se quedaría esperando
+    runner = StreamingBatchRunner(consulta, workers=1, tamano_cola=1)
+    metricas = runner.ejecutar(iter(['A', 'MALO', 'NULO', 'TEXTO', 'B', 'C']))
+
+    assert metricas['total_consultas'] == 6
+    assert metricas['fallidas'] == 3
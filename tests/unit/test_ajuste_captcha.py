@@ -0,0 +1,72 @@
+"""
+Test del ajuste automático del perfil de OCR
+"""
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Agregar el directorio raíz al path para importaciones
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from utils import captcha_solver
+from utils.ajuste_captcha import ajustar, armar_perfil, candidatos_aleatorios, candidatos_grilla, escribir_perfil
+
+
+class MotorAjuste:
+    """Lee la cantidad de columnas con tinta, pero solo acierta con --psm 7"""
+
+    def __init__(self, lang):
+        pass
+
+    def reconocer(self, binaria, psm=6, whitelist="0123456789"):
+        texto = str(int((binaria == 0).any(axis=0).sum()))
+        if psm != 7:
+            texto += "0"
+        return texto, 90.0, [(c, 90.0) for c in texto]
+
+
+def _muestras():
+    muestras = []
+    for columnas in range(1, 7):
+        imagen = np.full((12, 20), 210, np.uint8)
+        imagen[:, :columnas] = 60
+        muestras.append((imagen, str(columnas)))
+    return muestras
+
+
+def test_espacio_de_busqueda():
+    perfil = armar_perfil({'umbral': ('adaptativo', 15, 10), 'quitar_ruido': 1, 'quitar_lineas': None,
+                           'enderezar': True, 'psm': 8, 'whitelist': '0123456789'})
+    assert perfil['pipeline'] == [['umbral_adaptativo', {'ventana': 15, 'c': 10}],
+                                  ['quitar_ruido', {'vecinos_min': 1}], ['enderezar', {}]]
+
+    grilla = candidatos_grilla()
+    assert len(grilla) == 7 * 3 * 3 * 2 * 4
+    muestra = candidatos_aleatorios(20, semilla=3)
+    assert len(muestra) == 20 and all(c in grilla for c in muestra)
+
+
+def test_ajuste_elige_el_mejor_y_el_solver_lo_carga(tmp_path, monkeypatch):
+    espacio = {'umbral': ['otsu', 140], 'quitar_ruido': [None], 'quitar_lineas': [None],
+               'enderezar': [False], 'psm': [6, 7], 'whitelist': ['0123456789']}
+    resultados = ajustar(_muestras(), candidatos_grilla(espacio), workers=2, fabrica_motor=MotorAjuste)
+
+    assert len(resultados) == 4
+    assert resultados[0]['perfil']['psm'] == 7
+    assert resultados[0]['precision'] == 100.0
+    assert [r['precision'] for r in resultados if r['perfil']['psm'] == 6] == [0.0, 0.0]
+
+    ajustes = tmp_path / "settings.json"
+    ajustes.write_text(json.dumps({'ocr_language': 'eng'}), encoding='utf-8')
+    escribir_perfil(resultados[0], muestras=6, ruta=str(ajustes))
+    config = json.loads(ajustes.read_text(encoding='utf-8'))
+    assert config['ocr_language'] == 'eng'
+    assert config['perfil_ocr']['precision'] == 100.0
+
+    monkeypatch.setattr(captcha_solver, '_perfil', None)
+    monkeypatch.setattr(captcha_solver, 'cargar_config', lambda: config)
+    perfil = captcha_solver.perfil_ocr()
+    assert perfil['psm'] == 7
+    assert perfil['pipeline'] == resultados[0]['perfil']['pipeline']
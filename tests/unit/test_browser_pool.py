@@ -0,0 +1,291 @@
+"""
+Test unitario del pool de navegadores con un Playwright falso
+"""
+import sys
+from pathlib import Path
+
+# Agregar directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import threading
+
+from pages import browser_pool, consulta_playwright
+from pages.browser_pool import BrowserPool, CoordinadorMemoria
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.cerrada = False
+        self.origen = None
+
+    def goto(self, origen):
+        self.origen = origen
+
+    def evaluate(self, script):
+        # Como en el navegador: solo se limpia el almacenamiento del origen de la página
+        self.context.almacenamiento.pop(self.origen, None)
+
+    def expect_download(self, timeout=None):
+        return self.context.descarga
+
+    def close(self):
+        self.cerrada = True
+
+
+class FakeContext:
+    def __init__(self):
+        self.cerrado = False
+        self.limpiezas = 0
+        self.paginas = []
+        self.almacenamiento = {}
+
+    def new_page(self):
+        page = FakePage(self)
+        self.paginas.append(page)
+        return page
+
+    def clear_cookies(self):
+        self.limpiezas += 1
+
+    def storage_state(self):
+        return {'cookies': [], 'origins': [{'origin': o, 'localStorage': v}
+                                           for o, v in self.almacenamiento.items()]}
+
+    def close(self):
+        self.cerrado = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.cerrado = False
+        self.contextos = []
+
+    def new_context(self, **kwargs):
+        context = FakeContext()
+        self.contextos.append(context)
+        return context
+
+    def close(self):
+        self.cerrado = True
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.lanzados = []
+        self.chromium = self
+
+    def launch(self, **kwargs):
+        browser = FakeBrowser()
+        self.lanzados.append(browser)
+        return browser
+
+
+def test_navegadores_se_lanzan_una_vez():
+    pw = FakePlaywright()
+    with BrowserPool(navegadores=2, playwright=pw, max_rss_mb=None) as pool:
+        for _ in range(10):
+            with pool.pagina() as page:
+                assert isinstance(page, FakePage)
+
+    assert len(pw.lanzados) == 2
+    assert all(b.cerrado for b in pw.lanzados)
+
+
+def test_contexto_se_recicla_tras_n_usos():
+    pw = FakePlaywright()
+    pool = BrowserPool(navegadores=1, usos_por_contexto=3, playwright=pw, max_rss_mb=None)
+
+    paginas = []
+    for _ in range(7):
+        with pool.pagina() as page:
+            paginas.append(page)
+
+    contextos = pw.lanzados[0].contextos
+    assert len(contextos) == 3
+    assert contextos[0].cerrado and contextos[1].cerrado
+    # Entre usos del mismo contexto se limpian las cookies
+    assert contextos[0].limpiezas == 2
+    assert all(p.cerrada for p in paginas)
+    assert pool.stats['reciclados_por_uso'] == 2
+
+
+def test_navegador_se_relanza_si_excede_memoria():
+    pw = FakePlaywright()
+    mediciones = iter([100, 5000, 100])
+    pool = BrowserPool(navegadores=1, playwright=pw, max_rss_mb=1000,
+                       medir_rss=lambda: next(mediciones))
+
+    for _ in range(3):
+        with pool.pagina():
+            pass
+
+    assert len(pw.lanzados) == 2
+    assert pw.lanzados[0].cerrado
+    assert pool.stats['reciclados_por_memoria'] == 1
+
+
+def test_limite_compartido_relanza_un_solo_navegador():
+    """Con varios pools sobre el límite, solo el navegador más usado se relanza"""
+    rss = {'mb': 100}
+    coordinador = CoordinadorMemoria(max_rss_mb=1000, medir_rss=lambda: rss['mb'])
+    pw_a, pw_b = FakePlaywright(), FakePlaywright()
+    pool_a = BrowserPool(navegadores=1, playwright=pw_a, coordinador=coordinador).iniciar()
+    pool_b = BrowserPool(navegadores=1, playwright=pw_b, coordinador=coordinador).iniciar()
+
+    for _ in range(3):
+        with pool_a.pagina():
+            pass
+    with pool_b.pagina():
+        pass
+
+    rss['mb'] = 5000
+    with pool_b.pagina():
+        pass  # b no es el más usado: sigue caliente
+    assert len(pw_b.lanzados) == 1
+    with pool_a.pagina():
+        pass
+    assert len(pw_a.lanzados) == 2 and pw_a.lanzados[0].cerrado
+    assert pool_a.stats['reciclados_por_memoria'] == 1
+    assert pool_b.stats['reciclados_por_memoria'] == 0
+
+    # Recién relanzado, a deja de ser el más usado: el siguiente es b
+    with pool_a.pagina():
+        pass
+    assert len(pw_a.lanzados) == 2
+    with pool_b.pagina():
+        pass
+    assert len(pw_b.lanzados) == 2
+
+
+def test_pools_por_hilo_se_registran_y_se_cierran(monkeypatch):
+    monkeypatch.setattr(browser_pool, '_local', threading.local())
+    monkeypatch.setattr(browser_pool, '_pools_abiertos', [])
+    monkeypatch.setattr(browser_pool, '_coordinador', None)
+
+    pools = []
+
+    def worker():
+        pools.append(browser_pool.pool_del_hilo(playwright=FakePlaywright(), max_rss_mb=None))
+
+    hilos = [threading.Thread(target=worker) for _ in range(3)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    assert len(set(map(id, pools))) == 3
+    assert all(p.coordinador is browser_pool._coordinador for p in pools)
+    assert sorted(map(id, browser_pool._pools_abiertos)) == sorted(map(id, pools))
+
+    browser_pool.cerrar_pools()
+    assert browser_pool._pools_abiertos == []
+    assert all(p._playwright.lanzados[0].cerrado for p in pools)
+
+
+def test_almacenamiento_no_pasa_a_la_siguiente_consulta():
+    pw = FakePlaywright()
+    pool = BrowserPool(navegadores=1, playwright=pw, max_rss_mb=None)
+
+    # localStorage del origen de la página: se borra y el contexto se reutiliza
+    with pool.pagina() as page:
+        page.goto("https://registraduria")
+        page.context.almacenamiento["https://registraduria"] = [{'name': 'sesion', 'value': '1'}]
+    with pool.pagina() as page:
+        assert page.context.almacenamiento == {}
+    assert len(pw.lanzados[0].contextos) == 1
+
+    # Almacenamiento de otro origen (p. ej. un iframe): el contexto se recrea
+    with pool.pagina() as page:
+        page.goto("https://registraduria")
+        page.context.almacenamiento["https://otro-origen"] = [{'name': 'id', 'value': '2'}]
+    with pool.pagina() as page:
+        assert page.context.almacenamiento == {}
+
+    contextos = pw.lanzados[0].contextos
+    assert len(contextos) == 2 and contextos[0].cerrado
+    assert pool.stats['reciclados_por_almacenamiento'] == 1
+
+
+class FakeDescarga:
+    def __init__(self, ruta):
+        self.value = self
+        self.ruta = ruta
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def path(self):
+        return self.ruta
+
+
+class FakeConsultaPage:
+    def __init__(self, page):
+        self.page = page
+        self.tiempos = {}
+        self.captcha_confianza = 90.0
+
+    def open(self):
+        self.page.goto("https://registraduria")
+
+    def fill_cedula(self, cedula):
+        pass
+
+    def fill_fecha(self, dia, mes, anio):
+        pass
+
+    def solve_and_fill_captcha(self):
+        return "1234"
+
+    def enviar(self):
+        pass
+
+    def registrar_captcha(self, aceptado):
+        self.page.context.veredictos = getattr(self.page.context, 'veredictos', []) + [aceptado]
+
+
+def test_consultas_playwright_reutilizan_el_navegador(tmp_path, monkeypatch):
+    pdf = tmp_path / "descarga.pdf"
+    pdf.write_bytes(b"%PDF-1.4 falso")
+    monkeypatch.setattr(consulta_playwright, 'ConsultaPage', FakeConsultaPage)
+    monkeypatch.setattr(FakeContext, 'descarga', FakeDescarga(str(pdf)), raising=False)
+
+    pw = FakePlaywright()
+    pool = BrowserPool(navegadores=1, playwright=pw, max_rss_mb=None)
+    resultados = [consulta_playwright.consultar(pool, str(i), '09', '10', '2015') for i in range(3)]
+
+    assert all(r['consulta_exitosa'] and r['pdf'] == b"%PDF-1.4 falso" for r in resultados)
+    assert len(pw.lanzados) == 1 and len(pw.lanzados[0].contextos) == 1
+    assert pool.stats['consultas'] == 3
+
+
+class SinDescarga:
+    """El sitio responde con la página de error en vez del PDF"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        raise TimeoutError("Timeout 15000ms exceeded while waiting for event \"download\"")
+
+
+def test_envio_playwright_rechazado_cuenta_en_metricas(monkeypatch):
+    from utils.captcha_solver import get_metricas_captcha
+
+    monkeypatch.setattr(consulta_playwright, 'ConsultaPage', FakeConsultaPage)
+    monkeypatch.setattr(FakeContext, 'descarga', SinDescarga(), raising=False)
+    monkeypatch.setattr(FakePage, 'content', lambda self: "<p>El código de verificación no es válido</p>",
+                        raising=False)
+
+    pool = BrowserPool(navegadores=1, playwright=FakePlaywright(), max_rss_mb=None)
+    antes = get_metricas_captcha().stats()
+    resultado = consulta_playwright.consultar(pool, '1', '09', '10', '2015')
+    despues = get_metricas_captcha().stats()
+
+    assert resultado['consulta_exitosa'] is False
+    assert resultado['error'] == "CAPTCHA rechazado"
+    assert despues['envios'] - antes['envios'] == 1
+    assert despues['rechazados'] - antes['rechazados'] == 1
@@ -0,0 +1,57 @@
+"""
+Test del corpus de CAPTCHAs y del benchmark offline de solvers
+"""
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importaciones
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from benchmarks.bench_solver import cargar_muestras, ejecutar, medir_solver
+from storage.captcha_corpus import CaptchaCorpus
+
+
+def _corpus(tmp_path):
+    corpus = CaptchaCorpus(str(tmp_path / "corpus.db"))
+    corpus.registrar(b'png-1', '4821', 80.0, aceptado=True)
+    corpus.registrar(b'png-2', '7391', 35.0, aceptado=False)
+    corpus.registrar(b'png-3', '1111', 60.0, aceptado=None)
+    corpus.registrar(b'png-4', '0057', 90.0, aceptado=True, fuente='playwright')
+    return corpus
+
+
+def test_registra_veredicto_y_etiqueta_aceptados(tmp_path):
+    corpus = _corpus(tmp_path)
+
+    assert corpus.resumen() == {'total': 4, 'aceptados': 2, 'rechazados': 1, 'etiquetados': 2}
+    assert [(png, etiqueta) for _, png, etiqueta in corpus.muestras()] == \
+        [(b'png-1', '4821'), (b'png-4', '0057')]
+
+    # Un rechazado etiquetado a mano pasa a ser muestra
+    rechazado = next(i for i, png, _ in corpus.muestras(solo_etiquetadas=False) if png == b'png-2')
+    corpus.etiquetar(rechazado, '7891')
+    assert corpus.resumen()['etiquetados'] == 3
+
+    assert corpus.exportar(str(tmp_path / "png")) == 3
+    assert sorted(p.name.split('_')[0] for p in (tmp_path / "png").iterdir()) == ['0057', '4821', '7891']
+    corpus.cerrar()
+
+
+def test_benchmark_sobre_el_corpus(tmp_path):
+    """Reporta precisión y latencias de un solver externo sobre las muestras grabadas"""
+    _corpus(tmp_path).cerrar()
+    muestras = cargar_muestras(str(tmp_path / "corpus.db"))
+    respuestas = {b'png-1': '4821', b'png-4': '0000'}
+
+    fila = medir_solver(lambda png: respuestas[png], muestras)
+    assert fila['muestras'] == 2
+    assert fila['precision'] == 50.0
+    assert fila['p50_ms'] <= fila['p99_ms']
+    assert fila['imagenes_por_segundo'] > 0
+
+    fila, = ejecutar([f'{__name__}:solver_que_falla'], muestras)
+    assert (fila['precision'], fila['errores']) == (0.0, 2)
+
+
+def solver_que_falla(png):
+    raise RuntimeError("sin motor")
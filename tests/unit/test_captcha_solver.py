@@ -0,0 +1,250 @@
+"""
+Test del solver de CAPTCHA en memoria
+"""
+import io
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytesseract
+import pytest
+from PIL import Image, ImageDraw
+
+# Agregar el directorio raíz al path para importaciones
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from utils import captcha_solver
+from utils.captcha_solver import MetricasCaptcha, resolver_con_refresco, solve_captcha_image
+from utils.ocr_pool import MotorPytesseract
+
+
+def _captcha_png(texto="4821") -> bytes:
+    img = Image.new("L", (120, 40), 255)
+    ImageDraw.Draw(img).text((10, 12), texto, fill=0)
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def tesseract_falso(monkeypatch):
+    """Reemplaza Tesseract y registra las imágenes que recibe"""
+    recibidas = []
+
+    def image_to_data(img, **kwargs):
+        recibidas.append(img)
+        return {'text': ['', '48', '2-1'], 'conf': ['-1', '90', '70']}
+
+    monkeypatch.setattr(pytesseract, 'image_to_data', image_to_data)
+    # OCR en el mismo proceso: los workers del pool no verían el reemplazo
+    monkeypatch.setattr(captcha_solver, 'get_ocr_pool', lambda: None)
+    monkeypatch.setattr(captcha_solver, 'get_glyph_classifier', lambda: None)
+    monkeypatch.setattr(captcha_solver, 'crear_motor', MotorPytesseract)
+    return recibidas
+
+
+def test_acepta_bytes_numpy_y_pil_sin_disco(tesseract_falso, tmp_path, monkeypatch):
+    """Las tres formas de entrada dan el mismo resultado y no escriben archivos"""
+    monkeypatch.chdir(tmp_path)
+    png = _captcha_png()
+    arreglo = np.array(Image.open(io.BytesIO(png)))
+
+    resultados = [
+        solve_captcha_image(png),
+        solve_captcha_image(memoryview(png)),
+        solve_captcha_image(arreglo),
+        solve_captcha_image(Image.fromarray(arreglo)),
+    ]
+
+    assert resultados == [('4821', 80.0)] * 4
+    assert all(img.mode == 'L' for img in tesseract_falso)
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.skipif(shutil.which("tesseract") is None, reason="Tesseract no instalado")
+def test_ocr_real_desde_bytes():
+    texto, confianza = solve_captcha_image(_captcha_png())
+    assert isinstance(texto, str)
+    assert 0 <= confianza <= 100
+
+
+def test_consulta_page_resuelve_desde_screenshot(tesseract_falso):
+    """ConsultaPage toma el screenshot en memoria y llena el campo"""
+    from pages.consulta_page import ConsultaPage
+
+    class PaginaFalsa:
+        def __init__(self):
+            self.llamadas = []
+            self.llenados = {}
+
+        def wait_for_selector(self, selector):
+            pass
+
+        def locator(self, selector):
+            return self
+
+        def screenshot(self, **kwargs):
+            self.llamadas.append(kwargs)
+            return _captcha_png()
+
+        def fill(self, selector, valor):
+            self.llenados[selector] = valor
+
+    pagina = PaginaFalsa()
+    consulta = ConsultaPage(pagina, rate_limiter=object())
+
+    assert consulta.solve_and_fill_captcha() == '4821'
+    assert pagina.llamadas == [{}]
+    assert pagina.llenados[consulta.captcha_input] == '4821'
+    assert consulta.captcha_confianza == 80.0
+
+
+def test_refresca_hasta_superar_el_umbral(monkeypatch):
+    """Solo se acepta una lectura con confianza suficiente; si no llega, None"""
+    metricas = MetricasCaptcha()
+    monkeypatch.setattr(captcha_solver, '_metricas', metricas)
+    lecturas = iter([('48', 15.0), ('', 0.0), ('4821', 75.0)])
+    pedidas = []
+
+    def imagen(refrescar):
+        pedidas.append(refrescar)
+        return b'png'
+
+    resultado = resolver_con_refresco(imagen, solver=lambda img: next(lecturas),
+                                      confianza_minima=60, max_refrescos=5)
+    assert resultado == ('4821', 75.0)
+    assert pedidas == [False, True, True]
+
+    assert resolver_con_refresco(imagen, solver=lambda img: ('4821', 30.0),
+                                 confianza_minima=60, max_refrescos=2) is None
+
+    metricas.registrar_envio(exitoso=False, captcha_rechazado=True)
+    metricas.registrar_envio(exitoso=True)
+    stats = metricas.stats()
+    assert (stats['lecturas'], stats['refrescos'], stats['descartados']) == (6, 4, 1)
+    assert stats['desperdiciados_por_exito'] == 1.0
+
+
+def _lectura(texto, confianza):
+    return {'texto': texto, 'confianza': confianza, 'caracteres': [(c, confianza) for c in texto]}
+
+
+def test_voto_por_caracter_ponderado():
+    """Gana el carácter con más confianza acumulada entre lecturas del mismo largo"""
+    resultado = captcha_solver.votar([_lectura('4821', 90.0), _lectura('4327', 40.0),
+                                      _lectura('4829', 45.0), _lectura('482', 95.0)])
+    assert resultado['texto'] == '4821'
+    assert resultado['caracteres'][0] == ('4', 175.0 / 3)
+    assert captcha_solver.votar([_lectura('', 0.0)])['texto'] == ''
+
+
+def test_votacion_corta_al_haber_acuerdo(monkeypatch):
+    """Sin pool las variantes se evalúan en orden y se deja de leer al haber acuerdo"""
+    psms = []
+
+    class MotorPorPsm:
+        def reconocer(self, binaria, psm=6, whitelist="0123456789"):
+            psms.append(psm)
+            texto = '4827' if psm == 6 else '4821'
+            return texto, 80.0, [(c, 80.0) for c in texto]
+
+    monkeypatch.setattr(captcha_solver, 'get_glyph_classifier', lambda: None)
+    monkeypatch.setattr(captcha_solver, 'get_ocr_pool', lambda: None)
+    monkeypatch.setattr(captcha_solver, '_motor_local', lambda: MotorPorPsm())
+
+    variantes = [('otsu', 6), ('limpio', 7), ('adaptativo', 8), ('fijo', 13)]
+    resultado = captcha_solver.solve_captcha_detallado(_captcha_png(), variantes=variantes)
+
+    assert resultado['texto'] == '4821'
+    assert resultado['variantes'] == 3
+    assert psms == [6, 7, 8]
+
+
+def test_votacion_en_pool_cancela_las_pendientes(monkeypatch):
+    """Las variantes que siguen en cola al haber acuerdo se cancelan"""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    demoras = {6: 0.0, 7: 0.0, 8: 0.5, 13: 0.0}
+
+    class PoolFalso:
+        def __init__(self):
+            self.executor = ThreadPoolExecutor(max_workers=1)
+            self.futuros = []
+
+        def enviar(self, binaria, psm=6, whitelist="0123456789"):
+            def leer():
+                time.sleep(demoras[psm])
+                return _lectura('4821', 85.0)
+            self.futuros.append(self.executor.submit(leer))
+            return self.futuros[-1]
+
+    pool = PoolFalso()
+    monkeypatch.setattr(captcha_solver, 'get_ocr_pool', lambda: pool)
+
+    resultado = captcha_solver.solve_captcha_votado(
+        np.full((40, 120), 255, np.uint8), [('otsu', 6), ('otsu', 7), ('otsu', 8), ('otsu', 13)], acuerdo=2)
+    pool.executor.shutdown(wait=True)
+
+    assert resultado['texto'] == '4821'
+    assert resultado['variantes'] == 2
+    assert pool.futuros[-1].cancelled()
+
+
+def test_ocr_solapado_con_llenado_del_formulario(monkeypatch):
+    """El OCR corre mientras se llena el formulario; el ahorro queda en los tiempos"""
+    import threading
+    from pages.consulta_page import ConsultaPage
+
+    ocr_iniciado, formulario_lleno = threading.Event(), threading.Event()
+
+    def solver_solapado(imagen):
+        # Solo termina bien si el formulario se llena mientras el OCR está en curso;
+        # si open() esperara al OCR antes de seguir, el evento nunca llegaría a tiempo
+        ocr_iniciado.set()
+        solapado = formulario_lleno.wait(timeout=5)
+        return ('4821' if solapado else '0000'), 90.0
+
+    monkeypatch.setattr(captcha_solver, 'solve_captcha_image', solver_solapado)
+
+    class PaginaFalsa:
+        def __init__(self):
+            self.llenados = {}
+
+        def goto(self, url, timeout=None):
+            pass
+
+        def wait_for_selector(self, selector):
+            pass
+
+        def locator(self, selector):
+            return self
+
+        def screenshot(self, **kwargs):
+            return _captcha_png()
+
+        def fill(self, selector, valor):
+            self.llenados[selector] = valor
+
+        def select_option(self, selector, valor):
+            self.llenados[selector] = valor
+            if len(self.llenados) == 4:  # cédula + día, mes y año
+                assert ocr_iniciado.wait(timeout=5)
+                formulario_lleno.set()
+
+    class LimiterLibre:
+        def adquirir(self, endpoint):
+            pass
+
+    consulta = ConsultaPage(PaginaFalsa(), rate_limiter=LimiterLibre())
+    consulta.open()
+    consulta.fill_cedula('1032493824')
+    consulta.fill_fecha('09', '10', '2015')
+    assert consulta.solve_and_fill_captcha() == '4821'
+
+    # El envío esperó solo la parte del OCR posterior al formulario; el resto es ahorro
+    tiempos = consulta.tiempos
+    assert set(tiempos) == {'captcha_ocr', 'espera_captcha', 'ahorro_solapamiento'}
+    assert tiempos['captcha_ocr'] > 0
+    assert tiempos['ahorro_solapamiento'] == max(0.0, tiempos['captcha_ocr'] - tiempos['espera_captcha'])
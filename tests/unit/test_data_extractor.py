@@ -0,0 +1,200 @@
+"""
+Test del extractor de PDFs
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Agregar el directorio raíz al path para importaciones
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from benchmarks.bench_extractor import ExtractorSecuencial
+from benchmarks.certificados_sinteticos import a_pdf, generar_corpus
+from extractors.data_extractor import CostoBackends, EscanerCampos, RegistraduriaPDFExtractor, _cabeza_literal
+
+TEXTO = """REGISTRADURÍA NACIONAL DEL ESTADO CIVIL
+Nombre: JUAN CARLOS PEREZ GOMEZ
+Documento: 12.345.678
+Fecha Expedición: 15/01/2023
+Fecha Nacimiento: 20/05/85
+Grupo Sanguíneo: O+
+"""
+
+
+def test_corpus_dorado_igual_a_la_busqueda_secuencial():
+    """Mismos campos y valores que el extractor anterior en 1000 certificados"""
+    anterior, actual = ExtractorSecuencial(), RegistraduriaPDFExtractor()
+    for texto in generar_corpus(1000, semilla=5) + [TEXTO, "", "sin campos"]:
+        assert actual._extract_all_fields(texto) == anterior._extract_all_fields(texto), texto
+
+
+def test_texto_conocido():
+    # El nombre no sale: el lookahead (?=\s{2,}|$) no coincide una vez colapsados los espacios
+    assert RegistraduriaPDFExtractor()._extract_all_fields(TEXTO) == {
+        'documento': '12345678',
+        'fecha_expedicion': '2023-01-15',
+        'fecha_nacimiento': '1985-05-20',
+        'estado_vigencia': 'CIVIL NOMBRE',
+        'rh': 'O+',
+    }
+
+
+def test_prioridad_valores_vacios_y_solapamientos():
+    escaner = EscanerCampos({
+        'nombre': [r'NOMBRE DEL CIUDADANO: (\w+)', r'NOMBRE: ([\w/]+)', r'CIUDADANO: (\w+)'],
+        'numero': [r'NO\.? (\d+)', r'(\d{4})'],
+    })
+    # Gana el patrón de mayor prioridad aunque su coincidencia esté más adelante;
+    # "N/A" se ignora y "CIUDADANO" se encuentra dentro de otra coincidencia
+    assert escaner.buscar("NOMBRE: N/A CIUDADANO: LUIS NOMBRE DEL CIUDADANO: ANA 2024") == {
+        'nombre': 'ANA', 'numero': '2024'}
+    assert escaner.buscar("NOMBRE: N/A CIUDADANO: LUIS NO. 7") == {'nombre': 'LUIS', 'numero': '7'}
+    # Texto sin normalizar: mismo resultado que re.search con IGNORECASE
+    assert escaner.buscar("ciudadano: Pedro") == {'nombre': 'Pedro'}
+
+
+def test_cabeza_literal():
+    assert _cabeza_literal(r'Naci[ÓO] el[:\s]+(\d+)') == ['N', 'A', 'C', 'I', '[ÓO]', ' ', 'E', 'L']
+    assert _cabeza_literal(r'Sexos?[:\s]+(\w+)') == ['S', 'E', 'X', 'O']
+    assert _cabeza_literal(r'Nombre|Apellido') is None
+    assert _cabeza_literal(r'\d+') is None
+
+
+def test_iter_extract_en_procesos_respeta_el_orden(tmp_path):
+    pytest.importorskip("reportlab")
+    rutas = []
+    for i, texto in enumerate(generar_corpus(7, semilla=2)):
+        ruta = tmp_path / f"cedula_{i}.pdf"
+        ruta.write_bytes(a_pdf(texto))
+        rutas.append(ruta)
+    rutas.insert(3, tmp_path / "no_existe.pdf")
+
+    extractor = RegistraduriaPDFExtractor()
+    secuencial = list(extractor.iter_extract(rutas))
+    ordenado = list(extractor.iter_extract(rutas, workers=2, tamano_lote=2))
+    por_llegada = list(extractor.iter_extract(rutas, workers=2, tamano_lote=2, ordenado=False))
+
+    def sin_fecha(resultados):
+        return [{k: v for k, v in r.items() if k != '_metadata'} for r in resultados]
+
+    assert [r['archivo'] for r in ordenado] == [ruta.name for ruta in rutas]
+    assert sin_fecha(ordenado) == sin_fecha(secuencial)
+    assert sorted(r['archivo'] for r in por_llegada) == sorted(ruta.name for ruta in rutas)
+    assert 'error' in ordenado[3]
+    assert sum('documento' in r for r in ordenado) >= 5
+
+
+def test_iter_extract_en_procesos_usa_patrones_y_cache_del_extractor(tmp_path):
+    """Con workers > 1 los procesos extraen con los patrones y el cache de quien llama"""
+    pytest.importorskip("reportlab")
+    from storage.extraction_cache import CacheExtracciones
+    from extractors.data_extractor import VERSION_TEXTO
+
+    rutas = []
+    for i, texto in enumerate(generar_corpus(4, semilla=3)):
+        ruta = tmp_path / f"cedula_{i}.pdf"
+        ruta.write_bytes(a_pdf(texto))
+        rutas.append(ruta)
+
+    cache = CacheExtracciones(str(tmp_path / "cache.db"), VERSION_TEXTO)
+    extractor = RegistraduriaPDFExtractor(cache=cache)
+    extractor.patterns['documento'] = [r'(ZZZ-NUNCA)']
+    extractor.compilar_patrones()
+
+    secuencial = [{k: v for k, v in r.items() if k != '_metadata'} for r in extractor.iter_extract(rutas)]
+    en_procesos = list(extractor.iter_extract(rutas, workers=2, tamano_lote=2))
+
+    assert not any('documento' in r for r in en_procesos)
+    assert [{k: v for k, v in r.items() if k != '_metadata'} for r in en_procesos] == secuencial
+    # Los procesos leyeron el cache que llenó la pasada secuencial
+    assert all(r['_metadata']['desde_cache'] for r in en_procesos)
+
+
+def test_lee_paginas_hasta_tener_los_campos_requeridos():
+    extractor = RegistraduriaPDFExtractor()
+    leidas = []
+    revisados = []
+    extract_all_fields = extractor._extract_all_fields
+
+    def espia(text, campos=None):
+        revisados.append((text, list(campos)))
+        return extract_all_fields(text, campos)
+
+    extractor._extract_all_fields = espia
+
+    def paginas():
+        for pagina in ["Documento: 1.234.567 Fecha Expedicion: 01/02/2003",
+                       "Estado: VIGENTE", "Anexo 1", "Anexo 2"]:
+            leidas.append(pagina)
+            yield pagina
+
+    # Por defecto: la primera página aunque falten campos, sin buscarlos en ella
+    assert extractor._unir_paginas(paginas(), temprano=True).startswith("Documento")
+    assert len(leidas) == 1
+    assert revisados == []
+
+    # Con más páginas permitidas: hasta tener los campos, revisando solo la página nueva
+    leidas.clear()
+    extractor.paginas_temprano = 3
+    texto = extractor._unir_paginas(paginas(), temprano=True)
+    assert len(leidas) == 2
+    assert revisados[-1] == ("Estado: VIGENTE", ['estado_vigencia'])
+    assert extract_all_fields(texto)['estado_vigencia'] == 'VIGENTE'
+
+    # Sin los campos nunca: se corta igual en el límite
+    leidas.clear()
+    extractor.campos_requeridos = ['rh']
+    extractor._unir_paginas(paginas(), temprano=True)
+    assert len(leidas) == 3
+    assert extractor._unir_paginas(iter(["a", None, "b"]), temprano=False) == "a\nb\n"
+
+
+def test_costo_backends_solo_ordena_los_respaldos():
+    costos = CostoBackends(['pdfplumber', 'pypdf2', 'otro'])
+    assert costos.orden() == ['pdfplumber', 'pypdf2', 'otro']  # sin medir: orden dado
+    costos.observar('pdfplumber', 0.020)
+    costos.observar('pypdf2', 0.009)
+    assert costos.orden() == ['pdfplumber', 'otro', 'pypdf2']  # el respaldo sin medir va primero
+    costos.observar('otro', 0.001)
+    costos.observar('pypdf2', 0.003)
+    # El primario no cambia aunque sea el más caro: el texto no depende del historial
+    for _ in range(200):
+        assert costos.orden() == ['pdfplumber', 'otro', 'pypdf2']
+    assert costos.stats() == {'pdfplumber': 20.0, 'pypdf2': 7.8, 'otro': 1.0}
+
+
+def test_extract_from_bytes_igual_que_desde_disco(tmp_path, monkeypatch):
+    pytest.importorskip("reportlab")
+    import io
+
+    import utils.downloader as downloader
+
+    contenido = a_pdf(TEXTO + "Estado: VIGENTE\n")
+    ruta = tmp_path / "cedula.pdf"
+    ruta.write_bytes(contenido)
+    extractor = RegistraduriaPDFExtractor()
+    extractor.cache = None  # sin cache: las dos rutas pasan por el parser
+
+    def sin_metadata(datos):
+        return {k: v for k, v in datos.items() if k != '_metadata'}
+
+    esperado = sin_metadata(extractor.extract_from_pdf(str(ruta)))
+    assert esperado['documento'] == '12345678'
+
+    flujo = io.BytesIO(contenido)
+    flujo.seek(7)
+    for buffer in (contenido, memoryview(contenido), bytearray(contenido), flujo):
+        assert sin_metadata(extractor.extract_from_bytes(buffer)) == esperado
+    flujo.write(b"%%EOF")  # la vista del BytesIO se liberó: puede volver a crecer
+
+    # Guardar en disco es opcional y no bloquea la extracción
+    futuros = []
+    original = downloader.guardar_pdf_async
+    monkeypatch.setattr(downloader, 'guardar_pdf_async', lambda *a: futuros.append(original(*a)) or futuros[-1])
+    destino = tmp_path / "descargas" / "cedula_1.pdf"
+    datos = extractor.extract_from_bytes(memoryview(contenido), nombre=str(destino), guardar_en=destino)
+    assert datos['_metadata']['pdf_path'] == str(destino)
+    assert futuros[0].result(timeout=10) == str(destino)
+    assert destino.read_bytes() == contenido
+    assert not list(destino.parent.glob("*.parcial"))
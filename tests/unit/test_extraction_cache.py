@@ -0,0 +1,109 @@
+"""
+Test del cache de extracciones direccionado por contenido
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Agregar el directorio raíz al path para importaciones
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from benchmarks.certificados_sinteticos import a_pdf
+from extractors.data_extractor import VERSION_TEXTO, RegistraduriaPDFExtractor
+from storage.extraction_cache import CacheExtracciones
+
+TEXTO = """REGISTRADURIA NACIONAL DEL ESTADO CIVIL
+Documento: 12.345.678
+Fecha Expedicion: 15/01/2023
+Grupo Sanguineo: O+
+"""
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    pytest.importorskip("reportlab")
+    ruta = tmp_path / "cedula_1.pdf"
+    ruta.write_bytes(a_pdf(TEXTO))
+    return ruta
+
+
+def _sin_pdfplumber(monkeypatch):
+    def _falla(self, pdf_path):
+        raise AssertionError("no debería parsear el PDF")
+    monkeypatch.setattr(RegistraduriaPDFExtractor, '_extract_text', _falla)
+
+
+def test_mismo_contenido_no_vuelve_a_parsear(pdf, tmp_path, monkeypatch):
+    cache = CacheExtracciones(str(tmp_path / "consultas.db"))
+    extractor = RegistraduriaPDFExtractor(cache=cache)
+    primera = extractor.extract_from_pdf(str(pdf))
+    assert primera['documento'] == '12345678'
+    assert primera['_metadata']['desde_cache'] is False
+
+    # Otro nombre, mismos bytes
+    copia = tmp_path / "copia.pdf"
+    copia.write_bytes(pdf.read_bytes())
+    _sin_pdfplumber(monkeypatch)
+    segunda = extractor.extract_from_pdf(str(copia))
+
+    assert segunda['_metadata']['desde_cache'] is True
+    assert {k: v for k, v in segunda.items() if k != '_metadata'} == \
+        {k: v for k, v in primera.items() if k != '_metadata'}
+    assert cache.stats()['aciertos'] == 1 and cache.stats()['fallos'] == 1
+
+
+def test_cambio_de_patrones_recalcula_solo_ese_campo(pdf, tmp_path, monkeypatch):
+    cache = CacheExtracciones(str(tmp_path / "consultas.db"))
+    RegistraduriaPDFExtractor(cache=cache).extract_from_pdf(str(pdf))
+
+    # Se marca el valor guardado del documento para ver que se reutiliza sin recalcular
+    huella, texto = cache._conn.execute('SELECT sha256, texto FROM extracciones').fetchone()
+    cache.guardar(huella, texto, {'documento': 'GUARDADO', 'rh': 'O+'},
+                  RegistraduriaPDFExtractor(cache=cache)._hashes_campos, VERSION_TEXTO)
+
+    extractor = RegistraduriaPDFExtractor(cache=cache)
+    extractor.patterns['rh'] = [r'Sangu[ií]neo[:\s]+([A-Z\+\-]+)']
+    extractor.compilar_patrones()
+    _sin_pdfplumber(monkeypatch)
+    datos = extractor.extract_from_pdf(str(pdf))
+
+    assert datos['documento'] == 'GUARDADO'
+    assert datos['rh'] == 'O+'
+    assert 'fecha_expedicion' not in datos  # guardado con hash vigente: no se recalcula
+    assert cache.stats()['parciales'] == 1
+    # Ya actualizado: la siguiente vez es un acierto completo
+    extractor.extract_from_pdf(str(pdf))
+    assert cache.stats()['aciertos'] == 1
+
+
+def test_otra_version_de_texto_no_se_usa(pdf, tmp_path, monkeypatch):
+    from extractors import data_extractor
+
+    # Cache inyectado con la versión por defecto del constructor: manda la del extractor
+    cache = CacheExtracciones(str(tmp_path / "consultas.db"))
+    RegistraduriaPDFExtractor(cache=cache).extract_from_pdf(str(pdf))
+    assert cache._conn.execute('SELECT version FROM extracciones').fetchone()[0] == data_extractor.VERSION_TEXTO
+
+    # Subir VERSION_TEXTO invalida lo guardado aunque el cache sea el mismo objeto
+    monkeypatch.setattr(data_extractor, 'VERSION_TEXTO', data_extractor.VERSION_TEXTO + 1)
+    datos = RegistraduriaPDFExtractor(cache=cache).extract_from_pdf(str(pdf))
+    assert datos['_metadata']['desde_cache'] is False
+    # La extracción nueva reemplaza a la vieja (misma huella)
+    assert cache._conn.execute('SELECT version FROM extracciones').fetchall() == [(data_extractor.VERSION_TEXTO,)]
+    assert cache.purgar_versiones(data_extractor.VERSION_TEXTO) == 0
+    assert cache.purgar_versiones(data_extractor.VERSION_TEXTO + 1) == 1
+
+
+def test_cache_compartido_por_version(tmp_path, monkeypatch):
+    from storage import extraction_cache
+
+    monkeypatch.setattr(extraction_cache, '_config', {'habilitado': True, 'db': str(tmp_path / "c.db")})
+    monkeypatch.setattr(extraction_cache, '_caches', {})
+    v2 = extraction_cache.get_cache_extracciones(2)
+    assert v2.version == 2
+    assert extraction_cache.get_cache_extracciones(2) is v2
+    assert extraction_cache.get_cache_extracciones(3).version == 3
+
+    monkeypatch.setattr(extraction_cache, '_config', {'habilitado': False})
+    assert extraction_cache.get_cache_extracciones(2) is None
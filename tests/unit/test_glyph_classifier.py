@@ -0,0 +1,81 @@
+"""
+Test del clasificador local de glifos del CAPTCHA
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Agregar el directorio raíz al path para importaciones
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from benchmarks.captchas_sinteticos import generar_corpus
+from utils import captcha_solver
+from utils.glyph_classifier import GlyphClassifier, segmentar
+from utils.preprocesamiento import preprocesar
+
+
+@pytest.fixture(scope="module")
+def clasificador():
+    modelo = GlyphClassifier()
+    resumen = modelo.entrenar(generar_corpus(200))
+    assert resumen['usadas'] >= 190
+    return modelo
+
+
+def test_segmenta_un_glifo_por_caracter():
+    corpus = generar_corpus(50, semilla=3)
+    cantidades = [len(segmentar(preprocesar(imagen, 'limpio'))) for imagen, _ in corpus]
+    assert sum(n == 4 for n in cantidades) >= 45
+
+
+def test_precision_y_persistencia(clasificador, tmp_path):
+    """Reconoce CAPTCHAs no vistos y el modelo guardado predice lo mismo"""
+    prueba = generar_corpus(60, semilla=11)
+    resultados = [clasificador.reconocer(imagen) for imagen, _ in prueba]
+    aciertos = sum(texto == etiqueta for (texto, _, _), (_, etiqueta) in zip(resultados, prueba))
+    assert aciertos / len(prueba) >= 0.9
+    assert all(0 <= conf <= 100 for _, _, caracteres in resultados for _, conf in caracteres)
+
+    ruta = tmp_path / "modelo.npz"
+    clasificador.guardar(str(ruta))
+    cargado = GlyphClassifier.cargar(str(ruta))
+    assert [cargado.reconocer(imagen)[0] for imagen, _ in prueba[:10]] == \
+        [texto for texto, _, _ in resultados[:10]]
+
+
+def test_largo_desconocido_da_confianza_cero(clasificador):
+    blanco = np.full((50, 160, 3), 230, np.uint8)
+    assert clasificador.reconocer(blanco) == ("", 0.0, [])
+
+
+def test_solver_usa_glifos_y_recurre_a_tesseract(clasificador, monkeypatch):
+    """Con confianza suficiente no se llama a Tesseract; si no, sí"""
+    llamadas = []
+
+    class MotorFalso:
+        def reconocer(self, binaria, psm=6, whitelist="0123456789"):
+            llamadas.append(binaria)
+            return "9999", 55.0, [("9", 55.0)] * 4
+
+    monkeypatch.setattr(captcha_solver, 'get_glyph_classifier', lambda: clasificador)
+    monkeypatch.setattr(captcha_solver, 'get_ocr_pool', lambda: None)
+    monkeypatch.setattr(captcha_solver, '_motor_local', lambda: MotorFalso())
+    imagen, etiqueta = generar_corpus(1, semilla=5)[0]
+
+    lecturas_config = []
+    monkeypatch.setattr(captcha_solver, '_ajustes', None)
+    monkeypatch.setattr(captcha_solver, 'cargar_config',
+                        lambda: lecturas_config.append(1) or {'glifos': {'confianza_minima': 0}})
+    for _ in range(3):
+        resultado = captcha_solver.solve_captcha_detallado(imagen)
+        assert (resultado['texto'], resultado['motor']) == (etiqueta, 'glifos')
+    assert llamadas == []
+    assert len(lecturas_config) == 1  # settings.json no se relee en cada CAPTCHA
+
+    monkeypatch.setattr(captcha_solver, '_ajustes', None)
+    monkeypatch.setattr(captcha_solver, 'cargar_config', lambda: {'glifos': {'confianza_minima': 101}})
+    resultado = captcha_solver.solve_captcha_detallado(imagen)
+    assert (resultado['texto'], resultado['motor']) == ("9999", 'tesseract')
+    assert len(llamadas) == 1
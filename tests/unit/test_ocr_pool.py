@@ -0,0 +1,88 @@
+"""
+Test del pool de procesos OCR
+"""
+import queue
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Agregar el directorio raíz al path para importaciones
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from utils.ocr_pool import HistogramaLatencia, OCRPool
+
+
+class MotorFalso:
+    """Lee como dígito la cantidad de columnas con tinta; tarda un poco a propósito"""
+
+    def __init__(self, lang):
+        self.lang = lang
+
+    def reconocer(self, binaria, psm=6, whitelist="0123456789"):
+        time.sleep(0.2)
+        texto = str(int((binaria == 0).any(axis=0).sum()) % 10)
+        return texto, 90.0, [(texto, 90.0)]
+
+
+def _imagen(columnas):
+    binaria = np.full((10, 20), 255, np.uint8)
+    binaria[:, :columnas] = 0
+    return binaria
+
+
+def test_pool_reparte_entre_procesos_y_mide_latencia():
+    with OCRPool(workers=2, max_cola=8, fabrica_motor=MotorFalso) as pool:
+        futuros = [pool.enviar(_imagen(i)) for i in range(6)]
+        resultados = [f.result(timeout=30) for f in futuros]
+
+        assert [r['texto'] for r in resultados] == [str(i) for i in range(6)]
+        assert resultados[0]['caracteres'] == [('0', 90.0)]
+        assert len({r['pid'] for r in resultados}) == 2
+
+        stats = pool.stats()
+        assert stats['latencia']['total'] == 6
+        assert stats['latencia_motor']['p50_ms'] == 250
+
+
+def test_cola_acotada_rechaza_sin_bloquear():
+    with OCRPool(workers=1, max_cola=2, fabrica_motor=MotorFalso) as pool:
+        pool.reconocer(_imagen(1), timeout=30)  # espera a que el worker arranque
+        pool.enviar(_imagen(1))
+        pool.enviar(_imagen(2))
+        with pytest.raises(queue.Full):
+            pool.enviar(_imagen(3), bloquear=False)
+        assert pool.stats()['rechazadas'] == 1
+
+
+def test_memoria_compartida_da_lo_mismo_que_pickle():
+    imagenes = [_imagen(i) for i in range(5)] + [np.full((200, 20), 255, np.uint8)]  # la última no cabe
+
+    with OCRPool(workers=2, max_cola=3, fabrica_motor=MotorFalso) as pool:
+        esperados = [pool.reconocer(imagen, timeout=30)['texto'] for imagen in imagenes]
+
+    with OCRPool(workers=2, max_cola=3, fabrica_motor=MotorFalso,
+                 memoria_compartida=True, alto_max=64, ancho_max=64) as pool:
+        futuros = [pool.enviar(imagen) for imagen in imagenes]
+        assert [f.result(timeout=30)['texto'] for f in futuros] == esperados
+
+        stats = pool.stats()
+        assert (stats['por_memoria'], stats['por_pickle']) == (5, 1)
+        # Las ranuras vuelven al anillo al terminar cada imagen (el callback puede ir un poco detrás)
+        limite = time.monotonic() + 5
+        while pool._anillo._libres.qsize() < 3 and time.monotonic() < limite:
+            time.sleep(0.01)
+        assert pool._anillo._libres.qsize() == 3
+
+
+def test_histograma_percentiles():
+    histograma = HistogramaLatencia(buckets_ms=(10, 100))
+    for segundos in (0.005, 0.005, 0.05, 2.0):
+        histograma.observar(segundos)
+
+    resumen = histograma.resumen()
+    assert resumen['buckets'] == {'<=10ms': 2, '<=100ms': 1, '>100ms': 1}
+    assert resumen['p50_ms'] == 10
+    assert resumen['p99_ms'] == float('inf')
@@ -0,0 +1,78 @@
+"""
+Test del preprocesamiento vectorizado de CAPTCHA
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Agregar el directorio raíz al path para importaciones
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from utils.preprocesamiento import (FONDO, PIPELINES, TINTA, angulo_inclinacion, binarizar,
+                                    enderezar, escala_grises, preprocesar, quitar_lineas,
+                                    quitar_ruido, umbral_adaptativo, umbral_otsu)
+
+
+def test_fijo_equivale_al_binarizado_anterior():
+    """El pipeline 'fijo' reproduce Image.point(lambda x: 0 if x < 140 else 255)"""
+    rgb = np.random.default_rng(1).integers(0, 256, (40, 120, 3), dtype=np.uint8)
+    anterior = Image.fromarray(rgb).convert("L").point(lambda x: 0 if x < 140 else 255, '1')
+
+    assert np.array_equal(preprocesar(rgb, 'fijo'), np.asarray(anterior.convert("L")))
+    gris_pil = np.asarray(Image.fromarray(rgb).convert("L")).astype(int)
+    assert np.abs(escala_grises(rgb).astype(int) - gris_pil).max() <= 1
+
+
+def test_umbrales_otsu_y_adaptativo():
+    gris = np.full((30, 60), 200, np.uint8)
+    gris[10:20, 10:50] = 40
+    assert 40 < umbral_otsu(gris) <= 200
+    assert (binarizar(gris) == TINTA).sum() == 400
+
+    # Con un degradado de fondo el umbral local sigue separando el texto
+    degradado = np.tile(np.linspace(120, 250, 60).astype(np.uint8), (30, 1))
+    degradado[12:18, 5:55] -= 60
+    assert (umbral_adaptativo(degradado, ventana=15, c=10)[12:18, 8:52] == TINTA).mean() > 0.9
+
+    assert umbral_otsu(np.full((5, 5), 90, np.uint8)) >= 1
+
+
+def test_limpieza_de_ruido_y_lineas():
+    binaria = np.full((20, 40), FONDO, np.uint8)
+    binaria[10, :] = TINTA          # línea de interferencia de 1 px
+    binaria[3:17, 5:8] = TINTA      # trazo de un carácter
+    binaria[1, 30] = TINTA          # píxel aislado
+
+    sin_ruido = quitar_ruido(binaria)
+    assert sin_ruido[1, 30] == FONDO
+    assert (sin_ruido[3:17, 5:8] == TINTA).all()
+
+    sin_lineas = quitar_lineas(sin_ruido)
+    assert (sin_lineas[10, 10:] == FONDO).all()
+    assert (sin_lineas[3:17, 5:8] == TINTA).all()
+
+
+def test_enderezar_corrige_inclinacion():
+    img = Image.new('L', (100, 50), FONDO)
+    ImageDraw.Draw(img).rectangle((10, 22, 90, 27), fill=TINTA)
+    inclinada = binarizar(np.asarray(img.rotate(8, fillcolor=FONDO)))
+
+    assert abs(angulo_inclinacion(inclinada)) > 6
+    assert abs(angulo_inclinacion(enderezar(inclinada))) < 1
+
+
+def test_todos_los_pipelines_y_benchmark():
+    """Cada pipeline da una imagen binaria del mismo tamaño; el benchmark corre sin OCR"""
+    from benchmarks.bench_preprocesamiento import ejecutar
+
+    rgb = np.random.default_rng(2).integers(0, 256, (50, 160, 3), dtype=np.uint8)
+    for nombre in PIPELINES:
+        salida = preprocesar(rgb, nombre)
+        assert salida.shape == (50, 160)
+        assert set(np.unique(salida)) <= {TINTA, FONDO}
+
+    filas = ejecutar(imagenes=3, con_ocr=False)
+    assert [f['pipeline'] for f in filas] == ['legacy_point', *PIPELINES]
+    assert all(f['us_mediana'] > 0 for f in filas)
@@ -0,0 +1,99 @@
+"""
+Test unitario del limitador de tasa (token bucket) con reloj falso
+"""
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+# Agregar directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from utils.rate_limiter import RateLimiter, TokenBucket
+
+
+class RelojFalso:
+    """Reloj cuyo sueño avanza el tiempo en lugar de bloquear"""
+
+    def __init__(self):
+        self.ahora = 0.0
+        self.suenos = []
+
+    def __call__(self):
+        return self.ahora
+
+    def dormir(self, segundos):
+        self.suenos.append(segundos)
+        self.ahora += segundos
+
+
+def test_rafaga_y_luego_tasa_constante():
+    reloj = RelojFalso()
+    bucket = TokenBucket(tasa=2.0, capacidad=3, reloj=reloj, dormir=reloj.dormir)
+
+    # La ráfaga inicial no espera
+    assert [bucket.adquirir() for _ in range(3)] == [0, 0, 0]
+
+    # Luego un token cada 0.5s
+    assert bucket.adquirir() == 0.5
+    assert bucket.adquirir() == 0.5
+    assert reloj.ahora == 1.0
+    assert reloj.suenos == [0.5, 0.5]
+
+
+def test_rellenado_no_supera_capacidad():
+    reloj = RelojFalso()
+    bucket = TokenBucket(tasa=1.0, capacidad=2, reloj=reloj, dormir=reloj.dormir)
+
+    bucket.adquirir(2)
+    reloj.ahora += 100
+    assert bucket.disponibles == 2
+    assert bucket.intentar(2)
+    assert not bucket.intentar(1)
+
+
+def test_reservas_concurrentes_se_encolan_sin_busy_spin():
+    """Cada hilo duerme una sola vez, escalonado según su reserva"""
+    reloj = RelojFalso()
+    esperas = []
+    lock = threading.Lock()
+    bucket = TokenBucket(tasa=10.0, capacidad=1, reloj=reloj,
+                         dormir=lambda s: esperas.append(s))
+    bucket.adquirir()
+
+    def worker():
+        espera = bucket.adquirir()
+        with lock:
+            esperas.append(round(espera, 6))
+
+    hilos = [threading.Thread(target=worker) for _ in range(5)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    # El reloj no avanzó: las esperas son 0.1, 0.2, ... 0.5 (una por hilo)
+    assert sorted(set(esperas)) == [0.1, 0.2, 0.3, 0.4, 0.5]
+
+
+def test_buckets_independientes_por_endpoint():
+    reloj = RelojFalso()
+    limiter = RateLimiter({'pdf': {'tasa': 1.0, 'capacidad': 1}},
+                          reloj=reloj, dormir=reloj.dormir)
+
+    limiter.adquirir('pdf')
+    assert limiter.adquirir('formulario') == 0
+    assert limiter.adquirir('pdf') == 1.0
+    assert limiter.stats()['pdf']['adquisiciones'] == 2
+
+
+def test_adquirir_async():
+    reloj = RelojFalso()
+    bucket = TokenBucket(tasa=100.0, capacidad=1, reloj=reloj)
+
+    async def dos():
+        return [await bucket.adquirir_async(), await bucket.adquirir_async()]
+
+    esperas = asyncio.run(dos())
+    assert esperas[0] == 0
+    assert abs(esperas[1] - 0.01) < 1e-9
@@ -0,0 +1,156 @@
+"""
+Test de la caché de resultados con TTL (memoria + SQLite)
+"""
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importaciones
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from integrador_consulta_simple import ConsultaSimpleIntegrator
+from storage.cache import ResultCache, clasificar
+from storage.database import DataStorage
+
+
+class RelojFalso:
+    def __init__(self):
+        self.ahora = datetime.now().timestamp()
+
+    def __call__(self):
+        return self.ahora
+
+
+def test_ttl_por_estado_y_lru():
+    """VIGENTE dura más que un error y la memoria respeta la capacidad"""
+    reloj = RelojFalso()
+    cache = ResultCache(capacidad=2, ttl={'VIGENTE': 100, 'ERROR': 10}, reloj=reloj)
+
+    cache.guardar('1', {'success': True, 'estado_vigencia': 'Vigente', 'nombre': 'UNO'})
+    cache.guardar('2', {'success': False, 'error': 'Timeout: lectura'})
+
+    reloj.ahora += 11
+    assert cache.obtener('1')['nombre'] == 'UNO'
+    assert cache.obtener('1')['cache'] == 'memoria'
+    assert cache.obtener('2') is None
+
+    cache.guardar('3', {'success': True, 'estado_vigencia': 'VIGENTE'})
+    cache.guardar('4', {'success': True, 'estado_vigencia': 'VIGENTE'})
+    assert cache.obtener('1') is None  # desalojado por LRU
+
+    stats = cache.stats()
+    assert stats['hits_memoria'] == 2
+    assert stats['expirados'] == 1
+    assert stats['misses'] == 2
+
+
+def test_negativo_persistido_y_leido_de_sqlite(tmp_path, monkeypatch):
+    """Un 'no encontrado' sobrevive al proceso a través de SQLite"""
+    monkeypatch.chdir(tmp_path)
+    storage = DataStorage(str(tmp_path / "consultas.db"))
+
+    assert clasificar({'success': False, 'error': 'Documento no encontrado'}) == 'NO_ENCONTRADO'
+    ResultCache(storage=storage).guardar('999', {'success': False, 'error': 'Documento no encontrado'})
+
+    cache = ResultCache(storage=storage)
+    resultado = cache.obtener('999')
+    assert resultado['success'] is False
+    assert resultado['cache'] == 'sqlite'
+    assert cache.stats()['hits_negativos'] == 1
+
+    # Pasado su TTL ya no cuenta
+    reloj = RelojFalso()
+    reloj.ahora += 7 * 3600
+    assert ResultCache(storage=storage, reloj=reloj).obtener('999') is None
+
+
+def test_integrador_consulta_sitio_solo_una_vez(tmp_path, monkeypatch):
+    """Lo guardado por el flujo completo evita volver al sitio"""
+    monkeypatch.chdir(tmp_path)
+    storage = DataStorage(str(tmp_path / "consultas.db"))
+    storage.save_consulta({
+        'documento': '111',
+        'nombre': 'CIUDADANO GUARDADO',
+        'estado_vigencia': 'VIGENTE',
+        'consulta_exitosa': True,
+        'timestamp': (datetime.now() - timedelta(hours=1)).isoformat(),
+    })
+
+    llamadas = []
+
+    def consulta(documento):
+        llamadas.append(documento)
+        return {'success': True, 'documento': documento, 'estado_vigencia': 'VIGENTE'}
+
+    integrador = ConsultaSimpleIntegrator(cache=ResultCache(storage=storage))
+    integrador.consulta_func = consulta
+
+    assert integrador.realizar_consulta('111')['nombre'] == 'CIUDADANO GUARDADO'
+    integrador.realizar_consulta('222')
+    integrador.realizar_consulta('222')
+
+    assert llamadas == ['222']
+    stats = integrador.cache.stats()
+    assert stats['hits_sqlite'] == 1
+    assert stats['hits_memoria'] == 1
+    assert stats['misses'] == 1
+
+
+def test_bytes_del_pdf_nunca_se_guardan():
+    """El PDF solo vive mientras se extrae: la caché guarda el resto del resultado"""
+    cache = ResultCache()
+    resultado = {'consulta_exitosa': True, 'estado_vigencia': 'VIGENTE', 'pdf': b'%PDF-1.4'}
+    cache.guardar('111', resultado)
+
+    guardado = cache.obtener('111')
+    assert 'pdf' not in guardado
+    assert guardado['estado_vigencia'] == 'VIGENTE'
+    assert resultado['pdf'] == b'%PDF-1.4'  # el del llamador queda intacto
+
+
+def test_clasificar_resultados_de_backends_con_consulta_exitosa():
+    """HTTP y Selenium reportan 'consulta_exitosa': sus fallos no se guardan como positivos"""
+    assert clasificar({'consulta_exitosa': False, 'error': 'Timeout: lectura'}) == 'ERROR'
+    assert clasificar({'consulta_exitosa': False, 'error': 'CAPTCHA rechazado'}) == 'ERROR'
+    assert clasificar({'consulta_exitosa': False, 'error': 'Documento no encontrado'}) == 'NO_ENCONTRADO'
+    assert clasificar({'consulta_exitosa': True, 'estado_vigencia': 'Vigente'}) == 'VIGENTE'
+    assert clasificar({}) == 'ERROR'
+
+
+def test_sqlite_respeta_la_fecha_de_expedicion(tmp_path, monkeypatch):
+    """Una consulta con otra fecha de expedición no reutiliza la fila de SQLite"""
+    monkeypatch.chdir(tmp_path)
+    storage = DataStorage(str(tmp_path / "consultas.db"))
+    storage.save_consulta({
+        'documento': '111',
+        'nombre': 'CIUDADANO GUARDADO',
+        'fecha_expedicion': '2015-10-09',  # como la deja el extractor
+        'estado_vigencia': 'VIGENTE',
+        'consulta_exitosa': True,
+        'timestamp': datetime.now().isoformat(),
+    })
+
+    cache = ResultCache(storage=storage)
+    assert cache.obtener('111', '09/10/2015')['nombre'] == 'CIUDADANO GUARDADO'
+    assert cache.obtener('111', '10/10/2015') is None
+    assert cache.obtener('111')['cache'] == 'sqlite'
+
+
+def test_hit_de_sqlite_no_renueva_el_ttl(tmp_path, monkeypatch):
+    """Copiado a memoria, un hit de SQLite vence cuando vence su fila"""
+    monkeypatch.chdir(tmp_path)
+    storage = DataStorage(str(tmp_path / "consultas.db"))
+    reloj = RelojFalso()
+    storage.save_consulta({
+        'documento': '111',
+        'estado_vigencia': 'VIGENTE',
+        'consulta_exitosa': True,
+        'timestamp': datetime.fromtimestamp(reloj.ahora - 90).isoformat(),
+    })
+
+    cache = ResultCache(storage=storage, ttl={'VIGENTE': 100}, reloj=reloj)
+    assert cache.obtener('111')['cache'] == 'sqlite'
+    reloj.ahora += 5
+    assert cache.obtener('111')['cache'] == 'memoria'
+    reloj.ahora += 6  # la fila tiene 101 s: ya no sirve aunque el hit fue hace 11 s
+    assert cache.obtener('111') is None
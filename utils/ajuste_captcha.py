@@ -0,0 +1,197 @@
+"""
+Ajuste automático del perfil de OCR del CAPTCHA con datos etiquetados
+
+Busca (en grilla o al azar) combinaciones de umbral, limpieza, PSM y
+whitelist, puntúa cada candidato contra el corpus en un pool de procesos y
+escribe el mejor en config/settings.json → perfil_ocr, que el solver carga al
+arrancar.
+
+Uso:
+    python -m utils.ajuste_captcha --corpus corpus_captchas.db --escribir
+    python -m utils.ajuste_captcha --sinteticos 200 --modo aleatorio --candidatos 60
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.ocr_pool import WHITELIST, crear_motor
+from utils.preprocesamiento import escala_grises, preprocesar
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Valores a probar por dimensión; None = paso omitido
+ESPACIO: Dict[str, Sequence[Any]] = {
+    'umbral': ['otsu', 110, 128, 140, 160, ('adaptativo', 15, 10), ('adaptativo', 21, 15)],
+    'quitar_ruido': [None, 1, 2],
+    'quitar_lineas': [None, 1, 2],
+    'enderezar': [False, True],
+    'psm': [6, 7, 8, 13],
+    'whitelist': [WHITELIST],
+}
+
+
+def armar_perfil(candidato: Dict[str, Any]) -> Dict[str, Any]:
+    """Traduce un punto del espacio a un perfil (pipeline, psm, whitelist)"""
+    umbral = candidato['umbral']
+    if isinstance(umbral, (tuple, list)):
+        _, ventana, c = umbral
+        pipeline = [['umbral_adaptativo', {'ventana': ventana, 'c': c}]]
+    else:
+        pipeline = [['binarizar', {'umbral': umbral}]]
+    if candidato['quitar_ruido']:
+        pipeline.append(['quitar_ruido', {'vecinos_min': candidato['quitar_ruido']}])
+    if candidato['quitar_lineas']:
+        pipeline.append(['quitar_lineas', {'grosor': candidato['quitar_lineas']}])
+    if candidato['enderezar']:
+        pipeline.append(['enderezar', {}])
+    return {'pipeline': pipeline, 'psm': candidato['psm'], 'whitelist': candidato['whitelist']}
+
+
+def candidatos_grilla(espacio: Dict[str, Sequence[Any]] = ESPACIO) -> List[Dict[str, Any]]:
+    nombres = list(espacio)
+    return [armar_perfil(dict(zip(nombres, valores)))
+            for valores in itertools.product(*(espacio[n] for n in nombres))]
+
+
+def candidatos_aleatorios(cantidad: int, espacio: Dict[str, Sequence[Any]] = ESPACIO,
+                          semilla: int = 0) -> List[Dict[str, Any]]:
+    """Muestra sin repetir `cantidad` puntos del espacio"""
+    grilla = candidatos_grilla(espacio)
+    if cantidad >= len(grilla):
+        return grilla
+    return random.Random(semilla).sample(grilla, cantidad)
+
+
+# Estado propio de cada proceso evaluador
+_motor = None
+_muestras: List[Tuple[np.ndarray, str]] = []
+
+
+def _iniciar_evaluador(fabrica: Callable[[str], Any], lang: str, muestras: List[Tuple[np.ndarray, str]]):
+    global _motor, _muestras
+    _motor = fabrica(lang)
+    _muestras = muestras
+
+
+def _evaluar(perfil: Dict[str, Any]) -> Dict[str, Any]:
+    """Precisión y costo por imagen de un perfil sobre las muestras del worker"""
+    aciertos = 0
+    inicio = time.perf_counter()
+    for gris, etiqueta in _muestras:
+        binaria = preprocesar(gris, perfil['pipeline'])
+        try:
+            texto, _, _ = _motor.reconocer(binaria, perfil['psm'], perfil['whitelist'])
+        except Exception as e:
+            # Algunas excepciones del motor (p. ej. TesseractNotFoundError) no se pueden
+            # reconstruir en el proceso padre y rompen el pool
+            raise RuntimeError(f"{type(e).__name__}: {e}") from None
+        aciertos += texto == etiqueta
+    duracion = time.perf_counter() - inicio
+    return {
+        'perfil': perfil,
+        'aciertos': aciertos,
+        'precision': aciertos / len(_muestras) * 100 if _muestras else 0.0,
+        'ms_por_imagen': duracion / len(_muestras) * 1000 if _muestras else 0.0,
+    }
+
+
+def ajustar(muestras: List[Tuple[Any, str]], candidatos: List[Dict[str, Any]],
+            workers: Optional[int] = None, lang: str = 'eng',
+            fabrica_motor: Callable[[str], Any] = crear_motor) -> List[Dict[str, Any]]:
+    """
+    Puntúa cada candidato con todas las muestras
+
+    Las muestras se envían una sola vez a cada worker (en el initializer) y
+    los candidatos se reparten entre procesos.
+
+    Returns:
+        Resultados ordenados del mejor al peor (precisión, luego velocidad)
+    """
+    # En gris: un tercio de los datos a copiar y el mismo resultado en preprocesar
+    muestras = [(escala_grises(imagen), etiqueta) for imagen, etiqueta in muestras]
+    workers = min(workers or os.cpu_count() or 1, len(candidatos)) or 1
+
+    logger.info(f"🎛️  Ajustando {len(candidatos)} perfiles con {len(muestras)} muestras en {workers} procesos")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_iniciar_evaluador,
+                             initargs=(fabrica_motor, lang, muestras)) as executor:
+        resultados = list(executor.map(_evaluar, candidatos))
+
+    resultados.sort(key=lambda r: (-r['precision'], r['ms_por_imagen']))
+    return resultados
+
+
+def escribir_perfil(resultado: Dict[str, Any], muestras: int, ruta: str = "config/settings.json"):
+    """Guarda el perfil ganador en config/settings.json → perfil_ocr"""
+    with open(ruta, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    config['perfil_ocr'] = {
+        **resultado['perfil'],
+        'precision': round(resultado['precision'], 2),
+        'muestras': muestras,
+        'ajustado': datetime.now().isoformat(timespec='seconds'),
+    }
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=4, ensure_ascii=False)
+        f.write('\n')
+    logger.info(f"💾 Perfil OCR guardado en {ruta}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ajustar el perfil de OCR del CAPTCHA con datos etiquetados')
+    parser.add_argument('--corpus', type=str, help='Corpus SQLite grabado (storage.captcha_corpus)')
+    parser.add_argument('--sinteticos', type=int, default=100, help='CAPTCHAs sintéticos si no hay corpus')
+    parser.add_argument('--limite', type=int, help='Máximo de muestras')
+    parser.add_argument('--modo', choices=['grilla', 'aleatorio'], default='aleatorio')
+    parser.add_argument('--candidatos', type=int, default=50, help='Perfiles a probar en modo aleatorio')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--workers', type=int, help='Procesos evaluadores (default: núcleos)')
+    parser.add_argument('--escribir', action='store_true', help='Guardar el mejor perfil en config/settings.json')
+    args = parser.parse_args()
+
+    from benchmarks.bench_solver import cargar_muestras
+    from utils.captcha_solver import cargar_imagen
+    from utils.helpers import cargar_config
+
+    muestras = [(np.asarray(cargar_imagen(png).convert("RGB")), etiqueta)
+                for png, etiqueta in cargar_muestras(args.corpus, args.sinteticos, args.limite)]
+    if not muestras:
+        raise SystemExit("❌ No hay muestras etiquetadas")
+
+    if args.modo == 'grilla':
+        candidatos = candidatos_grilla()
+    else:
+        candidatos = candidatos_aleatorios(args.candidatos, semilla=args.semilla)
+
+    try:
+        resultados = ajustar(muestras, candidatos, workers=args.workers,
+                             lang=cargar_config().get('ocr_language', 'eng'))
+    except RuntimeError as e:
+        raise SystemExit(f"❌ Error del motor OCR: {e}")
+
+    print(f"\n{'precisión (%)':>14}{'ms/img':>9}  perfil")
+    print("-" * 80)
+    for resultado in resultados[:10]:
+        perfil = resultado['perfil']
+        pasos = " → ".join(f"{paso}{parametros or ''}" for paso, parametros in perfil['pipeline'])
+        print(f"{resultado['precision']:>14.1f}{resultado['ms_por_imagen']:>9.1f}  psm {perfil['psm']}: {pasos}")
+
+    if args.escribir:
+        escribir_perfil(resultados[0], len(muestras))
+        print(f"\n✅ Perfil guardado en config/settings.json (precisión {resultados[0]['precision']:.1f}%)")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,89 @@
+"""
+Anillo de ranuras en memoria compartida para pasar imágenes a los workers OCR
+
+El proceso que captura escribe la imagen en una ranura libre y solo el índice
+(y la forma) cruza la cola del pool; el worker la lee como una vista NumPy
+sin copiarla ni deserializarla.
+"""
+import queue
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+# (nombre, ranuras, alto_max, ancho_max): lo que necesita otro proceso para adjuntarse
+Descriptor = Tuple[str, int, int, int]
+
+
+class AnilloImagenes:
+    """Ranuras de tamaño fijo (uint8, alto_max x ancho_max) en un bloque compartido"""
+
+    def __init__(self, ranuras: int, alto_max: int = 128, ancho_max: int = 512,
+                 nombre: Optional[str] = None, _adjuntar: bool = False):
+        """
+        Args:
+            ranuras: Imágenes que pueden estar en vuelo a la vez
+            alto_max, ancho_max: Tamaño máximo de imagen que cabe en una ranura
+            nombre: Nombre del bloque (solo para adjuntarse a uno existente)
+        """
+        self.ranuras = ranuras
+        self.alto_max = alto_max
+        self.ancho_max = ancho_max
+        self._propietario = not _adjuntar
+
+        if _adjuntar:
+            # Los workers del pool comparten el resource tracker del proceso que los
+            # lanzó, así que el registro que hace adjuntarse no duplica nada: solo el
+            # dueño elimina el bloque (con unlink) al cerrar
+            self._memoria = shared_memory.SharedMemory(name=nombre)
+        else:
+            self._memoria = shared_memory.SharedMemory(create=True, size=ranuras * alto_max * ancho_max)
+
+        self._buffer = np.ndarray((ranuras, alto_max, ancho_max), dtype=np.uint8, buffer=self._memoria.buf)
+        self._libres: "queue.Queue[int]" = queue.Queue()
+        if self._propietario:
+            for ranura in range(ranuras):
+                self._libres.put(ranura)
+
+    @property
+    def descriptor(self) -> Descriptor:
+        return self._memoria.name, self.ranuras, self.alto_max, self.ancho_max
+
+    @classmethod
+    def adjuntar(cls, descriptor: Descriptor) -> 'AnilloImagenes':
+        """Abre desde otro proceso un anillo ya creado"""
+        nombre, ranuras, alto_max, ancho_max = descriptor
+        return cls(ranuras, alto_max, ancho_max, nombre=nombre, _adjuntar=True)
+
+    def cabe(self, imagen: np.ndarray) -> bool:
+        return (imagen.ndim == 2 and imagen.dtype == np.uint8
+                and imagen.shape[0] <= self.alto_max and imagen.shape[1] <= self.ancho_max)
+
+    def escribir(self, imagen: np.ndarray, timeout: Optional[float] = None) -> Tuple[int, int, int]:
+        """
+        Copia la imagen a una ranura libre
+
+        Returns:
+            (ranura, alto, ancho) para reconstruir la vista del otro lado
+
+        Raises:
+            queue.Empty: si no se liberó ninguna ranura dentro del timeout
+        """
+        ranura = self._libres.get(timeout=timeout)
+        alto, ancho = imagen.shape
+        self._buffer[ranura, :alto, :ancho] = imagen
+        return ranura, alto, ancho
+
+    def vista(self, ranura: int, alto: int, ancho: int) -> np.ndarray:
+        """Vista sin copia de la imagen guardada en la ranura"""
+        return self._buffer[ranura, :alto, :ancho]
+
+    def liberar(self, ranura: int):
+        self._libres.put(ranura)
+
+    def cerrar(self):
+        """Suelta el bloque; el dueño además lo elimina del sistema"""
+        self._buffer = None
+        self._memoria.close()
+        if self._propietario:
+            self._memoria.unlink()
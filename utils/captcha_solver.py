@@ -1,14 +1,381 @@
-import pytesseract
+import io
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
 from PIL import Image
 
+from utils.glyph_classifier import get_glyph_classifier
+from utils.helpers import cargar_config
+from utils.ocr_pool import PSM_DEFAULT, WHITELIST, crear_motor, get_ocr_pool
+from utils.preprocesamiento import PIPELINE_DEFAULT, preprocesar
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Motor OCR en el propio proceso (uno por hilo: la API de Tesseract no es thread-safe)
+_local = threading.local()
+
+# Confianza mínima por carácter para aceptar al clasificador de glifos sin Tesseract
+CONFIANZA_GLIFOS_DEFAULT = 20.0
+
+# Variantes (pipeline, psm) para la votación, en orden de preferencia (config: votacion.candidatas)
+VARIANTES_DEFAULT = [('otsu', 6), ('limpio', 7), ('adaptativo', 7), ('completo', 8), ('fijo', 6)]
+
+# Umbral para enviar el formulario y lecturas extra permitidas (config/settings.json → captcha)
+CONFIANZA_ENVIO_DEFAULT = 40.0
+MAX_REFRESCOS_DEFAULT = 5
+
+
+def cargar_imagen(imagen):
+    """Acepta bytes PNG, arreglo NumPy, imagen PIL, ruta o archivo abierto"""
+    if isinstance(imagen, Image.Image):
+        return imagen
+    if isinstance(imagen, np.ndarray):
+        return Image.fromarray(imagen)
+    if isinstance(imagen, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(imagen))
+    return Image.open(imagen)
+
+
+_perfil = None
+
+
+def perfil_ocr():
+    """
+    Perfil de preprocesamiento y OCR: pipeline, psm y whitelist
+
+    Se lee una vez de config/settings.json → perfil_ocr (lo escribe
+    utils.ajuste_captcha); sin perfil se usan los valores por defecto.
+    """
+    global _perfil
+    if _perfil is None:
+        config = cargar_config().get('perfil_ocr', {})
+        _perfil = {
+            'pipeline': config.get('pipeline', PIPELINE_DEFAULT),
+            'psm': config.get('psm', PSM_DEFAULT),
+            'whitelist': config.get('whitelist', WHITELIST),
+        }
+    return _perfil
+
+
+_ajustes = None
+
+
+def _ajustes_captcha():
+    """
+    Secciones glifos, votacion y captcha de config/settings.json
+
+    Se leen una sola vez: se consultan en cada CAPTCHA resuelto.
+    """
+    global _ajustes
+    if _ajustes is None:
+        config = cargar_config()
+        _ajustes = {seccion: config.get(seccion, {}) for seccion in ('glifos', 'votacion', 'captcha')}
+    return _ajustes
+
+
+def _motor_local():
+    if getattr(_local, 'motor', None) is None:
+        _local.motor = crear_motor()
+    return _local.motor
+
+
+def _resolver_con_glifos(imagen):
+    """Resultado del clasificador de glifos si todos sus caracteres superan el umbral"""
+    clasificador = get_glyph_classifier()
+    if clasificador is None:
+        return None
+
+    texto, confianza, caracteres = clasificador.reconocer(imagen)
+    minima = _ajustes_captcha()['glifos'].get('confianza_minima', CONFIANZA_GLIFOS_DEFAULT)
+    if not caracteres or min(conf for _, conf in caracteres) < minima:
+        return None
+    return {'texto': texto, 'confianza': confianza, 'caracteres': caracteres, 'motor': 'glifos'}
+
+
+def votar(lecturas):
+    """
+    Voto por carácter ponderado por confianza
+
+    Solo votan las lecturas del largo con más peso; la confianza de cada
+    carácter es el peso del ganador repartido entre todas ellas, así que el
+    desacuerdo la baja.
+    """
+    lecturas = [l for l in lecturas if l['texto']]
+    if not lecturas:
+        return {'texto': '', 'confianza': 0.0, 'caracteres': []}
+
+    peso_por_largo = defaultdict(float)
+    for lectura in lecturas:
+        peso_por_largo[len(lectura['caracteres'])] += lectura['confianza']
+    largo = max(peso_por_largo, key=lambda n: (peso_por_largo[n], -n))
+    votantes = [l for l in lecturas if len(l['caracteres']) == largo]
+
+    caracteres = []
+    for posicion in range(largo):
+        pesos = defaultdict(float)
+        for lectura in votantes:
+            caracter, confianza = lectura['caracteres'][posicion]
+            pesos[caracter] += confianza
+        ganador = max(pesos, key=pesos.get)
+        caracteres.append((ganador, pesos[ganador] / len(votantes)))
+
+    texto = "".join(c for c, _ in caracteres)
+    return {'texto': texto, 'confianza': sum(c for _, c in caracteres) / largo, 'caracteres': caracteres}
+
+
+def _lecturas_variantes(imagen, variantes):
+    """
+    Genera las lecturas de cada variante a medida que terminan
+
+    Con pool se envían todas a la vez y las que sigan en cola al cerrar el
+    generador se cancelan; sin pool se evalúan una tras otra.
+    """
+    whitelist = perfil_ocr()['whitelist']
+    pool = get_ocr_pool()
+    if pool is None:
+        for pipeline, psm in variantes:
+            texto, confianza, caracteres = _motor_local().reconocer(preprocesar(imagen, pipeline), psm, whitelist)
+            yield {'texto': texto, 'confianza': confianza, 'caracteres': caracteres}
+        return
+
+    pendientes = {pool.enviar(preprocesar(imagen, pipeline), psm=psm, whitelist=whitelist)
+                  for pipeline, psm in variantes}
+    try:
+        while pendientes:
+            listos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                yield futuro.result()
+    finally:
+        for futuro in pendientes:
+            futuro.cancel()
+
+
+def solve_captcha_votado(imagen, variantes=None, acuerdo=None):
+    """
+    Corre K variantes de preprocesamiento/PSM y vota carácter a carácter
+
+    Se corta en cuanto `acuerdo` variantes leen el mismo texto. Más variantes
+    compran precisión con núcleos libres en lugar de con viajes al sitio.
+
+    Args:
+        imagen: Arreglo NumPy o imagen PIL
+        variantes: Lista de (pipeline, psm) (default: votacion.candidatas[:votacion.variantes])
+        acuerdo: Lecturas idénticas que bastan para responder (default: votacion.acuerdo)
+    """
+    config = _ajustes_captcha()['votacion']
+    if variantes is None:
+        candidatas = [tuple(v) for v in config.get('candidatas', VARIANTES_DEFAULT)]
+        variantes = candidatas[:config.get('variantes', 1)]
+    if acuerdo is None:
+        acuerdo = config.get('acuerdo', 2)
+
+    lecturas = []
+    votos = defaultdict(list)
+    for lectura in _lecturas_variantes(imagen, variantes):
+        lecturas.append(lectura)
+        if lectura['texto']:
+            votos[lectura['texto']].append(lectura)
+            if len(votos[lectura['texto']]) >= acuerdo:
+                resultado = votar(votos[lectura['texto']])
+                break
+    else:
+        resultado = votar(lecturas)
+
+    resultado.update({'motor': 'tesseract', 'variantes': len(lecturas)})
+    return resultado
+
+
+def solve_captcha_detallado(imagen, pipeline=None, variantes=None):
+    """
+    Resuelve un CAPTCHA en memoria y retorna el detalle del OCR
+
+    Primero prueba el clasificador de glifos local (si hay modelo entrenado);
+    si algún carácter queda bajo config/settings.json → glifos.confianza_minima
+    se recurre a Tesseract. El OCR va al pool de procesos si está habilitado
+    (ocr_pool) o al motor del hilo actual. Con votacion.variantes > 1 (o una
+    lista explícita de variantes) Tesseract vota entre varias lecturas; si no,
+    se hace una lectura con el perfil ajustado (perfil_ocr).
+
+    Returns:
+        Dict con texto, confianza (0-100), caracteres [(carácter, confianza)]
+        y motor ('glifos' o 'tesseract')
+    """
+    if not isinstance(imagen, np.ndarray):
+        imagen = cargar_imagen(imagen)
+
+    resultado = _resolver_con_glifos(imagen)
+    if resultado is not None:
+        return resultado
+
+    if variantes is not None or _ajustes_captcha()['votacion'].get('variantes', 1) > 1:
+        return solve_captcha_votado(imagen, variantes)
+
+    perfil = perfil_ocr()
+    binaria = preprocesar(imagen, pipeline or perfil['pipeline'])
+
+    pool = get_ocr_pool()
+    if pool is not None:
+        return {**pool.reconocer(binaria, psm=perfil['psm'], whitelist=perfil['whitelist']), 'motor': 'tesseract'}
+
+    texto, confianza, caracteres = _motor_local().reconocer(binaria, perfil['psm'], perfil['whitelist'])
+    return {'texto': texto, 'confianza': confianza, 'caracteres': caracteres, 'motor': 'tesseract'}
+
+
+def solve_captcha_image(imagen, pipeline=None):
+    """
+    Resuelve un CAPTCHA en memoria, sin tocar disco
+
+    Args:
+        imagen: bytes PNG, arreglo NumPy, imagen PIL o ruta
+        pipeline: Pipeline de utils.preprocesamiento (nombre o lista de pasos;
+            default: el del perfil ajustado)
+
+    Returns:
+        (texto, confianza) con la confianza promedio del motor usado (0-100)
+    """
+    resultado = solve_captcha_detallado(imagen, pipeline)
+    return resultado['texto'], resultado['confianza']
+
+
 def solve_captcha(path_img):
-    img = Image.open(path_img)
+    texto, _ = solve_captcha_image(path_img)
+    return texto
+
+
+class MetricasCaptcha:
+    """Contadores de lecturas, refrescos y envíos del CAPTCHA para todo el proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lecturas = 0
+        self.refrescos = 0
+        self.descartados = 0
+        self.envios = 0
+        self.rechazados = 0
+        self.exitos = 0
+
+    def registrar_lectura(self, refrescos: int, aceptada: bool):
+        with self._lock:
+            self.lecturas += refrescos + 1
+            self.refrescos += refrescos
+            if not aceptada:
+                self.descartados += 1
+
+    def registrar_envio(self, exitoso: bool, captcha_rechazado: bool = False):
+        """Un envío con el CAPTCHA rechazado es un viaje de formulario desperdiciado"""
+        with self._lock:
+            self.envios += 1
+            self.exitos += int(exitoso)
+            self.rechazados += int(captcha_rechazado)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'lecturas': self.lecturas,
+                'refrescos': self.refrescos,
+                'descartados': self.descartados,
+                'envios': self.envios,
+                'rechazados': self.rechazados,
+                'exitos': self.exitos,
+                'desperdiciados_por_exito': self.rechazados / self.exitos if self.exitos else None,
+            }
+
+
+_metricas = MetricasCaptcha()
+
+
+def get_metricas_captcha() -> MetricasCaptcha:
+    return _metricas
+
+
+def resolver_con_refresco(obtener_imagen, solver=None, confianza_minima=None, max_refrescos=None,
+                          primera_lectura=None):
+    """
+    Lee el CAPTCHA y pide otra imagen mientras la confianza no alcance el umbral
+
+    Refrescar la imagen cuesta una petición pequeña; enviar un CAPTCHA dudoso
+    cuesta el viaje completo del formulario y casi seguro falla.
+
+    Args:
+        obtener_imagen: Función refrescar -> bytes de la imagen (True pide una nueva)
+        solver: Función imagen -> (texto, confianza) (default: solve_captcha_image)
+        confianza_minima: Umbral para aceptar la lectura (default: captcha.confianza_minima)
+        max_refrescos: Imágenes nuevas a pedir como máximo (default: captcha.max_refrescos)
+        primera_lectura: (texto, confianza) de la imagen actual si ya se leyó
+            (p. ej. con CaptchaEnParalelo); solo se piden imágenes al refrescar
+
+    Returns:
+        (texto, confianza), o None si ninguna lectura alcanzó el umbral: no hay que enviar
+    """
+    config = _ajustes_captcha()['captcha']
+    if confianza_minima is None:
+        confianza_minima = config.get('confianza_minima', CONFIANZA_ENVIO_DEFAULT)
+    if max_refrescos is None:
+        max_refrescos = config.get('max_refrescos', MAX_REFRESCOS_DEFAULT)
+    solver = solver or solve_captcha_image
+
+    for refrescos in range(max_refrescos + 1):
+        if refrescos == 0 and primera_lectura is not None:
+            texto, confianza = primera_lectura
+        else:
+            texto, confianza = solver(obtener_imagen(refrescos > 0))
+        if texto and confianza >= confianza_minima:
+            _metricas.registrar_lectura(refrescos, aceptada=True)
+            return texto, confianza
+        logger.debug(f"🔄 CAPTCHA '{texto}' con confianza {confianza:.0f} < {confianza_minima:.0f}, refrescando")
+
+    _metricas.registrar_lectura(max_refrescos, aceptada=False)
+    logger.warning(f"⚠️  CAPTCHA ilegible tras {max_refrescos} refrescos, no se envía el formulario")
+    return None
+
+
+_ejecutor = None
+_ejecutor_lock = threading.Lock()
+
+
+def _ejecutor_captcha() -> ThreadPoolExecutor:
+    global _ejecutor
+    with _ejecutor_lock:
+        if _ejecutor is None:
+            _ejecutor = ThreadPoolExecutor(thread_name_prefix='captcha')
+        return _ejecutor
+
+
+class CaptchaEnParalelo:
+    """
+    Lee un CAPTCHA ya capturado en segundo plano mientras se llena el formulario
+
+    El navegador no admite llamadas desde otro hilo, así que la captura se hace
+    antes en el hilo de la página; aquí solo corre el OCR. Al pedir el
+    resultado se registran los tiempos de la etapa:
+
+        captcha_ocr: segundos de OCR
+        espera_captcha: lo que el envío tuvo que esperar al OCR tras llenar el formulario
+        ahorro_solapamiento: segundos ganados frente a hacer todo en secuencia
+    """
 
-    # Limpieza básica
-    img = img.convert("L")
-    img = img.point(lambda x: 0 if x < 140 else 255, '1')
+    def __init__(self, imagen, solver=None):
+        self.tiempos = {}
+        self._solver = solver or solve_captcha_image
+        self._futuro = _ejecutor_captcha().submit(self._leer, imagen)
 
-    text = pytesseract.image_to_string(img, config="--psm 6 digits")
-    text = text.strip().replace(" ", "")
+    def _leer(self, imagen):
+        inicio = time.perf_counter()
+        texto, confianza = self._solver(imagen)
+        return texto, confianza, time.perf_counter() - inicio
 
-    return text
+    def resultado(self):
+        """Espera la lectura: (texto, confianza)"""
+        inicio_espera = time.perf_counter()
+        texto, confianza, duracion = self._futuro.result()
+        espera = time.perf_counter() - inicio_espera
+        self.tiempos = {
+            'captcha_ocr': duracion,
+            'espera_captcha': espera,
+            'ahorro_solapamiento': max(0.0, duracion - espera),
+        }
+        return texto, confianza
@@ -1,4 +1,11 @@
 import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+import logging
+
+logger = logging.getLogger(__name__)
+
 
 def save_pdf(download, filename="certificado.pdf", folder="output/pdfs"):
     if not os.path.exists(folder):
@@ -7,3 +14,52 @@ def save_pdf(download, filename="certificado.pdf", folder="output/pdfs"):
     ruta = os.path.join(folder, filename)
     download.save_as(ruta)
     return ruta
+
+
+def leer_pdf(download) -> bytes:
+    """
+    Bytes de una descarga de Playwright, para extraer sin pasar por save_pdf
+
+    Playwright ya dejó el archivo en su carpeta temporal; se lee de ahí en
+    vez de copiarlo a output/pdfs y volver a abrirlo.
+    """
+    return Path(download.path()).read_bytes()
+
+
+_escritor = None
+_escritor_lock = threading.Lock()
+
+
+def _escritor_pdfs() -> ThreadPoolExecutor:
+    global _escritor
+    with _escritor_lock:
+        if _escritor is None:
+            _escritor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='pdf-disco')
+        return _escritor
+
+
+def _escribir(contenido: bytes, ruta: Path) -> str:
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    # Temporal + rename: batch_extract nunca ve un PDF a medio escribir
+    temporal = ruta.with_name(ruta.name + ".parcial")
+    temporal.write_bytes(contenido)
+    os.replace(temporal, ruta)
+    logger.debug(f"💾 PDF guardado: {ruta} ({len(contenido) / 1024:.1f} KB)")
+    return str(ruta)
+
+
+def guardar_pdf_async(contenido: bytes, filename="certificado.pdf", folder="output/pdfs") -> Future:
+    """
+    Escribe el PDF en segundo plano; la extracción no espera al disco
+
+    Returns:
+        Future con la ruta escrita (result() relanza el error de escritura, si lo hubo)
+    """
+    futuro = _escritor_pdfs().submit(_escribir, contenido, Path(folder) / filename)
+    futuro.add_done_callback(_avisar_error)
+    return futuro
+
+
+def _avisar_error(futuro: Future):
+    if futuro.exception() is not None:
+        logger.error(f"❌ No se pudo guardar el PDF: {futuro.exception()}")
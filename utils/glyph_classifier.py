@@ -0,0 +1,260 @@
+"""
+Clasificador local de glifos para el CAPTCHA de la Registraduría
+
+El CAPTCHA tiene un estilo fijo, así que basta segmentar los caracteres por
+componentes conexas (scipy.ndimage) y comparar cada glifo normalizado con los
+ejemplos etiquetados más cercanos. Es mucho más rápido que Tesseract y da una
+confianza por carácter que permite recurrir a Tesseract cuando no alcanza.
+
+Entrenamiento:
+    python -m utils.glyph_classifier --directorio data/captchas_etiquetados
+    python -m utils.glyph_classifier --sinteticos 500 --salida /tmp/modelo.npz
+"""
+import argparse
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from scipy import ndimage
+
+from utils.helpers import cargar_config
+from utils.preprocesamiento import FONDO, TINTA, preprocesar
+import logging
+
+logger = logging.getLogger(__name__)
+
+MODELO_DEFAULT = "data/modelo_glifos.npz"
+
+# 8-conectividad
+_ESTRUCTURA = np.ones((3, 3), dtype=bool)
+
+Caja = Tuple[int, int, int, int]  # (x0, x1, y0, y1), extremos finales excluidos
+
+
+def segmentar(binaria: np.ndarray, area_min: int = 15, alto_relativo: float = 0.5,
+              ancho_relativo: float = 1.6) -> List[Caja]:
+    """
+    Cajas de los caracteres de izquierda a derecha
+
+    Se descartan componentes pequeñas o bajas (ruido, restos de líneas), se unen
+    las que se solapan en x (piezas de un mismo glifo) y se parten en partes
+    iguales las que son mucho más anchas que la mediana (glifos pegados).
+    """
+    tinta = binaria == TINTA
+    etiquetas, cantidad = ndimage.label(tinta, structure=_ESTRUCTURA)
+    if not cantidad:
+        return []
+
+    areas = ndimage.sum_labels(tinta, etiquetas, np.arange(1, cantidad + 1))
+    componentes = [[c[1].start, c[1].stop, c[0].start, c[0].stop]
+                   for c, area in zip(ndimage.find_objects(etiquetas), areas) if area >= area_min]
+    if not componentes:
+        return []
+
+    alto_max = max(y1 - y0 for _, _, y0, y1 in componentes)
+    componentes = sorted(c for c in componentes if c[3] - c[2] >= alto_max * alto_relativo)
+
+    cajas: List[List[int]] = []
+    for x0, x1, y0, y1 in componentes:
+        if cajas and x0 < cajas[-1][1] - 1:
+            caja = cajas[-1]
+            caja[1], caja[2], caja[3] = max(caja[1], x1), min(caja[2], y0), max(caja[3], y1)
+        else:
+            cajas.append([x0, x1, y0, y1])
+
+    ancho_mediano = float(np.median([x1 - x0 for x0, x1, _, _ in cajas]))
+    resultado: List[Caja] = []
+    for x0, x1, y0, y1 in cajas:
+        partes = max(1, int(round((x1 - x0) / ancho_mediano))) if (x1 - x0) > ancho_mediano * ancho_relativo else 1
+        limites = np.linspace(x0, x1, partes + 1).round().astype(int)
+        resultado.extend((int(a), int(b), y0, y1) for a, b in zip(limites[:-1], limites[1:]))
+    return resultado
+
+
+def normalizar(binaria: np.ndarray, caja: Caja, tamano: int = 16) -> np.ndarray:
+    """Recorta el glifo, lo centra en un cuadrado y lo escala a tamano x tamano (float32, tinta = 1)"""
+    x0, x1, y0, y1 = caja
+    recorte = binaria[y0:y1, x0:x1] == TINTA
+    filas, columnas = np.nonzero(recorte)
+    if filas.size:
+        recorte = recorte[filas.min():filas.max() + 1, columnas.min():columnas.max() + 1]
+
+    lado = max(recorte.shape)
+    cuadrado = np.zeros((lado, lado), dtype=np.uint8)
+    y = (lado - recorte.shape[0]) // 2
+    x = (lado - recorte.shape[1]) // 2
+    cuadrado[y:y + recorte.shape[0], x:x + recorte.shape[1]] = recorte * 255
+
+    escalado = Image.fromarray(cuadrado).resize((tamano, tamano), Image.BILINEAR)
+    return np.asarray(escalado, dtype=np.float32).ravel() / 255.0
+
+
+class GlyphClassifier:
+    """Vecino más cercano sobre glifos normalizados"""
+
+    def __init__(self, pipeline: str = 'limpio', tamano: int = 16):
+        """
+        Args:
+            pipeline: Pipeline de utils.preprocesamiento usado para segmentar
+            tamano: Lado en píxeles del glifo normalizado
+        """
+        self.pipeline = pipeline
+        self.tamano = tamano
+        self.ejemplos = np.zeros((0, tamano * tamano), dtype=np.float32)
+        self.etiquetas = np.zeros(0, dtype='<U1')
+        self.largos: Tuple[int, ...] = ()
+        self._normas = np.zeros(0, dtype=np.float32)
+
+    def _glifos(self, imagen) -> np.ndarray:
+        binaria = imagen if self._es_binaria(imagen) else preprocesar(imagen, self.pipeline)
+        cajas = segmentar(binaria)
+        if not cajas:
+            return np.zeros((0, self.tamano * self.tamano), dtype=np.float32)
+        return np.stack([normalizar(binaria, caja, self.tamano) for caja in cajas])
+
+    @staticmethod
+    def _es_binaria(imagen) -> bool:
+        return (isinstance(imagen, np.ndarray) and imagen.ndim == 2
+                and np.isin(imagen, (TINTA, FONDO)).all())
+
+    def entrenar(self, corpus: Iterable[Tuple[Any, str]]) -> Dict[str, int]:
+        """
+        Agrega los glifos de un corpus etiquetado [(imagen, texto)]
+
+        Las imágenes cuya segmentación no coincide con el largo del texto se
+        descartan: no se puede saber qué glifo corresponde a cada carácter.
+        """
+        ejemplos, etiquetas, largos = [], [], set(self.largos)
+        usadas = descartadas = 0
+        for imagen, texto in corpus:
+            glifos = self._glifos(imagen)
+            if len(glifos) != len(texto):
+                descartadas += 1
+                continue
+            ejemplos.append(glifos)
+            etiquetas.extend(texto)
+            largos.add(len(texto))
+            usadas += 1
+
+        if ejemplos:
+            self.ejemplos = np.concatenate([self.ejemplos, *ejemplos])
+            self.etiquetas = np.concatenate([self.etiquetas, np.array(etiquetas, dtype='<U1')])
+            self.largos = tuple(sorted(largos))
+            self._normas = (self.ejemplos ** 2).sum(axis=1)
+
+        logger.info(f"🔠 Clasificador de glifos: {usadas} imágenes usadas, {descartadas} descartadas, "
+                    f"{len(self.etiquetas)} glifos")
+        return {'usadas': usadas, 'descartadas': descartadas, 'glifos': len(self.etiquetas)}
+
+    def reconocer(self, imagen) -> Tuple[str, float, List[Tuple[str, float]]]:
+        """
+        Returns:
+            (texto, confianza promedio, [(carácter, confianza)]) con confianzas 0-100;
+            confianza 0 si la cantidad de glifos no es un largo conocido
+        """
+        glifos = self._glifos(imagen)
+        if not len(self.etiquetas) or len(glifos) not in self.largos:
+            return "", 0.0, []
+
+        # Distancias euclidianas al cuadrado contra todos los ejemplos de una vez
+        distancias = (self._normas[None, :] + (glifos ** 2).sum(axis=1)[:, None]
+                      - 2 * glifos @ self.ejemplos.T)
+        np.maximum(distancias, 0, out=distancias)
+
+        caracteres = []
+        for fila in distancias:
+            cercano = int(np.argmin(fila))
+            etiqueta = self.etiquetas[cercano]
+            otras = fila[self.etiquetas != etiqueta]
+            # Confianza: qué tan lejos queda la mejor alternativa de otra clase
+            d_propia = float(np.sqrt(fila[cercano]))
+            d_otra = float(np.sqrt(otras.min())) if otras.size else d_propia + 1.0
+            confianza = 100.0 * (1.0 - d_propia / d_otra) if d_otra > 0 else 0.0
+            caracteres.append((str(etiqueta), max(0.0, confianza)))
+
+        texto = "".join(c for c, _ in caracteres)
+        return texto, sum(conf for _, conf in caracteres) / len(caracteres), caracteres
+
+    def guardar(self, ruta: str = MODELO_DEFAULT):
+        Path(ruta).parent.mkdir(parents=True, exist_ok=True)
+        with open(ruta, 'wb') as f:
+            np.savez_compressed(f, ejemplos=self.ejemplos, etiquetas=self.etiquetas,
+                                largos=np.array(self.largos, dtype=np.int32),
+                                tamano=self.tamano, pipeline=self.pipeline)
+        logger.info(f"💾 Modelo de glifos guardado en {ruta}")
+
+    @classmethod
+    def cargar(cls, ruta: str = MODELO_DEFAULT) -> 'GlyphClassifier':
+        with np.load(ruta) as datos:
+            clasificador = cls(pipeline=str(datos['pipeline']), tamano=int(datos['tamano']))
+            clasificador.ejemplos = datos['ejemplos'].astype(np.float32)
+            clasificador.etiquetas = datos['etiquetas']
+            clasificador.largos = tuple(int(n) for n in datos['largos'])
+        clasificador._normas = (clasificador.ejemplos ** 2).sum(axis=1)
+        return clasificador
+
+
+_clasificador: Optional[GlyphClassifier] = None
+_cargado = False
+_clasificador_lock = threading.Lock()
+
+
+def get_glyph_classifier() -> Optional[GlyphClassifier]:
+    """
+    Clasificador compartido (config/settings.json → glifos.modelo)
+
+    Retorna None si está deshabilitado o si todavía no se entrenó un modelo.
+    """
+    global _clasificador, _cargado
+    with _clasificador_lock:
+        if not _cargado:
+            _cargado = True
+            config = cargar_config().get('glifos', {})
+            ruta = config.get('modelo', MODELO_DEFAULT)
+            if not config.get('habilitado', True):
+                return None
+            if not Path(ruta).exists():
+                logger.info(f"ℹ️ Sin modelo de glifos en {ruta}, se usa solo Tesseract")
+                return None
+            _clasificador = GlyphClassifier.cargar(ruta)
+            logger.info(f"🔠 Modelo de glifos cargado: {len(_clasificador.etiquetas)} glifos")
+        return _clasificador
+
+
+def corpus_desde_directorio(directorio: str) -> List[Tuple[Image.Image, str]]:
+    """Imágenes etiquetadas por nombre de archivo: <texto>.png o <texto>_<n>.png"""
+    corpus = []
+    for ruta in sorted(Path(directorio).glob("*.png")):
+        with Image.open(ruta) as imagen:
+            corpus.append((imagen.convert("RGB"), ruta.stem.split("_")[0]))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Entrenar el clasificador de glifos del CAPTCHA')
+    origen = parser.add_mutually_exclusive_group(required=True)
+    origen.add_argument('--directorio', type=str, help='PNGs etiquetados por nombre (<texto>_<n>.png)')
+    origen.add_argument('--sinteticos', type=int, help='Entrenar con N CAPTCHAs sintéticos (pruebas)')
+    parser.add_argument('--pipeline', type=str, default='limpio', help='Pipeline de preprocesamiento')
+    parser.add_argument('--salida', type=str, default=MODELO_DEFAULT, help='Archivo .npz del modelo')
+    args = parser.parse_args()
+
+    if args.directorio:
+        corpus = corpus_desde_directorio(args.directorio)
+    else:
+        from benchmarks.captchas_sinteticos import generar_corpus
+        corpus = generar_corpus(args.sinteticos)
+
+    clasificador = GlyphClassifier(pipeline=args.pipeline)
+    resumen = clasificador.entrenar(corpus)
+    if not resumen['usadas']:
+        raise SystemExit("❌ Ninguna imagen se pudo segmentar con su etiqueta")
+    clasificador.guardar(args.salida)
+    print(f"✅ {resumen['usadas']} imágenes, {resumen['glifos']} glifos → {args.salida}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -11,3 +11,11 @@ def guardar_json(data, path="output/resultados.json"):
 
     with open(path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=4, ensure_ascii=False)
+
+def cargar_config(path="config/settings.json"):
+    import os
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,316 @@
+"""
+Pool de procesos OCR de larga vida
+
+Cada worker inicializa su motor una sola vez (tesserocr mantiene la API de
+Tesseract cargada; si no está instalado se usa pytesseract) y recibe
+imágenes ya preprocesadas. La cola está acotada para que los productores
+sientan la presión cuando el OCR no da abasto.
+"""
+import atexit
+import bisect
+import multiprocessing
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from utils.anillo_compartido import AnilloImagenes, Descriptor
+from utils.helpers import cargar_config
+import logging
+
+logger = logging.getLogger(__name__)
+
+WHITELIST = "0123456789"
+
+# Modo de segmentación de página de Tesseract: 6 = bloque, 7 = una línea, 8 = una palabra
+PSM_DEFAULT = 6
+
+# Límites superiores (ms) de los buckets del histograma de latencia
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class MotorPytesseract:
+    """Motor de respaldo: un proceso tesseract por imagen, pero dentro del worker"""
+
+    nombre = 'pytesseract'
+
+    def __init__(self, lang: str = 'eng'):
+        import pytesseract
+        self.pytesseract = pytesseract
+        self.lang = lang
+
+    def reconocer(self, binaria: np.ndarray, psm: int = PSM_DEFAULT,
+                  whitelist: str = WHITELIST) -> Tuple[str, float, List[Tuple[str, float]]]:
+        datos = self.pytesseract.image_to_data(
+            Image.fromarray(binaria), lang=self.lang,
+            config=f"--psm {psm} -c tessedit_char_whitelist={whitelist}",
+            output_type=self.pytesseract.Output.DICT
+        )
+        caracteres = []
+        for palabra, conf in zip(datos['text'], datos['conf']):
+            palabra = re.sub(r'[^A-Za-z0-9]', '', palabra)
+            if palabra and float(conf) >= 0:
+                # Tesseract solo da confianza por palabra: se reparte a sus caracteres
+                caracteres.extend((c, float(conf)) for c in palabra)
+        return _armar_resultado(caracteres)
+
+
+class MotorTesserocr:
+    """Motor persistente: la API de Tesseract queda cargada en el worker"""
+
+    nombre = 'tesserocr'
+
+    def __init__(self, lang: str = 'eng'):
+        import tesserocr
+        self.tesserocr = tesserocr
+        self.api = tesserocr.PyTessBaseAPI(lang=lang, psm=tesserocr.PSM.SINGLE_BLOCK)
+
+    def reconocer(self, binaria: np.ndarray, psm: int = PSM_DEFAULT,
+                  whitelist: str = WHITELIST) -> Tuple[str, float, List[Tuple[str, float]]]:
+        self.api.SetPageSegMode(psm)
+        self.api.SetVariable('tessedit_char_whitelist', whitelist)
+        self.api.SetImage(Image.fromarray(binaria))
+        self.api.Recognize()
+        caracteres = []
+        iterador = self.api.GetIterator()
+        nivel = self.tesserocr.RIL.SYMBOL
+        for simbolo in self.tesserocr.iterate_level(iterador, nivel):
+            texto = simbolo.GetUTF8Text(nivel)
+            if texto and texto.strip():
+                caracteres.append((texto.strip(), simbolo.Confidence(nivel)))
+        return _armar_resultado(caracteres)
+
+
+def _armar_resultado(caracteres: List[Tuple[str, float]]) -> Tuple[str, float, List[Tuple[str, float]]]:
+    texto = "".join(c for c, _ in caracteres)
+    confianza = sum(conf for _, conf in caracteres) / len(caracteres) if caracteres else 0.0
+    return texto, confianza, caracteres
+
+
+def crear_motor(lang: str = 'eng'):
+    """tesserocr si está disponible, si no pytesseract"""
+    try:
+        return MotorTesserocr(lang)
+    except (ImportError, RuntimeError):
+        # RuntimeError: tesserocr instalado pero sin datos de idioma
+        return MotorPytesseract(lang)
+
+
+# Estado propio de cada proceso worker
+_motor = None
+_anillo: Optional[AnilloImagenes] = None
+
+
+def _iniciar_worker(fabrica: Callable[[str], Any], lang: str, anillo: Optional[Descriptor] = None):
+    global _motor, _anillo
+    _motor = fabrica(lang)
+    if anillo is not None:
+        _anillo = AnilloImagenes.adjuntar(anillo)
+
+
+def _reconocer_en_ranura(ranura: int, alto: int, ancho: int, psm: int = PSM_DEFAULT,
+                         whitelist: str = WHITELIST) -> Dict[str, Any]:
+    """Igual que _reconocer_en_worker, leyendo la imagen del anillo compartido"""
+    return _reconocer_en_worker(_anillo.vista(ranura, alto, ancho), psm, whitelist)
+
+
+def _reconocer_en_worker(binaria: np.ndarray, psm: int = PSM_DEFAULT,
+                         whitelist: str = WHITELIST) -> Dict[str, Any]:
+    inicio = time.perf_counter()
+    texto, confianza, caracteres = _motor.reconocer(binaria, psm, whitelist)
+    return {
+        'texto': texto,
+        'confianza': confianza,
+        'caracteres': caracteres,
+        'tiempo_motor': time.perf_counter() - inicio,
+        'pid': os.getpid(),
+    }
+
+
+class HistogramaLatencia:
+    """Histograma de latencias con buckets fijos en milisegundos"""
+
+    def __init__(self, buckets_ms: Tuple[float, ...] = BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self.conteos = [0] * (len(self.buckets_ms) + 1)
+        self.total = 0
+        self.suma = 0.0
+        self._lock = threading.Lock()
+
+    def observar(self, segundos: float):
+        ms = segundos * 1000
+        with self._lock:
+            self.conteos[bisect.bisect_left(self.buckets_ms, ms)] += 1
+            self.total += 1
+            self.suma += ms
+
+    def percentil(self, p: float) -> Optional[float]:
+        """Cota superior (ms) del bucket donde cae el percentil p (0-100)"""
+        with self._lock:
+            if not self.total:
+                return None
+            objetivo = self.total * p / 100
+            acumulado = 0
+            for i, conteo in enumerate(self.conteos):
+                acumulado += conteo
+                if acumulado >= objetivo:
+                    return self.buckets_ms[i] if i < len(self.buckets_ms) else float('inf')
+        return float('inf')
+
+    def resumen(self) -> Dict[str, Any]:
+        etiquetas = [f"<={b}ms" for b in self.buckets_ms] + [f">{self.buckets_ms[-1]}ms"]
+        with self._lock:
+            buckets = dict(zip(etiquetas, self.conteos))
+            total, suma = self.total, self.suma
+        return {
+            'total': total,
+            'promedio_ms': suma / total if total else 0.0,
+            'p50_ms': self.percentil(50),
+            'p95_ms': self.percentil(95),
+            'p99_ms': self.percentil(99),
+            'buckets': buckets,
+        }
+
+
+class OCRPool:
+    """Pool de workers OCR con cola acotada e histograma de latencia"""
+
+    def __init__(self, workers: Optional[int] = None, max_cola: Optional[int] = None,
+                 lang: str = 'eng', fabrica_motor: Callable[[str], Any] = crear_motor,
+                 memoria_compartida: bool = False, alto_max: int = 128, ancho_max: int = 512):
+        """
+        Args:
+            workers: Procesos OCR (default: núcleos disponibles)
+            max_cola: Imágenes en vuelo como máximo, incluidas las que se están
+                procesando (default: 4 * workers)
+            lang: Idioma de Tesseract
+            fabrica_motor: Función de nivel de módulo lang -> motor (debe ser importable
+                desde el proceso hijo)
+            memoria_compartida: Pasar las imágenes por un anillo de memoria compartida
+                (una ranura por cupo de la cola) en lugar de serializarlas
+            alto_max, ancho_max: Tamaño de las ranuras; las imágenes más grandes se serializan
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_cola = max_cola or self.workers * 4
+        self._cupos = threading.BoundedSemaphore(self.max_cola)
+        # Tantas ranuras como cupos: quien obtiene cupo siempre encuentra ranura libre
+        self._anillo = AnilloImagenes(self.max_cola, alto_max, ancho_max) if memoria_compartida else None
+        # spawn: el proceso que consulta tiene hilos y fork podría heredar locks tomados
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_iniciar_worker,
+            initargs=(fabrica_motor, lang, self._anillo.descriptor if self._anillo else None),
+        )
+        self.latencia = HistogramaLatencia()
+        self.latencia_motor = HistogramaLatencia()
+        self.rechazadas = 0
+        self.por_memoria = 0
+        self.por_pickle = 0
+        logger.info(f"🔤 Pool OCR iniciado con {self.workers} workers (cola máx. {self.max_cola}"
+                    f"{', memoria compartida' if self._anillo else ''})")
+
+    def enviar(self, binaria: np.ndarray, bloquear: bool = True,
+               timeout: Optional[float] = None, psm: int = PSM_DEFAULT,
+               whitelist: str = WHITELIST) -> Future:
+        """
+        Encola una imagen preprocesada (uint8, tinta 0 / fondo 255)
+
+        Un futuro cancelado antes de empezar libera su cupo de inmediato.
+
+        Raises:
+            queue.Full: si la cola está llena y no se quiere (o no se pudo) esperar
+        """
+        if not self._cupos.acquire(blocking=bloquear, timeout=timeout if bloquear else None):
+            self.rechazadas += 1
+            raise queue.Full("Cola OCR llena")
+
+        inicio = time.perf_counter()
+        ranura = None
+        try:
+            if self._anillo is not None and self._anillo.cabe(binaria):
+                # Solo el índice de la ranura cruza la cola
+                ranura, alto, ancho = self._anillo.escribir(binaria)
+                futuro = self._executor.submit(_reconocer_en_ranura, ranura, alto, ancho, psm, whitelist)
+                self.por_memoria += 1
+            else:
+                futuro = self._executor.submit(_reconocer_en_worker, np.ascontiguousarray(binaria),
+                                               psm, whitelist)
+                self.por_pickle += 1
+        except Exception:
+            if ranura is not None:
+                self._anillo.liberar(ranura)
+            self._cupos.release()
+            raise
+
+        def _terminado(f: Future):
+            if ranura is not None:
+                self._anillo.liberar(ranura)
+            self._cupos.release()
+            if not f.cancelled() and f.exception() is None:
+                self.latencia.observar(time.perf_counter() - inicio)
+                self.latencia_motor.observar(f.result()['tiempo_motor'])
+
+        futuro.add_done_callback(_terminado)
+        return futuro
+
+    def reconocer(self, binaria: np.ndarray, timeout: Optional[float] = None,
+                  psm: int = PSM_DEFAULT, whitelist: str = WHITELIST) -> Dict[str, Any]:
+        """Versión bloqueante de enviar(): texto, confianza y confianza por carácter"""
+        return self.enviar(binaria, psm=psm, whitelist=whitelist).result(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'max_cola': self.max_cola,
+            'rechazadas': self.rechazadas,
+            'por_memoria': self.por_memoria,
+            'por_pickle': self.por_pickle,
+            'latencia': self.latencia.resumen(),
+            'latencia_motor': self.latencia_motor.resumen(),
+        }
+
+    def cerrar(self):
+        self._executor.shutdown(wait=True)
+        if self._anillo is not None:
+            self._anillo.cerrar()
+            self._anillo = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+_pool: Optional[OCRPool] = None
+_cargado = False
+_pool_lock = threading.Lock()
+
+
+def get_ocr_pool() -> Optional[OCRPool]:
+    """
+    Pool compartido por todo el proceso (config/settings.json → ocr_pool)
+
+    Retorna None si el pool está deshabilitado ("pool": false). La
+    configuración se lee una sola vez, también cuando está deshabilitado.
+    """
+    global _pool, _cargado
+    with _pool_lock:
+        if not _cargado:
+            _cargado = True
+            config = cargar_config()
+            ajustes = config.get('ocr_pool', {})
+            if ajustes.get('pool', True):
+                _pool = OCRPool(workers=ajustes.get('workers'), max_cola=ajustes.get('max_cola'),
+                                lang=config.get('ocr_language', 'eng'),
+                                memoria_compartida=ajustes.get('memoria_compartida', False),
+                                alto_max=ajustes.get('alto_max', 128), ancho_max=ajustes.get('ancho_max', 512))
+                atexit.register(_pool.cerrar)
+        return _pool
@@ -0,0 +1,181 @@
+"""
+Preprocesamiento de imágenes de CAPTCHA con operaciones vectorizadas de NumPy
+
+Cada paso recibe y retorna un arreglo 2D uint8. Las imágenes binarias usan
+0 para la tinta y 255 para el fondo, que es lo que espera Tesseract.
+"""
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+TINTA = 0
+FONDO = 255
+
+# Pesos ITU-R 601-2, los mismos que usa PIL en convert("L")
+_PESOS_LUMA = np.array([299, 587, 114], dtype=np.uint32)
+
+
+def escala_grises(imagen) -> np.ndarray:
+    """Convierte RGB/RGBA/L (arreglo o PIL) a un arreglo uint8 en gris"""
+    if isinstance(imagen, Image.Image):
+        if imagen.mode not in ('L', 'RGB', 'RGBA'):
+            imagen = imagen.convert('RGB')
+        imagen = np.asarray(imagen)
+
+    arreglo = np.asarray(imagen)
+    if arreglo.ndim == 2:
+        return arreglo.astype(np.uint8, copy=False)
+
+    rgb = arreglo[..., :3].astype(np.uint32)
+    return ((rgb @ _PESOS_LUMA + 500) // 1000).astype(np.uint8)
+
+
+def umbral_otsu(gris: np.ndarray) -> int:
+    """Umbral que maximiza la varianza entre clases del histograma"""
+    histograma = np.bincount(gris.ravel(), minlength=256).astype(np.float64)
+    niveles = np.arange(256, dtype=np.float64)
+
+    peso_fondo = np.cumsum(histograma)
+    peso_tinta = peso_fondo[-1] - peso_fondo
+    suma = np.cumsum(histograma * niveles)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        media_fondo = suma / peso_fondo
+        media_tinta = (suma[-1] - suma) / peso_tinta
+        varianza = np.nan_to_num(peso_fondo * peso_tinta * (media_fondo - media_tinta) ** 2)
+
+    # El umbral t separa <= t de > t; binarizar usa "< umbral", de ahí el +1
+    return int(np.argmax(varianza)) + 1
+
+
+def binarizar(gris: np.ndarray, umbral: Union[int, str] = 'otsu') -> np.ndarray:
+    """Tinta donde gris < umbral (umbral fijo o 'otsu')"""
+    if umbral == 'otsu':
+        umbral = umbral_otsu(gris)
+    return np.where(gris < umbral, TINTA, FONDO).astype(np.uint8)
+
+
+def _suma_ventanas(arreglo: np.ndarray, radio: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Suma y cantidad de píxeles en la ventana (2r+1)² de cada píxel, con imagen integral"""
+    alto, ancho = arreglo.shape
+    lado = 2 * radio + 1
+    # int32 alcanza para sumar niveles de 8 bits en imágenes de CAPTCHA
+    integral = np.zeros((alto + lado, ancho + lado), dtype=np.int32)
+    relleno = np.pad(arreglo.astype(np.int32, copy=False), radio)
+    np.cumsum(np.cumsum(relleno, axis=0), axis=1, out=integral[1:, 1:])
+
+    suma = (integral[lado:, lado:] - integral[:-lado, lado:]
+            - integral[lado:, :-lado] + integral[:-lado, :-lado])
+
+    # La cantidad de píxeles reales de la ventana es separable por filas y columnas
+    filas = np.minimum(np.arange(alto) + radio + 1, alto) - np.maximum(np.arange(alto) - radio, 0)
+    columnas = np.minimum(np.arange(ancho) + radio + 1, ancho) - np.maximum(np.arange(ancho) - radio, 0)
+    return suma, np.outer(filas, columnas)
+
+
+def umbral_adaptativo(gris: np.ndarray, ventana: int = 15, c: float = 10) -> np.ndarray:
+    """Tinta donde el píxel es más oscuro que la media de su vecindario menos c"""
+    suma, cantidad = _suma_ventanas(gris, ventana // 2)
+    media = suma / cantidad
+    return np.where(gris < media - c, TINTA, FONDO).astype(np.uint8)
+
+
+def quitar_ruido(binaria: np.ndarray, vecinos_min: int = 1) -> np.ndarray:
+    """Borra píxeles de tinta con menos de vecinos_min vecinos de tinta (8-conectividad)"""
+    tinta = binaria == TINTA
+    suma, _ = _suma_ventanas(tinta, 1)
+    vecinos = suma - tinta
+    return np.where(tinta & (vecinos >= vecinos_min), TINTA, FONDO).astype(np.uint8)
+
+
+def quitar_lineas(binaria: np.ndarray, grosor: int = 2) -> np.ndarray:
+    """
+    Borra trazos horizontales de hasta `grosor` píxeles de alto (líneas de interferencia)
+
+    Se conserva la tinta cubierta por algún tramo vertical de al menos
+    grosor + 1 píxeles consecutivos; los trazos de los caracteres lo tienen.
+    """
+    tinta = binaria == TINTA
+    alto = tinta.shape[0]
+    largo = grosor + 1
+    if alto < largo:
+        return binaria
+
+    # Tramos verticales completamente de tinta, por fila de inicio
+    acumulado = np.zeros((alto + 1, tinta.shape[1]), dtype=np.int32)
+    np.cumsum(tinta, axis=0, out=acumulado[1:])
+    tramo_lleno = (acumulado[largo:] - acumulado[:-largo]) == largo
+
+    # Un píxel es grueso si algún tramo lleno que empieza en [fila - grosor, fila] lo cubre
+    inicios = np.zeros((tramo_lleno.shape[0] + 1, tinta.shape[1]), dtype=np.int32)
+    np.cumsum(tramo_lleno, axis=0, out=inicios[1:])
+    filas = np.arange(alto)
+    hasta = np.minimum(filas + 1, tramo_lleno.shape[0])
+    desde = np.clip(filas - grosor, 0, tramo_lleno.shape[0])
+    grueso = (inicios[hasta] - inicios[desde]) > 0
+
+    return np.where(tinta & grueso, TINTA, FONDO).astype(np.uint8)
+
+
+def angulo_inclinacion(binaria: np.ndarray) -> float:
+    """Ángulo (grados) del eje principal de la tinta, a partir de sus momentos"""
+    ys, xs = np.nonzero(binaria == TINTA)
+    if xs.size < 2:
+        return 0.0
+    xs = xs - xs.mean()
+    ys = ys - ys.mean()
+    angulo = 0.5 * np.arctan2(2 * (xs * ys).mean(), (xs * xs).mean() - (ys * ys).mean())
+    return float(np.degrees(angulo))
+
+
+def enderezar(binaria: np.ndarray, max_angulo: float = 15.0) -> np.ndarray:
+    """Rota la imagen para dejar horizontal el texto (solo ángulos pequeños)"""
+    angulo = angulo_inclinacion(binaria)
+    if abs(angulo) < 0.5 or abs(angulo) > max_angulo:
+        return binaria
+    rotada = Image.fromarray(binaria).rotate(angulo, resample=Image.NEAREST,
+                                             expand=False, fillcolor=FONDO)
+    return np.asarray(rotada)
+
+
+PASOS = {
+    'binarizar': binarizar,
+    'umbral_adaptativo': umbral_adaptativo,
+    'quitar_ruido': quitar_ruido,
+    'quitar_lineas': quitar_lineas,
+    'enderezar': enderezar,
+}
+
+# Pipelines predefinidos: lista de (paso, parámetros) aplicados tras escala_grises
+PIPELINES: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {
+    'fijo': [('binarizar', {'umbral': 140})],
+    'otsu': [('binarizar', {'umbral': 'otsu'})],
+    'limpio': [('binarizar', {'umbral': 'otsu'}), ('quitar_ruido', {}), ('quitar_lineas', {})],
+    'adaptativo': [('umbral_adaptativo', {}), ('quitar_ruido', {}), ('quitar_lineas', {})],
+    'completo': [('binarizar', {'umbral': 'otsu'}), ('quitar_ruido', {}),
+                 ('quitar_lineas', {}), ('enderezar', {})],
+}
+
+PIPELINE_DEFAULT = 'otsu'
+
+
+def preprocesar(imagen, pipeline: Union[str, Sequence[Tuple[str, Dict[str, Any]]]] = PIPELINE_DEFAULT) -> np.ndarray:
+    """
+    Aplica un pipeline de preprocesamiento
+
+    Args:
+        imagen: Arreglo NumPy o imagen PIL
+        pipeline: Nombre en PIPELINES o lista de (paso, parámetros)
+
+    Returns:
+        Arreglo uint8 binario (tinta 0, fondo 255)
+    """
+    pasos = PIPELINES[pipeline] if isinstance(pipeline, str) else pipeline
+
+    resultado = escala_grises(imagen)
+    if not pasos or pasos[0][0] not in ('binarizar', 'umbral_adaptativo'):
+        resultado = binarizar(resultado)
+    for nombre, parametros in pasos:
+        resultado = PASOS[nombre](resultado, **parametros)
+    return resultado
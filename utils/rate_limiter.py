@@ -0,0 +1,146 @@
+"""
+Limitador de tasa por token bucket para todo el tráfico hacia la Registraduría
+
+Hay un bucket por endpoint (formulario, captcha, pdf) compartido por todo el
+proceso. Cada adquisición reserva sus tokens de inmediato (el saldo puede
+quedar negativo) y luego duerme exactamente lo que falta, así que los workers
+esperan en orden de llegada y sin hacer busy-spin.
+"""
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from utils.helpers import cargar_config
+
+# Tasa (tokens/s) y capacidad de ráfaga por endpoint
+LIMITES_DEFAULT = {
+    'formulario': {'tasa': 2.0, 'capacidad': 5},
+    'captcha': {'tasa': 2.0, 'capacidad': 5},
+    'pdf': {'tasa': 1.0, 'capacidad': 3},
+}
+
+
+class TokenBucket:
+    """Bucket de tokens con reloj y sueño inyectables"""
+
+    def __init__(self, tasa: float, capacidad: float,
+                 reloj: Callable[[], float] = time.monotonic,
+                 dormir: Callable[[float], None] = time.sleep):
+        if tasa <= 0 or capacidad <= 0:
+            raise ValueError("tasa y capacidad deben ser positivas")
+
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.reloj = reloj
+        self.dormir = dormir
+
+        self._tokens = float(capacidad)
+        self._ultimo = reloj()
+        self._lock = threading.Lock()
+
+        self.adquisiciones = 0
+        self.tiempo_esperado = 0.0
+
+    def _rellenar(self, ahora: float):
+        transcurrido = ahora - self._ultimo
+        if transcurrido > 0:
+            self._tokens = min(self.capacidad, self._tokens + transcurrido * self.tasa)
+            self._ultimo = ahora
+
+    def _reservar(self, tokens: float) -> float:
+        """Descuenta los tokens y retorna cuánto hay que esperar por ellos"""
+        if tokens > self.capacidad:
+            raise ValueError(f"No se pueden pedir {tokens} tokens con capacidad {self.capacidad}")
+
+        with self._lock:
+            self._rellenar(self.reloj())
+            self._tokens -= tokens
+            espera = -self._tokens / self.tasa if self._tokens < 0 else 0.0
+            self.adquisiciones += 1
+            self.tiempo_esperado += espera
+            return espera
+
+    def intentar(self, tokens: float = 1) -> bool:
+        """Toma los tokens solo si están disponibles ya"""
+        with self._lock:
+            self._rellenar(self.reloj())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                self.adquisiciones += 1
+                return True
+            return False
+
+    def adquirir(self, tokens: float = 1) -> float:
+        """
+        Bloquea hasta disponer de los tokens
+
+        Returns:
+            Segundos esperados
+        """
+        espera = self._reservar(tokens)
+        if espera > 0:
+            self.dormir(espera)
+        return espera
+
+    async def adquirir_async(self, tokens: float = 1) -> float:
+        """Como adquirir, pero cede el loop mientras espera"""
+        espera = self._reservar(tokens)
+        if espera > 0:
+            await asyncio.sleep(espera)
+        return espera
+
+    @property
+    def disponibles(self) -> float:
+        with self._lock:
+            self._rellenar(self.reloj())
+            return self._tokens
+
+
+class RateLimiter:
+    """Conjunto de buckets, uno por endpoint de la Registraduría"""
+
+    def __init__(self, limites: Optional[Dict[str, Dict[str, float]]] = None,
+                 reloj: Callable[[], float] = time.monotonic,
+                 dormir: Callable[[float], None] = time.sleep):
+        limites = {**LIMITES_DEFAULT, **(limites or {})}
+        self.buckets = {
+            endpoint: TokenBucket(cfg['tasa'], cfg['capacidad'], reloj=reloj, dormir=dormir)
+            for endpoint, cfg in limites.items()
+        }
+
+    def bucket(self, endpoint: str) -> TokenBucket:
+        try:
+            return self.buckets[endpoint]
+        except KeyError:
+            raise ValueError(f"Endpoint sin límite configurado: {endpoint}")
+
+    def adquirir(self, endpoint: str, tokens: float = 1) -> float:
+        return self.bucket(endpoint).adquirir(tokens)
+
+    async def adquirir_async(self, endpoint: str, tokens: float = 1) -> float:
+        return await self.bucket(endpoint).adquirir_async(tokens)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            endpoint: {
+                'adquisiciones': b.adquisiciones,
+                'tiempo_esperado': round(b.tiempo_esperado, 3),
+                'tasa': b.tasa,
+                'capacidad': b.capacidad,
+            }
+            for endpoint, b in self.buckets.items()
+        }
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Limitador compartido por todo el proceso (config/settings.json → rate_limits)"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(cargar_config().get('rate_limits'))
+        return _limiter